@@ -11,7 +11,7 @@ from implementations.fio.fio_signals import FIOSignal
 from signals.generic_signals import Signal
 
 
-@dataclass
+@dataclass(slots=True)
 class Tag:
     name: str
     id: str
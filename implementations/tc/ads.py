@@ -1,24 +1,32 @@
-import csv
 import json
 from dataclasses import dataclass
-from datetime import datetime, timedelta
-from typing import Union, Callable
+from ctypes import sizeof
+from typing import Union, Callable, Optional, Iterable, Iterator, Any
 
-from pyads import Connection
+from pyads import Connection, AdsSymbol
 from pyads.constants import ADSIGRP_SYM_VALBYHND
+from pyads.pyads_ex import STRING_BUFFER, type_is_string
 from pydantic import BaseModel
 
-from implementations.tc.data_classes import Paths
+from implementations.tc.async_ads import AsyncAdsConnection, read_symbols
+from implementations.tc.data_classes import AdsSettings
+from implementations.tc.handle_cache import HandleCache
+from implementations.tc.notification_dispatcher import NotificationDispatcher
+from implementations.tc.notification_options import NotificationSetup
+from implementations.tc.rpc_table import CompiledRPCMethod, RPCTable
+from implementations.tc.sum_commands import SumCommandReport, sum_read_symbols, sum_read, sum_write, \
+    decode_value, encode_value, error_to_str, chunk_by_size, sum_read_write_chunk, \
+    SUM_READ_WRITE_REQUEST_SIZE
+from implementations.tc.symbol_cache import SymbolTableCache
 from implementations.tc.tc_signals import TCSignal
-from implementations.tc.tc_types import get_plc_array_type, get_plc_type, raise_on_required_args, RPCMethod, \
-    RPCDefinition, find_rpc_definition, find_rpc_method, check_method_args_list_len, RecipeDefinition, \
+from implementations.tc.tc_types import raise_on_required_args, check_method_args_list_len, RecipeDefinition, \
     validate_model_definitions, convert_arg
 from signals.generic_signals import Signal
 from utilities.file import get_json
-from utilities.functions import payload_to_dataclass, fill_table
+from utilities.functions import payload_to_dataclass, fill_table, stream_table
 
 
-@dataclass
+@dataclass(slots=True)
 class Symbol:
     name: str
     comment: str
@@ -34,25 +42,82 @@ class Symbol:
         self.index_offset = hex(self.index_offset)
 
 
-def get_ads_symbol(plc: Connection, symbol_str):
-    symbol = plc.get_symbol(symbol_str)
+SYMBOL_COLUMN_WIDTHS = {
+    'name': 48,
+    'comment': 24,
+    'symbol_type': 24,
+    'array_size': 10,
+    'auto_update': 11,
+    'index_group': 11,
+    'index_offset': 12,
+    'value': None
+}
+
+
+def get_ads_symbol(symbol_table: SymbolTableCache, symbol_str):
+    symbol = symbol_table.get_symbol(symbol_str)
     if symbol.plc_type:
         symbol.read()
 
     return symbol
 
 
-def print_out_symbol(plc: Connection, symbol_str):
-    symbol = get_ads_symbol(plc, symbol_str)
+def print_out_symbol(symbol_table: SymbolTableCache, symbol_str):
+    symbol = get_ads_symbol(symbol_table, symbol_str)
     table_list = payload_to_dataclass([symbol], Symbol)
     table = fill_table(table_list, Symbol)
     print(table)
 
 
-def print_out_symbols(symbols):
-    dataclass_symbols = payload_to_dataclass(symbols, Symbol)
-    table = fill_table(dataclass_symbols, Symbol)
-    print(table)
+def to_symbol_row(symbol, value) -> Symbol:
+    return Symbol(symbol.name, symbol.comment, symbol.symbol_type, symbol.array_size, symbol.auto_update,
+                  symbol.index_group, symbol.index_offset, value)
+
+
+def read_symbol_rows(plc: Connection, symbols: Iterable[AdsSymbol], settings: AdsSettings,
+                     report: SumCommandReport) -> Iterator[Symbol]:
+    for symbol, value in sum_read_symbols(plc, symbols, settings.sum_read_chunk_size, settings.sum_read_max_bytes,
+                                          report):
+        yield to_symbol_row(symbol, value)
+
+
+def print_out_symbols(plc: Connection, symbols: Iterable[AdsSymbol], settings: AdsSettings):
+    """Print the symbols with their values, each chunk of rows as soon as its sum read is back."""
+    report = SumCommandReport()
+    stream_table(read_symbol_rows(plc, symbols, settings, report), Symbol, SYMBOL_COLUMN_WIDTHS)
+    print(report)
+
+
+async def print_out_symbols_async(connection: AsyncAdsConnection, symbols: Iterable[AdsSymbol],
+                                  settings: AdsSettings):
+    """print_out_symbols over the async transport, the sum reads of all chunks are sent at once."""
+    report = SumCommandReport()
+    values = await read_symbols(connection, symbols, settings.sum_read_chunk_size, settings.sum_read_max_bytes,
+                                report)
+    stream_table((to_symbol_row(symbol, value) for symbol, value in values), Symbol, SYMBOL_COLUMN_WIDTHS)
+    print(report)
+
+
+@dataclass(slots=True)
+class TargetSymbol:
+    target: str
+    name: str
+    symbol_type: str
+    index_group: str
+    index_offset: str
+    value: Any
+
+
+def to_target_symbol_row(target: str, symbol: AdsSymbol, value) -> TargetSymbol:
+    return TargetSymbol(target, symbol.name, symbol.symbol_type, hex(symbol.index_group), hex(symbol.index_offset),
+                        value)
+
+
+def read_target_symbol_rows(target: str, plc: Connection, symbols: Iterable[AdsSymbol],
+                            settings: AdsSettings) -> list[TargetSymbol]:
+    return [to_target_symbol_row(target, symbol, value)
+            for symbol, value in sum_read_symbols(plc, symbols, settings.sum_read_chunk_size,
+                                                  settings.sum_read_max_bytes, SumCommandReport())]
 
 
 def get_symbol_str(signal: Signal) -> str:
@@ -61,80 +126,130 @@ def get_symbol_str(signal: Signal) -> str:
     return symbol_str
 
 
-def validate_recipe_and_execute_callback(file_path, callback: Callable[[list[BaseModel], dict], None]):
+def validate_recipe_and_execute_callback(file_path, callback: Callable[[list[BaseModel], dict], Any]):
     recipe_definitions_json = get_json(file_path)
     if recipe_definitions_json:
         recipe_definitions = validate_model_definitions(recipe_definitions_json, RecipeDefinition)
         if not recipe_definitions:
             return
-        callback(recipe_definitions, recipe_definitions_json)
+        return callback(recipe_definitions, recipe_definitions_json)
 
     else:
         print(f"No recipe definitions found in {file_path}")
 
 
-def download_recipe(plc: Connection, file_path):
-    def callback(recipe_definitions: list[BaseModel], recipe_definitions_json: dict):
-        for recipe_definition in recipe_definitions:
-            plc.write_by_name(recipe_definition.symbol_path, recipe_definition.value)
-        print("Recipe downloaded successfully")
+def _get_recipe_symbols(symbol_table: SymbolTableCache, settings: AdsSettings, recipe_definitions: list[BaseModel],
+                        report: SumCommandReport) -> list[Optional[AdsSymbol]]:
+    symbols = symbol_table.get_symbols([recipe_definition.symbol_path for recipe_definition in recipe_definitions],
+                                       settings.sum_read_chunk_size, settings.sum_read_max_bytes, report)
+    for recipe_definition, symbol in zip(recipe_definitions, symbols):
+        if not symbol or not symbol.plc_type:
+            print(f"Symbol {recipe_definition.symbol_path} not found or of unsupported type")
+    return [symbol if symbol and symbol.plc_type else None for symbol in symbols]
 
-    validate_recipe_and_execute_callback(file_path, callback)
+
+def _read_symbol_bytes(plc: Connection, symbols: list[AdsSymbol], settings: AdsSettings,
+                       report: SumCommandReport) -> list[tuple[int, memoryview]]:
+    return list(sum_read(plc, [(symbol.index_group, symbol.index_offset, sizeof(symbol.plc_type))
+                               for symbol in symbols],
+                         settings.sum_read_chunk_size, settings.sum_read_max_bytes, report))
 
 
-def upload_recipe(plc: Connection, file_path):
+@dataclass(slots=True)
+class RecipeDownload:
+    written: int
+    skipped: int
+    report: SumCommandReport
+
+    def __str__(self):
+        return f"Recipe downloaded: {self.written} written, {self.skipped} unchanged skipped ({self.report})"
+
+
+@dataclass(slots=True)
+class TargetRecipeDownload:
+    target: str
+    written: int
+    skipped: int
+    report: str
+
+
+def download_recipe(plc: Connection, symbol_table: SymbolTableCache, settings: AdsSettings, file_path,
+                    diff=False) -> Optional[RecipeDownload]:
     def callback(recipe_definitions: list[BaseModel], recipe_definitions_json: dict):
-        for i, recipe_definition in enumerate(recipe_definitions):
-            value = plc.read_by_name(recipe_definition.symbol_path)
-            recipe_definitions_json[i]['value'] = value
+        report = SumCommandReport(symbols=len(recipe_definitions))
+        symbols = _get_recipe_symbols(symbol_table, settings, recipe_definitions, report)
+
+        writes = []
+        for recipe_definition, symbol in zip(recipe_definitions, symbols):
+            if symbol:
+                try:
+                    writes.append((symbol, encode_value(symbol.plc_type, recipe_definition.value)))
+                except (TypeError, ValueError) as e:
+                    print(f"Value of {symbol.name} can't be converted to {symbol.symbol_type}: {e}")
+
+        skipped = 0
+        if diff:
+            current_values = _read_symbol_bytes(plc, [symbol for symbol, _ in writes], settings, report)
+            changed_writes = []
+            for (symbol, data), (error, current_data) in zip(writes, current_values):
+                if error or decode_value(symbol.plc_type, current_data) != decode_value(symbol.plc_type, data):
+                    changed_writes.append((symbol, data))
+            skipped = len(writes) - len(changed_writes)
+            writes = changed_writes
+
+        written = 0
+        errors = sum_write(plc, [(symbol.index_group, symbol.index_offset, data) for symbol, data in writes],
+                           settings.sum_read_chunk_size, settings.sum_read_max_bytes, report)
+        for (symbol, _), error in zip(writes, errors):
+            if error:
+                print(f"Writing {symbol.name} failed: {error_to_str(error)}")
+            else:
+                written += 1
+
+        return RecipeDownload(written, skipped, report)
+
+    return validate_recipe_and_execute_callback(file_path, callback)
+
+
+def upload_recipe(plc: Connection, symbol_table: SymbolTableCache, settings: AdsSettings, file_path):
+    def callback(recipe_definitions: list[BaseModel], recipe_definitions_json: dict):
+        report = SumCommandReport(symbols=len(recipe_definitions))
+        symbols = _get_recipe_symbols(symbol_table, settings, recipe_definitions, report)
+        readable = [(i, symbol) for i, symbol in enumerate(symbols) if symbol]
+
+        values = _read_symbol_bytes(plc, [symbol for _, symbol in readable], settings, report)
+        for (i, symbol), (error, data) in zip(readable, values):
+            if error:
+                print(f"Reading {symbol.name} failed: {error_to_str(error)}")
+            else:
+                recipe_definitions_json[i]['value'] = decode_value(symbol.plc_type, data)
 
         with open(file_path, 'w') as file:
             json.dump(recipe_definitions_json, file, indent=4)
 
-        print("Recipe uploaded successfully")
+        print(f"Recipe uploaded ({report})")
 
     validate_recipe_and_execute_callback(file_path, callback)
 
 
-def rpc(plc: Connection, symbol, method: RPCMethod, args_datatype=None, args=None):
-    handle = plc.get_handle(symbol)
-    return_types = method.return_types
-    # FB has more than one return value, for example variables defined in the
-    # VAR_OUTPUT section
-    if len(return_types) > 1:
-        array_callable = get_plc_array_type(return_types[0])
-        return plc.read_write(ADSIGRP_SYM_VALBYHND,
-                              handle,
-                              plc_read_datatype=array_callable(len(return_types)),
-                              plc_write_datatype=args_datatype,
-                              value=args)
-    else:
+def rpc(plc: Connection, handle_cache: HandleCache, rpc_method: CompiledRPCMethod, args=None):
+    handle = handle_cache.get_handle(rpc_method.symbol)
+    return plc.read_write(ADSIGRP_SYM_VALBYHND,
+                          handle,
+                          plc_read_datatype=rpc_method.return_datatype,
+                          plc_write_datatype=rpc_method.args_datatype if args is not None else None,
+                          value=args)
 
-        return_type = None
-        if return_types:
-            return_type = get_plc_type(return_types[0])
-        return plc.read_write(ADSIGRP_SYM_VALBYHND,
-                              handle,
-                              plc_read_datatype=return_type,
-                              plc_write_datatype=args_datatype,
-                              value=args)
 
-
-def signal_to_rpc_call(plc, tc_signal: TCSignal, rpc_definitions: list[RPCDefinition]):
+def signal_to_rpc_call(plc, handle_cache: HandleCache, tc_signal: TCSignal, rpc_table: RPCTable):
     # The RPC-Method has more than 1 args
     if len(tc_signal.payload) > 3:
         symbol_path, method_name, *args = tc_signal.payload
-        symbol = symbol_path + '#' + method_name
-
-        rpc_definition = find_rpc_definition(rpc_definitions, symbol_path)
-        method = find_rpc_method(method_name, rpc_definition.methods)
+        rpc_method = rpc_table.get(symbol_path, method_name)
 
         # Check if len of args is the same as the number of RPC-Method args
-        check_method_args_list_len(args, method)
-        # Get PLC array type for method args
-        array_callable = get_plc_array_type(method.arguments[0].type)
-        args_datatype = array_callable(len(args))
-        response = rpc(plc, symbol, method, args_datatype, args)
+        check_method_args_list_len(args, rpc_method.method)
+        response = rpc(plc, handle_cache, rpc_method, args)
         if response:
             print(response)
 
@@ -142,28 +257,22 @@ def signal_to_rpc_call(plc, tc_signal: TCSignal, rpc_definitions: list[RPCDefini
     elif len(tc_signal.payload) == 3:
 
         symbol_path, method_name, arg = tc_signal.payload
-        symbol = symbol_path + '#' + method_name
-        rpc_definition = find_rpc_definition(rpc_definitions, symbol_path)
-        method = find_rpc_method(method_name, rpc_definition.methods)
-        check_method_args_list_len([arg], method)
-        type_as_str = method.arguments[0].type
-        arg_datatype = get_plc_type(type_as_str)
-        value = convert_arg(arg, type_as_str)
-        response = rpc(plc, symbol, method, arg_datatype, value)
+        rpc_method = rpc_table.get(symbol_path, method_name)
+        check_method_args_list_len([arg], rpc_method.method)
+        value = convert_arg(arg, rpc_method.method.arguments[0].type)
+        response = rpc(plc, handle_cache, rpc_method, value)
         if response:
             print(response)
 
     # The RPC-Method has no arguments
     elif len(tc_signal.payload) == 2:
         symbol_path, method_name = tc_signal.payload
-        symbol = symbol_path + '#' + method_name
 
         # Check if the arguments of the RPC-Method are required if any
-        rpc_definition = find_rpc_definition(rpc_definitions, symbol_path)
-        method = find_rpc_method(method_name, rpc_definition.methods)
-        raise_on_required_args(method)
+        rpc_method = rpc_table.get(symbol_path, method_name)
+        raise_on_required_args(rpc_method.method)
 
-        response = rpc(plc, symbol, method)
+        response = rpc(plc, handle_cache, rpc_method)
         if response:
             print(response)
 
@@ -174,7 +283,100 @@ def signal_to_rpc_call(plc, tc_signal: TCSignal, rpc_definitions: list[RPCDefini
         raise ValueError("Symbol path missing.")
 
 
-def set_symbol(plc: Connection, symbol_str, value):
+@dataclass(slots=True)
+class RPCCallResult:
+    call: str
+    result: Any
+
+
+def split_rpc_calls(payload: list[str]) -> list[list[str]]:
+    """Calls of an RPC batch, either separated by ';' in the payload or one per line of a file=<path> token."""
+    if payload and payload[0].startswith('file='):
+        with open(payload[0][len('file='):], 'r') as file:
+            lines = [line.strip() for line in file]
+        return [line.split() for line in lines if line and not line.startswith('#')]
+    return [call.split() for call in ' '.join(payload).split(';') if call.strip()]
+
+
+def encode_rpc_args(rpc_method: CompiledRPCMethod, args: list[str]) -> bytes:
+    method = rpc_method.method
+    if not args:
+        raise_on_required_args(method)
+        return b''
+    check_method_args_list_len(args, method)
+    values = [convert_arg(arg, argument.type) for arg, argument in zip(args, method.arguments)]
+    if len(values) > 1:
+        return bytes(rpc_method.args_datatype(*values))
+    if type_is_string(rpc_method.args_datatype):
+        # The string and its null terminator, like pyads writes it for a single RPC call
+        return values[0].encode('utf-8') + b'\x00'
+    return encode_value(rpc_method.args_datatype, values[0])
+
+
+def _rpc_return_size(return_datatype) -> int:
+    if return_datatype is None:
+        return 0
+    if type_is_string(return_datatype):
+        # The length of a returned string isn't known up front, pyads reads a buffer of this size too
+        return STRING_BUFFER
+    return sizeof(return_datatype)
+
+
+def _decode_rpc_return(return_datatype, data: bytes) -> Any:
+    if type_is_string(return_datatype):
+        return data.split(b'\x00', 1)[0].decode('utf-8')
+    return decode_value(return_datatype, data)
+
+
+def rpc_batch(plc: Connection, handle_cache: HandleCache, rpc_table: RPCTable, calls: list[list[str]],
+              settings: AdsSettings) -> tuple[list[RPCCallResult], SumCommandReport]:
+    """Call many RPC methods with sum read/write commands, handles included.
+
+    The results keep the order of the calls, a failed call gets its error as result.
+    """
+    report = SumCommandReport(symbols=len(calls))
+    results = [RPCCallResult(' '.join(call), None) for call in calls]
+    prepared = []
+    for i, call in enumerate(calls):
+        try:
+            if len(call) < 2:
+                raise ValueError("RPC method name missing")
+            symbol_path, method_name, *args = call
+            rpc_method = rpc_table.get(symbol_path, method_name)
+            prepared.append((i, rpc_method, encode_rpc_args(rpc_method, args)))
+        except (ValueError, TypeError) as e:
+            results[i].result = f"ERR: {e}"
+            report.errors += 1
+
+    try:
+        handles = handle_cache.get_handles([rpc_method.symbol for _, rpc_method, _ in prepared],
+                                           settings.sum_read_chunk_size, settings.sum_read_max_bytes, report)
+        requests = []
+        for i, rpc_method, data in prepared:
+            handle = handles[rpc_method.symbol]
+            if isinstance(handle, str):
+                results[i].result = f"ERR: {handle}"
+                continue
+            read_length = _rpc_return_size(rpc_method.return_datatype)
+            requests.append((i, rpc_method, (ADSIGRP_SYM_VALBYHND, handle, read_length, data)))
+
+        def request_size(request):
+            _, _, (_, _, read_length, data) = request
+            return SUM_READ_WRITE_REQUEST_SIZE + read_length + len(data)
+
+        for chunk in chunk_by_size(requests, request_size, settings.sum_read_chunk_size, settings.sum_read_max_bytes):
+            responses = sum_read_write_chunk(plc, [request for _, _, request in chunk], report)
+            for (i, rpc_method, _), (error, data) in zip(chunk, responses):
+                if error:
+                    results[i].result = f"ERR: {error_to_str(error)}"
+                elif rpc_method.return_datatype:
+                    results[i].result = _decode_rpc_return(rpc_method.return_datatype, data)
+    finally:
+        handle_cache.trim()
+    return results, report
+
+
+def set_symbol(plc: Connection, handle_cache: HandleCache, symbol_str, value):
     def is_float(s):
         try:
             float(s)
@@ -191,38 +393,10 @@ def set_symbol(plc: Connection, symbol_str, value):
     elif is_float(value):
         value = float(value)
 
-    plc.write_by_name(symbol_str, value)
-
-
-def add_notification(symbol, notification_dict, paths: Paths, callback=None):
-    if symbol.name not in notification_dict:
-        symbol.auto_update = True
-        if not callback:
-            def _notification_callback(notification_header, index_tuple):
-                timestamp_microseconds = notification_header.contents.nTimeStamp // 10
-                # Convert the timestamp to a datetime object
-                date_time = datetime(1601, 1, 1) + timedelta(
-                    microseconds=timestamp_microseconds)
-                formatted_date_time = date_time.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-
-                if 'STRING' in symbol.symbol_type:
-                    symbol_value = notification_dict[symbol.name].value
-                    byte_string = b''
-                    for byte in symbol_value:
-                        if byte == b'\x00':
-                            break
-                        byte_string += byte
-                    payload = byte_string.decode('utf-8')
-                else:
-                    payload = notification_dict[symbol.name].value
-
-                csv_output = [formatted_date_time, symbol.name, payload]
-                with open(paths.ads_notifications_file_path, 'a', newline='') as notification_file:
-                    writer = csv.writer(notification_file)
-                    writer.writerow(csv_output)
-
-            callback = _notification_callback
-
-        return_val = symbol.add_device_notification(callback)
-        notification_dict[symbol.name] = symbol
+    plc.write_by_name(symbol_str, value, handle=handle_cache.get_handle(symbol_str))
+
+
+def add_notification(symbol, dispatcher: NotificationDispatcher, setup: NotificationSetup):
+    if symbol.name not in dispatcher:
+        return_val = dispatcher.add(symbol, setup)
         print(f"Notification callback for symbol {symbol.name} setup successfully {return_val}")
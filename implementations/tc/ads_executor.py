@@ -0,0 +1,184 @@
+import asyncio
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, CancelledError
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from prompt_toolkit import print_formatted_text, HTML
+
+
+class CommandCancelled(Exception):
+    pass
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        self._event.set()
+
+
+_current = threading.local()
+
+
+def check_cancelled():
+    """Raise CommandCancelled if the job running on this thread got cancelled.
+
+    Long running ADS operations call this between two round trips.
+    """
+    token: Optional[CancelToken] = getattr(_current, 'token', None)
+    if token is not None and token.cancelled:
+        raise CommandCancelled()
+
+
+@dataclass(slots=True)
+class AdsJob:
+    id: int
+    name: str
+    token: CancelToken = field(default_factory=CancelToken)
+    future: Optional[Future] = None
+    state: str = 'queued'
+    queued_at: float = field(default_factory=time.monotonic)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def __str__(self):
+        now = time.monotonic()
+        if self.started_at is None:
+            timing = f"queued {now - self.queued_at:.1f} s"
+        else:
+            timing = f"ran {(self.finished_at or now) - self.started_at:.1f} s"
+        return f"[{self.id}] {self.name}: {self.state}, {timing}"
+
+
+class AdsExecutor:
+    """Runs the ADS operations of one connection one after another on a dedicated thread.
+
+    pyads calls block, running them here keeps the event loop and with it
+    the prompt responsive.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self._job_ids = itertools.count(1)
+        self._jobs: dict[int, AdsJob] = {}
+        # Counters change on the event loop and on the executor thread
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+
+    def __str__(self):
+        return (f"{self._name}: {self.queued} queued, {self.running} running, {self.completed} completed, "
+                f"{self.failed} failed, {self.cancelled} cancelled")
+
+    @property
+    def jobs(self) -> list[AdsJob]:
+        return list(self._jobs.values())
+
+    def _finish(self, job: AdsJob, state: str):
+        job.state = state
+        job.finished_at = time.monotonic()
+        with self._lock:
+            self.running -= 1
+            if state == 'done':
+                self.completed += 1
+            elif state == 'cancelled':
+                self.cancelled += 1
+            else:
+                self.failed += 1
+
+    def _run_job(self, job: AdsJob, func: Callable, args) -> Any:
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        job.state = 'running'
+        job.started_at = time.monotonic()
+        _current.token = job.token
+        try:
+            check_cancelled()
+            result = func(*args)
+        except CommandCancelled:
+            self._finish(job, 'cancelled')
+            raise
+        except BaseException:
+            self._finish(job, 'failed')
+            raise
+        finally:
+            _current.token = None
+        self._finish(job, 'done')
+        return result
+
+    def submit(self, name: str, func: Callable, *args) -> AdsJob:
+        job = AdsJob(next(self._job_ids), name)
+        self._jobs[job.id] = job
+        with self._lock:
+            self.queued += 1
+        job.future = self._executor.submit(self._run_job, job, func, args)
+        job.future.add_done_callback(lambda _: self._jobs.pop(job.id, None))
+        return job
+
+    async def run(self, name: str, func: Callable, *args) -> Any:
+        """Run func on the executor thread and wait for it without blocking the event loop."""
+        job = self.submit(name, func, *args)
+        try:
+            return await asyncio.wrap_future(job.future)
+        except asyncio.CancelledError:
+            job.token.cancel()
+            raise
+
+    def run_in_background(self, name: str, func: Callable, *args) -> AdsJob:
+        job = self.submit(name, func, *args)
+
+        def report(future: Future):
+            try:
+                future.result()
+            except (CommandCancelled, CancelledError):
+                print(f"Job {job.id} {name} cancelled")
+            except Exception as e:
+                print_formatted_text(HTML(f'<red>ERR: Job {job.id} {name} failed: {e}</red>'))
+            else:
+                print(f"Job {job.id} {name} done")
+
+        job.future.add_done_callback(report)
+        return job
+
+    def cancel(self, job_id: Optional[int] = None) -> int:
+        """Cancel one job or, without id, every job. Returns the number of jobs cancelled."""
+        jobs = self.jobs if job_id is None else [self._jobs[job_id]] if job_id in self._jobs else []
+        for job in jobs:
+            job.token.cancel()
+        return len(jobs)
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=True)
+
+
+class AdsExecutorPool:
+    """One AdsExecutor per connection, so independent PLCs don't wait for each other."""
+
+    def __init__(self):
+        self._executors: dict[str, AdsExecutor] = {}
+
+    def __iter__(self):
+        return iter(self._executors.values())
+
+    def get(self, name: str) -> AdsExecutor:
+        if name not in self._executors:
+            self._executors[name] = AdsExecutor(name)
+        return self._executors[name]
+
+    def shutdown(self):
+        for executor in self._executors.values():
+            executor.shutdown()
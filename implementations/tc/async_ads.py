@@ -0,0 +1,373 @@
+import asyncio
+import itertools
+import struct
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Coroutine, Iterable, Optional
+
+from pyads import ADSError, AdsSymbol
+from pyads.constants import ADSIGRP_SUMUP_READ, ADSIGRP_SUMUP_WRITE
+
+from implementations.tc.sum_commands import ADSIGRP_SUMUP_READWRITE, SUM_ERROR_SIZE, SUM_READ_WRITE_RESPONSE_SIZE, \
+    SUM_REQUEST_SIZE, SumCommandReport, chunk_by_size, decode_value, error_to_str, symbol_size
+
+ADS_TCP_PORT = 48898
+
+# watchlist_transport setting
+WATCHLIST_TRANSPORT_PYADS = 'pyads'
+WATCHLIST_TRANSPORT_ASYNC = 'async'
+
+ADS_COMMAND_READ_DEVICE_INFO = 1
+ADS_COMMAND_READ = 2
+ADS_COMMAND_WRITE = 3
+ADS_COMMAND_READ_STATE = 4
+ADS_COMMAND_WRITE_CONTROL = 5
+ADS_COMMAND_ADD_NOTIFICATION = 6
+ADS_COMMAND_DEL_NOTIFICATION = 7
+ADS_COMMAND_NOTIFICATION = 8
+ADS_COMMAND_READ_WRITE = 9
+
+ADS_TRANS_SERVER_CYCLE = 3
+ADS_TRANS_SERVER_ON_CHANGE = 4
+
+_STATE_REQUEST = 0x0004
+
+# AMS/TCP header: reserved, length of the AMS packet
+_tcp_header_struct = struct.Struct('<HI')
+# AMS header: target net id and port, source net id and port, command, state flags,
+# data length, error code, invoke id
+_ams_header_struct = struct.Struct('<6sH6sHHHIII')
+_result_struct = struct.Struct('<I')
+_read_response_struct = struct.Struct('<II')
+_read_state_response_struct = struct.Struct('<IHH')
+_add_notification_response_struct = struct.Struct('<II')
+_notification_stamp_struct = struct.Struct('<QI')
+_notification_sample_struct = struct.Struct('<II')
+
+_MAX_EARLY_SAMPLES = 1000
+
+# Notification callback: handle, FILETIME timestamp, value bytes
+NotificationCallback = Callable[[int, int, bytes], None]
+
+
+def net_id_to_bytes(ams_net_id: str) -> bytes:
+    return bytes(int(part) for part in ams_net_id.split('.'))
+
+
+@dataclass(slots=True)
+class AmsAddress:
+    ams_net_id: str
+    port: int
+
+    def pack(self) -> tuple[bytes, int]:
+        return net_id_to_bytes(self.ams_net_id), self.port
+
+
+class AsyncAdsConnection:
+    """ADS client talking AMS/TCP directly on port 48898, without the ADS router of pyads.
+
+    Every request gets its own invoke id, so any number of requests can be in
+    flight on the one socket. A reader task resolves the waiting futures as the
+    responses come in, in whatever order the PLC answers.
+    The PLC needs a route to the local AMS net id, like for pyads on Linux.
+    """
+
+    def __init__(self, ams_net_id: str, port: int, ip_address: Optional[str] = None, local_ams_net_id: str = '',
+                 local_port: int = 32905, timeout: float = 5.0, tcp_port: int = ADS_TCP_PORT):
+        self.target = AmsAddress(ams_net_id, port)
+        self.source = AmsAddress(local_ams_net_id, local_port)
+        self._ip_address = ip_address or '.'.join(ams_net_id.split('.')[:4])
+        self._tcp_port = tcp_port
+        self._timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._invoke_ids = itertools.count(1)
+        self._pending: dict[int, asyncio.Future] = {}
+        self._connection_error: Optional[ConnectionError] = None
+        self._notification_callbacks: dict[int, NotificationCallback] = {}
+        # The first samples may arrive before the response to the add request
+        self._early_samples: list[tuple[int, int, bytes]] = []
+        self.requests = 0
+        self.max_in_flight = 0
+
+    def __str__(self):
+        return (f"{self.target.ams_net_id}:{self.target.port}: {self.requests} requests, {len(self._pending)} in flight, "
+                f"max {self.max_in_flight} in flight")
+
+    @property
+    def is_open(self) -> bool:
+        return self._writer is not None
+
+    async def open(self):
+        """Connect, or connect again if the connection got lost."""
+        if self.is_open:
+            if self._connection_error is None:
+                return
+            self.abort()
+        self._reader, self._writer = await asyncio.open_connection(self._ip_address, self._tcp_port)
+        self._connection_error = None
+        if not self.source.ams_net_id:
+            # Like pyads, the local net id defaults to the local ip address with .1.1
+            self.source.ams_net_id = self._writer.get_extra_info('sockname')[0] + '.1.1'
+        self._reader_task = asyncio.create_task(self._read_responses())
+
+    async def close(self):
+        if not self.is_open:
+            return
+        self._reader_task.cancel()
+        try:
+            await self._reader_task
+        except asyncio.CancelledError:
+            pass
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except ConnectionError:
+            # The PLC closed the connection already
+            pass
+        self._writer = None
+        self._fail_pending(ConnectionError("Connection closed"))
+
+    def abort(self):
+        """Close without waiting for the reader task, for cleanup code that can't await."""
+        if not self.is_open:
+            return
+        self._reader_task.cancel()
+        self._writer.close()
+        self._writer = None
+        self._fail_pending(ConnectionError("Connection closed"))
+
+    async def __aenter__(self) -> 'AsyncAdsConnection':
+        await self.open()
+        return self
+
+    async def __aexit__(self, *_):
+        await self.close()
+
+    def _fail_pending(self, error: Exception):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+
+    async def _read_responses(self):
+        try:
+            while True:
+                _, length = _tcp_header_struct.unpack(await self._reader.readexactly(_tcp_header_struct.size))
+                packet = await self._reader.readexactly(length)
+                (_, _, _, _, command, _, data_length, error, invoke_id
+                 ) = _ams_header_struct.unpack_from(packet)
+                data = packet[_ams_header_struct.size:_ams_header_struct.size + data_length]
+                if command == ADS_COMMAND_NOTIFICATION:
+                    self._dispatch_notification(data)
+                    continue
+                future = self._pending.pop(invoke_id, None)
+                if future is None or future.done():
+                    continue
+                if error:
+                    future.set_exception(ADSError(error))
+                else:
+                    future.set_result(data)
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            self._connection_error = ConnectionError(f"Connection to {self._ip_address} lost: {e}")
+            self._fail_pending(self._connection_error)
+
+    def _dispatch_notification(self, data: bytes):
+        offset = 8
+        _, stamps = struct.unpack_from('<II', data)
+        for _ in range(stamps):
+            filetime, samples = _notification_stamp_struct.unpack_from(data, offset)
+            offset += _notification_stamp_struct.size
+            for _ in range(samples):
+                handle, size = _notification_sample_struct.unpack_from(data, offset)
+                offset += _notification_sample_struct.size
+                callback = self._notification_callbacks.get(handle)
+                if callback:
+                    callback(handle, filetime, data[offset:offset + size])
+                elif len(self._early_samples) < _MAX_EARLY_SAMPLES:
+                    self._early_samples.append((handle, filetime, data[offset:offset + size]))
+                offset += size
+
+    async def request(self, command: int, data: bytes = b'') -> bytes:
+        """Send one ADS command and wait for its response data, raises ADSError on an error code."""
+        if not self.is_open:
+            raise ConnectionError("Connection not open")
+        if self._connection_error:
+            raise self._connection_error
+        invoke_id = next(self._invoke_ids) & 0xFFFFFFFF
+        target_net_id, target_port = self.target.pack()
+        source_net_id, source_port = self.source.pack()
+        header = _ams_header_struct.pack(target_net_id, target_port, source_net_id, source_port, command,
+                                         _STATE_REQUEST, len(data), 0, invoke_id)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[invoke_id] = future
+        self.requests += 1
+        self.max_in_flight = max(self.max_in_flight, len(self._pending))
+        self._writer.write(_tcp_header_struct.pack(0, len(header) + len(data)) + header + data)
+        try:
+            await self._writer.drain()
+            response = await asyncio.wait_for(future, self._timeout)
+        finally:
+            self._pending.pop(invoke_id, None)
+        return response
+
+    @staticmethod
+    def _check_result(response: bytes):
+        result, = _result_struct.unpack_from(response)
+        if result:
+            raise ADSError(result)
+
+    async def read(self, index_group: int, index_offset: int, size: int) -> bytes:
+        response = await self.request(ADS_COMMAND_READ, struct.pack('<III', index_group, index_offset, size))
+        self._check_result(response)
+        _, length = _read_response_struct.unpack_from(response)
+        return response[_read_response_struct.size:_read_response_struct.size + length]
+
+    async def write(self, index_group: int, index_offset: int, data: bytes):
+        response = await self.request(ADS_COMMAND_WRITE,
+                                      struct.pack('<III', index_group, index_offset, len(data)) + data)
+        self._check_result(response)
+
+    async def read_write(self, index_group: int, index_offset: int, read_size: int, data: bytes = b'') -> bytes:
+        response = await self.request(ADS_COMMAND_READ_WRITE,
+                                      struct.pack('<IIII', index_group, index_offset, read_size, len(data)) + data)
+        self._check_result(response)
+        _, length = _read_response_struct.unpack_from(response)
+        return response[_read_response_struct.size:_read_response_struct.size + length]
+
+    async def read_state(self) -> tuple[int, int]:
+        """ADS state and device state."""
+        response = await self.request(ADS_COMMAND_READ_STATE)
+        self._check_result(response)
+        _, ads_state, device_state = _read_state_response_struct.unpack_from(response)
+        return ads_state, device_state
+
+    async def sum_read(self, requests: list[tuple[int, int, int]]) -> list[tuple[int, bytes]]:
+        """Read (index group, index offset, size) requests in one round trip, returns (error, data) per request."""
+        buffer = b''.join(struct.pack('<III', *request) for request in requests)
+        read_size = sum(SUM_ERROR_SIZE + size for _, _, size in requests)
+        response = await self.read_write(ADSIGRP_SUMUP_READ, len(requests), read_size, buffer)
+        offset = SUM_ERROR_SIZE * len(requests)
+        results = []
+        for i, (_, _, size) in enumerate(requests):
+            error, = _result_struct.unpack_from(response, i * SUM_ERROR_SIZE)
+            results.append((error, response[offset:offset + size]))
+            offset += size
+        return results
+
+    async def sum_write(self, requests: list[tuple[int, int, bytes]]) -> list[int]:
+        """Write (index group, index offset, data) requests in one round trip, returns the error per request."""
+        buffer = b''.join(struct.pack('<III', index_group, index_offset, len(data))
+                          for index_group, index_offset, data in requests)
+        buffer += b''.join(data for *_, data in requests)
+        response = await self.read_write(ADSIGRP_SUMUP_WRITE, len(requests), SUM_ERROR_SIZE * len(requests), buffer)
+        return [error for error, in struct.iter_unpack('<I', response)]
+
+    async def sum_read_write(self, requests: list[tuple[int, int, int, bytes]]) -> list[tuple[int, bytes]]:
+        """Send (index group, index offset, read length, write data) requests in one round trip."""
+        buffer = b''.join(struct.pack('<IIII', index_group, index_offset, read_length, len(data))
+                          for index_group, index_offset, read_length, data in requests)
+        buffer += b''.join(data for *_, data in requests)
+        read_size = sum(SUM_READ_WRITE_RESPONSE_SIZE + request[2] for request in requests)
+        response = await self.read_write(ADSIGRP_SUMUP_READWRITE, len(requests), read_size, buffer)
+        offset = SUM_READ_WRITE_RESPONSE_SIZE * len(requests)
+        results = []
+        for error, length in struct.iter_unpack('<II', response[:offset]):
+            results.append((error, response[offset:offset + length]))
+            offset += length
+        return results
+
+    async def add_device_notification(self, index_group: int, index_offset: int, size: int,
+                                      callback: NotificationCallback, trans_mode: int = ADS_TRANS_SERVER_ON_CHANGE,
+                                      max_delay: float = 0, cycle_time: float = 0) -> int:
+        """Register callback for a value, max delay and cycle time in ms. Returns the notification handle.
+
+        The callback runs on the event loop, it must not block.
+        """
+        response = await self.request(ADS_COMMAND_ADD_NOTIFICATION, struct.pack(
+            '<IIIIII16x', index_group, index_offset, size, trans_mode, int(max_delay * 10000),
+            int(cycle_time * 10000)))
+        self._check_result(response)
+        _, handle = _add_notification_response_struct.unpack_from(response)
+        self._notification_callbacks[handle] = callback
+        early_samples = [sample for sample in self._early_samples if sample[0] == handle]
+        if early_samples:
+            self._early_samples = [sample for sample in self._early_samples if sample[0] != handle]
+            for sample in early_samples:
+                callback(*sample)
+        return handle
+
+    async def del_device_notification(self, handle: int):
+        self._notification_callbacks.pop(handle, None)
+        response = await self.request(ADS_COMMAND_DEL_NOTIFICATION, struct.pack('<I', handle))
+        self._check_result(response)
+
+
+async def read_symbols(connection: AsyncAdsConnection, symbols: Iterable[AdsSymbol], chunk_size: int,
+                       max_bytes: int, report: SumCommandReport) -> list[tuple[AdsSymbol, Any]]:
+    """Values of the symbols like sum_commands.sum_read_symbols, with the sum reads of all chunks in flight at once."""
+    chunks = list(chunk_by_size(symbols, symbol_size, chunk_size, max_bytes))
+    requests = [[(symbol.index_group, symbol.index_offset, symbol_size(symbol)) for symbol in chunk if symbol.plc_type]
+                for chunk in chunks]
+    responses = await asyncio.gather(*(connection.sum_read(chunk_requests) for chunk_requests in requests
+                                       if chunk_requests))
+    report.round_trips += len(responses)
+    report.bytes_sent += sum(SUM_REQUEST_SIZE * len(chunk_requests) for chunk_requests in requests)
+    results = iter(result for response in responses for result in response)
+    values = []
+    for symbol in (symbol for chunk in chunks for symbol in chunk):
+        report.symbols += 1
+        value: Optional[Any] = None
+        if symbol.plc_type:
+            error, data = next(results)
+            report.bytes_received += SUM_ERROR_SIZE + len(data)
+            if error:
+                report.errors += 1
+            value = error_to_str(error) if error else decode_value(symbol.plc_type, data)
+        values.append((symbol, value))
+    return values
+
+
+class AdsClientThread:
+    """Runs an AsyncAdsConnection on an event loop of its own thread for blocking callers.
+
+    call() may be used from any number of threads at once, their requests are
+    pipelined on the socket instead of waiting for each other like with pyads.
+    """
+
+    def __init__(self, connection: AsyncAdsConnection):
+        self.connection = connection
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='async-ads', daemon=True)
+
+    def call(self, coroutine: Coroutine) -> Any:
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def open(self):
+        self._thread.start()
+        self.call(self.connection.open())
+
+    def close(self):
+        self.call(self.connection.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def read(self, index_group: int, index_offset: int, size: int) -> bytes:
+        return self.call(self.connection.read(index_group, index_offset, size))
+
+    def write(self, index_group: int, index_offset: int, data: bytes):
+        self.call(self.connection.write(index_group, index_offset, data))
+
+    def read_write(self, index_group: int, index_offset: int, read_size: int, data: bytes = b'') -> bytes:
+        return self.call(self.connection.read_write(index_group, index_offset, read_size, data))
+
+    def read_state(self) -> tuple[int, int]:
+        return self.call(self.connection.read_state())
+
+    def sum_read(self, requests: list[tuple[int, int, int]]) -> list[tuple[int, bytes]]:
+        return self.call(self.connection.sum_read(requests))
+
+    def sum_write(self, requests: list[tuple[int, int, bytes]]) -> list[int]:
+        return self.call(self.connection.sum_write(requests))
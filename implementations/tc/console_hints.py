@@ -1,28 +1,78 @@
 from typing import Callable, Any
 
 from implementations.tc.data_classes import Paths
-from implementations.tc.tc_types import RPCDefinition, validate_model_definitions
-from utilities.file import get_list_from_file, get_json
+from implementations.tc.notification_options import notification_entry_name
+from implementations.tc.rpc_table import get_rpc_table
+from utilities.list_store import get_list_store
 
 
 def symbol_hint_callback(paths: Paths) -> Callable[[], dict[Any, None]]:
+    hint_store = get_list_store(paths.symbol_hints_file_path)
+
     def symbol_hint():
-        hints = get_list_from_file(paths.symbol_hints_file_path)
+        hints = hint_store.to_dict()
         if hints:
-            return dict([(entry, None) for entry in hints])
+            return hints
 
     return symbol_hint
 
 
 def rpc_hint_callback(paths: Paths) -> Callable[[], dict[str, dict[str, None]]]:
-    def rpc_hint():
-        rpc_definitions_list = get_json(paths.rpc_definitions_file_path)
-        if rpc_definitions_list:
-            rpc_definitions: list[RPCDefinition] = validate_model_definitions(rpc_definitions_list, RPCDefinition,
-                                                                              silent=True)
-            if rpc_definitions:
-                return dict(
-                    [(entry.symbol_path, dict([(method.name, None) for method in entry.methods])) for entry in
-                     rpc_definitions])
-
-    return rpc_hint
+    return get_rpc_table(paths.rpc_definitions_file_path).hints
+
+
+def _notification_names_callback(paths: Paths) -> Callable[[], dict[str, None]]:
+    notification_store = get_list_store(paths.notification_symbols_file_path)
+    cache = {}
+
+    def notification_names():
+        # Entries may have notification options after the symbol name
+        entries = notification_store.to_dict()
+        if cache.get('entries') is not entries:
+            cache['entries'] = entries
+            cache['names'] = dict.fromkeys(map(notification_entry_name, entries))
+        return cache['names']
+
+    return notification_names
+
+
+def notification_hint_callback(paths: Paths) -> Callable[[], dict[Any, None]]:
+    notification_names = _notification_names_callback(paths)
+
+    def notification_hint():
+        hints = notification_names()
+        if hints:
+            return hints
+
+    return notification_hint
+
+
+def notification_viewer_hint_callback(paths: Paths) -> Callable[[], dict[Any, None]]:
+    notification_names = _notification_names_callback(paths)
+    options = dict.fromkeys(['regex=', 'rate=', 'changes'])
+    cache = {}
+
+    def notification_viewer_hint():
+        # Same dict as long as the notification list didn't change, the completer isn't rebuilt
+        notification_symbols = notification_names()
+        if cache.get('symbols') is not notification_symbols:
+            cache['symbols'] = notification_symbols
+            cache['hints'] = {**options, **notification_symbols}
+        return cache['hints']
+
+    return notification_viewer_hint
+
+
+def notification_query_hint_callback(paths: Paths) -> Callable[[], dict[Any, None]]:
+    notification_names = _notification_names_callback(paths)
+    options = dict.fromkeys(['agg', 'offset=', 'limit='])
+    cache = {}
+
+    def notification_query_hint():
+        notification_symbols = notification_names()
+        if cache.get('symbols') is not notification_symbols:
+            cache['symbols'] = notification_symbols
+            cache['hints'] = {**notification_symbols, **options}
+        return cache['hints']
+
+    return notification_query_hint
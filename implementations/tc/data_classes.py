@@ -1,6 +1,8 @@
 from config_parser import SilentConfigParser
 from dataclasses import dataclass
-from typing import ClassVar
+from typing import ClassVar, Optional
+
+from pyads.constants import MAX_ADS_SUB_COMMANDS, PORT_TC3PLC1
 
 
 @dataclass
@@ -19,11 +21,14 @@ class Paths:
     conf_file_watchlist: ClassVar[str] = 'watchlist'
     conf_file_notification_symbols: ClassVar[str] = 'notification_symbols'
     conf_file_ads_notifications: ClassVar[str] = 'ads_notifications'
+    conf_file_ads_notifications_log: ClassVar[str] = 'ads_notifications_log'
     conf_file_rpc_definitions: ClassVar[str] = 'rpc_definitions'
     conf_file_session_history: ClassVar[str] = 'session_history'
     conf_file_recipe: ClassVar[str] = 'recipe'
+    conf_file_symbol_cache: ClassVar[str] = 'symbol_cache'
 
     default_recipe_file_path: ClassVar[str] = 'recipe.json'
+    default_symbol_cache_file_path: ClassVar[str] = 'symbol_cache.bin'
     default_session_history_file_path: ClassVar[str] = 'session_history.txt'
     default_rpc_definitions_file_path: ClassVar[str] = 'rpc_definitions.json'
     default_ignore_ads_symbols_file_path: ClassVar[str] = 'ignore_ads_symbols.txt'
@@ -31,6 +36,7 @@ class Paths:
     default_watchlist_file_path: ClassVar[str] = 'watchlist.txt'
     default_notification_symbols_file_path: ClassVar[str] = 'notification_list.txt'
     default_ads_notifications_file_path: ClassVar[str] = 'ads_notifications.csv'
+    default_ads_notifications_log_file_path: ClassVar[str] = 'ads_notifications.bin'
     default_config_file_path: ClassVar[str] = 'config.ini'
 
     def __post_init__(self):
@@ -70,6 +76,14 @@ class Paths:
             config[Paths.conf_file_path_section][Paths.conf_file_ads_notifications],
             self.default_ads_notifications_file_path)
 
+        self.ads_notifications_log_file_path = self._set_file_path(
+            config[Paths.conf_file_path_section][Paths.conf_file_ads_notifications_log],
+            self.default_ads_notifications_log_file_path)
+
+        self.symbol_cache_file_path = self._set_file_path(
+            config[Paths.conf_file_path_section][Paths.conf_file_symbol_cache],
+            self.default_symbol_cache_file_path)
+
     @staticmethod
     def _set_file_path(config_file_path: str, default_file_path: str) -> str:
         return default_file_path if not config_file_path else config_file_path
@@ -83,9 +97,212 @@ class Paths:
             Paths.conf_file_watchlist: Paths.default_watchlist_file_path,
             Paths.conf_file_notification_symbols: Paths.default_notification_symbols_file_path,
             Paths.conf_file_ads_notifications: Paths.default_ads_notifications_file_path,
+            Paths.conf_file_ads_notifications_log: Paths.default_ads_notifications_log_file_path,
             Paths.conf_file_rpc_definitions: Paths.default_rpc_definitions_file_path,
             Paths.conf_file_session_history: Paths.default_session_history_file_path,
-            Paths.conf_file_recipe:Paths.default_recipe_file_path
+            Paths.conf_file_recipe:Paths.default_recipe_file_path,
+            Paths.conf_file_symbol_cache: Paths.default_symbol_cache_file_path
+        }
+        config[AdsSettings.conf_file_ads_section] = {
+            AdsSettings.conf_file_sum_read_chunk_size: str(AdsSettings.default_sum_read_chunk_size),
+            AdsSettings.conf_file_sum_read_max_bytes: str(AdsSettings.default_sum_read_max_bytes),
+            AdsSettings.conf_file_handle_cache_size: str(AdsSettings.default_handle_cache_size),
+            AdsSettings.conf_file_notification_flush_interval: str(AdsSettings.default_notification_flush_interval),
+            AdsSettings.conf_file_notification_batch_size: str(AdsSettings.default_notification_batch_size),
+            AdsSettings.conf_file_notification_queue_size: str(AdsSettings.default_notification_queue_size),
+            AdsSettings.conf_file_notification_log_format: AdsSettings.default_notification_log_format,
+            AdsSettings.conf_file_sample_buffer_size: str(AdsSettings.default_sample_buffer_size),
+            AdsSettings.conf_file_notification_stats_windows: ','.join(
+                f'{window:g}' for window in AdsSettings.default_notification_stats_windows),
+            AdsSettings.conf_file_notification_log_max_bytes: str(AdsSettings.default_notification_log_max_bytes),
+            AdsSettings.conf_file_notification_log_max_age: str(AdsSettings.default_notification_log_max_age),
+            AdsSettings.conf_file_notification_log_keep: str(AdsSettings.default_notification_log_keep),
+            AdsSettings.conf_file_notification_log_compression: AdsSettings.default_notification_log_compression,
+            AdsSettings.conf_file_notification_mode: AdsSettings.default_notification_mode,
+            AdsSettings.conf_file_notification_cycle_time: str(AdsSettings.default_notification_cycle_time),
+            AdsSettings.conf_file_notification_max_delay: str(AdsSettings.default_notification_max_delay),
+            AdsSettings.conf_file_plc_cycle_time: str(AdsSettings.default_plc_cycle_time),
+            AdsSettings.conf_file_watchlist_transport: AdsSettings.default_watchlist_transport,
+            AdsSettings.conf_file_ads_ip_address: AdsSettings.default_ads_ip_address
         }
+        # alias = ams_net_id or ams_net_id:port
+        config[Targets.conf_file_targets_section] = {}
         with open(Paths.default_config_file_path, 'w') as configfile:
             config.write(configfile)
+
+
+@dataclass
+class AdsSettings:
+    path_to_config_file: str = ''
+
+    conf_file_ads_section: ClassVar[str] = 'app.ads'
+    conf_file_sum_read_chunk_size: ClassVar[str] = 'sum_read_chunk_size'
+    conf_file_sum_read_max_bytes: ClassVar[str] = 'sum_read_max_bytes'
+    conf_file_handle_cache_size: ClassVar[str] = 'handle_cache_size'
+    conf_file_notification_flush_interval: ClassVar[str] = 'notification_flush_interval'
+    conf_file_notification_batch_size: ClassVar[str] = 'notification_batch_size'
+    conf_file_notification_queue_size: ClassVar[str] = 'notification_queue_size'
+    conf_file_notification_log_format: ClassVar[str] = 'notification_log_format'
+    conf_file_sample_buffer_size: ClassVar[str] = 'sample_buffer_size'
+    conf_file_notification_stats_windows: ClassVar[str] = 'notification_stats_windows'
+    conf_file_notification_log_max_bytes: ClassVar[str] = 'notification_log_max_bytes'
+    conf_file_notification_log_max_age: ClassVar[str] = 'notification_log_max_age'
+    conf_file_notification_log_keep: ClassVar[str] = 'notification_log_keep'
+    conf_file_notification_log_compression: ClassVar[str] = 'notification_log_compression'
+    conf_file_notification_mode: ClassVar[str] = 'notification_mode'
+    conf_file_notification_cycle_time: ClassVar[str] = 'notification_cycle_time'
+    conf_file_notification_max_delay: ClassVar[str] = 'notification_max_delay'
+    conf_file_plc_cycle_time: ClassVar[str] = 'plc_cycle_time'
+    conf_file_watchlist_transport: ClassVar[str] = 'watchlist_transport'
+    conf_file_ads_ip_address: ClassVar[str] = 'ads_ip_address'
+
+    default_sum_read_chunk_size: ClassVar[int] = MAX_ADS_SUB_COMMANDS
+    default_sum_read_max_bytes: ClassVar[int] = 0x10000
+    default_handle_cache_size: ClassVar[int] = 256
+    default_notification_flush_interval: ClassVar[float] = 0.5
+    default_notification_batch_size: ClassVar[int] = 1000
+    default_notification_queue_size: ClassVar[int] = 100000
+    # csv or binary
+    default_notification_log_format: ClassVar[str] = 'csv'
+    # Cycles kept by the Sample command
+    default_sample_buffer_size: ClassVar[int] = 10000
+    # Seconds, comma separated in the config file
+    default_notification_stats_windows: ClassVar[tuple[float, ...]] = (10, 60, 600)
+    # The notification log is rotated at this size or after this many seconds, 0 turns it off
+    default_notification_log_max_bytes: ClassVar[int] = 0x4000000
+    default_notification_log_max_age: ClassVar[float] = 0
+    # Rotated segments to keep, 0 keeps all
+    default_notification_log_keep: ClassVar[int] = 0
+    # gzip or none
+    default_notification_log_compression: ClassVar[str] = 'gzip'
+    # Notification attributes of symbols that don't set their own: change or
+    # cyclic, cycle time and max delay in ms, a cycle time of 0 checks every PLC cycle
+    default_notification_mode: ClassVar[str] = 'change'
+    default_notification_cycle_time: ClassVar[float] = 0
+    default_notification_max_delay: ClassVar[float] = 0
+    # ms, the fastest a notification can come, for the expected notification rates
+    default_plc_cycle_time: ClassVar[float] = 10
+    # Only the Watchlist command: pyads, or async to read the watchlist with the asyncio AMS/TCP client, its sum
+    # reads pipelined on one socket. Every other command goes through pyads.
+    default_watchlist_transport: ClassVar[str] = 'pyads'
+    # IP address of the PLC for the async watchlist transport, empty takes the first four parts of the AMS net id
+    default_ads_ip_address: ClassVar[str] = ''
+
+    def __post_init__(self):
+
+        config = SilentConfigParser()
+        config.read(self.path_to_config_file)
+        section = config[AdsSettings.conf_file_ads_section]
+
+        self.sum_read_chunk_size = self._set_int(
+            section.get(AdsSettings.conf_file_sum_read_chunk_size),
+            self.default_sum_read_chunk_size)
+
+        self.sum_read_max_bytes = self._set_int(
+            section.get(AdsSettings.conf_file_sum_read_max_bytes),
+            self.default_sum_read_max_bytes)
+
+        self.handle_cache_size = self._set_int(
+            section.get(AdsSettings.conf_file_handle_cache_size),
+            self.default_handle_cache_size)
+
+        self.notification_flush_interval = self._set_float(
+            section.get(AdsSettings.conf_file_notification_flush_interval),
+            self.default_notification_flush_interval)
+
+        self.notification_batch_size = self._set_int(
+            section.get(AdsSettings.conf_file_notification_batch_size),
+            self.default_notification_batch_size)
+
+        self.notification_queue_size = self._set_int(
+            section.get(AdsSettings.conf_file_notification_queue_size),
+            self.default_notification_queue_size)
+
+        self.notification_log_format = self._set_str(
+            section.get(AdsSettings.conf_file_notification_log_format),
+            self.default_notification_log_format)
+
+        self.sample_buffer_size = self._set_int(
+            section.get(AdsSettings.conf_file_sample_buffer_size),
+            self.default_sample_buffer_size)
+
+        self.notification_stats_windows = self._set_float_list(
+            section.get(AdsSettings.conf_file_notification_stats_windows),
+            list(self.default_notification_stats_windows))
+
+        self.notification_log_max_bytes = self._set_int(
+            section.get(AdsSettings.conf_file_notification_log_max_bytes),
+            self.default_notification_log_max_bytes)
+
+        self.notification_log_max_age = self._set_float(
+            section.get(AdsSettings.conf_file_notification_log_max_age),
+            self.default_notification_log_max_age)
+
+        self.notification_log_keep = self._set_int(
+            section.get(AdsSettings.conf_file_notification_log_keep),
+            self.default_notification_log_keep)
+
+        self.notification_log_compression = self._set_str(
+            section.get(AdsSettings.conf_file_notification_log_compression),
+            self.default_notification_log_compression)
+
+        self.notification_mode = self._set_str(
+            section.get(AdsSettings.conf_file_notification_mode),
+            self.default_notification_mode)
+
+        self.notification_cycle_time = self._set_float(
+            section.get(AdsSettings.conf_file_notification_cycle_time),
+            self.default_notification_cycle_time)
+
+        self.notification_max_delay = self._set_float(
+            section.get(AdsSettings.conf_file_notification_max_delay),
+            self.default_notification_max_delay)
+
+        self.plc_cycle_time = self._set_float(
+            section.get(AdsSettings.conf_file_plc_cycle_time),
+            self.default_plc_cycle_time)
+
+        self.watchlist_transport = self._set_str(
+            section.get(AdsSettings.conf_file_watchlist_transport),
+            self.default_watchlist_transport)
+
+        self.ads_ip_address = self._set_str(
+            section.get(AdsSettings.conf_file_ads_ip_address),
+            self.default_ads_ip_address)
+
+    @staticmethod
+    def _set_int(config_value: Optional[str], default_value: int) -> int:
+        return default_value if not config_value else int(config_value, 0)
+
+    @staticmethod
+    def _set_str(config_value: Optional[str], default_value: str) -> str:
+        return default_value if not config_value else config_value.strip().lower()
+
+    @staticmethod
+    def _set_float(config_value: Optional[str], default_value: float) -> float:
+        return default_value if not config_value else float(config_value)
+
+    @staticmethod
+    def _set_float_list(config_value: Optional[str], default_value: list[float]) -> list[float]:
+        return default_value if not config_value else [float(value) for value in config_value.split(',')]
+
+
+@dataclass
+class Targets:
+    path_to_config_file: str = ''
+
+    conf_file_targets_section: ClassVar[str] = 'app.targets'
+
+    def __post_init__(self):
+
+        config = SilentConfigParser()
+        config.read(self.path_to_config_file)
+        section = config[Targets.conf_file_targets_section]
+
+        self.targets: dict[str, tuple[str, int]] = {
+            alias: self._parse_address(address) for alias, address in section.items() if address}
+
+    @staticmethod
+    def _parse_address(address: str) -> tuple[str, int]:
+        ams_net_id, _, port = address.strip().partition(':')
+        return ams_net_id, int(port) if port else PORT_TC3PLC1
@@ -0,0 +1,105 @@
+import struct
+from collections import OrderedDict
+from typing import Optional, Iterable, Union
+
+from pyads import Connection, ADSError
+from pyads.constants import ADSIGRP_SYM_HNDBYNAME
+
+from implementations.tc.sum_commands import SumCommandReport, chunk_by_size, sum_read_write_chunk, error_to_str
+from implementations.tc.symbol_cache import SymbolVersionWatcher
+
+HANDLE_SIZE = 4
+
+
+class HandleCache:
+    """Variable handles of a connection, the least recently used ones get released on the PLC."""
+
+    def __init__(self, plc: Connection, watcher: SymbolVersionWatcher, max_size: int):
+        self._plc = plc
+        self._watcher = watcher
+        self._max_size = max_size
+        self._generation: Optional[int] = None
+        self._handles: OrderedDict[str, int] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._handles)
+
+    def __str__(self):
+        return (f"{len(self._handles)}/{self._max_size} handles, {self.hits} hits, {self.misses} misses, "
+                f"{self.evictions} evictions, {self.invalidations} invalidations")
+
+    def _release(self, handle: int):
+        try:
+            self._plc.release_handle(handle)
+        except ADSError:
+            # The handle is already gone on the PLC side, e.g. after an online change
+            pass
+
+    def _check_generation(self):
+        generation = self._watcher.generation
+        if generation != self._generation:
+            if self._generation is not None:
+                self.invalidations += 1
+            self._generation = generation
+            self.release_all()
+
+    def get_handle(self, name: str) -> int:
+        self._check_generation()
+        handle = self._handles.get(name)
+        if handle is not None:
+            self.hits += 1
+            self._handles.move_to_end(name)
+            return handle
+
+        self.misses += 1
+        handle = self._plc.get_handle(name)
+        self._handles[name] = handle
+        self.trim()
+        return handle
+
+    def get_handles(self, names: Iterable[str], chunk_size: int, max_bytes: int,
+                    report: SumCommandReport) -> dict[str, Union[int, str]]:
+        """Handles of many names, the missing ones are acquired with sum read/write commands.
+
+        Names the PLC can't give a handle for map to the error string. The
+        cache may grow beyond its size here so that none of the handles is
+        released before it was used, call trim() afterwards.
+        """
+        self._check_generation()
+        handles: dict[str, Union[int, str]] = {}
+        missing = []
+        for name in dict.fromkeys(names):
+            handle = self._handles.get(name)
+            if handle is None:
+                missing.append(name)
+            else:
+                self.hits += 1
+                self._handles.move_to_end(name)
+                handles[name] = handle
+
+        for chunk in chunk_by_size(missing, lambda _: HANDLE_SIZE, chunk_size, max_bytes):
+            requests = [(ADSIGRP_SYM_HNDBYNAME, 0, HANDLE_SIZE, name.encode('utf-8') + b'\x00') for name in chunk]
+            for name, (error, data) in zip(chunk, sum_read_write_chunk(self._plc, requests, report)):
+                self.misses += 1
+                if error:
+                    handles[name] = error_to_str(error)
+                else:
+                    handle = struct.unpack('<I', data)[0]
+                    self._handles[name] = handle
+                    handles[name] = handle
+        return handles
+
+    def trim(self):
+        while len(self._handles) > self._max_size:
+            _, evicted_handle = self._handles.popitem(last=False)
+            self.evictions += 1
+            self._release(evicted_handle)
+
+    def release_all(self):
+        for handle in self._handles.values():
+            self._release(handle)
+        self._handles.clear()
@@ -0,0 +1,92 @@
+import re
+from fnmatch import translate
+from typing import Callable, Iterable, Optional, TypeVar
+
+T = TypeVar('T')
+
+# Only * and ? make a rule a glob, '[' is part of array element names like MAIN.arr[1]
+_glob_chars = re.compile(r'[*?]')
+
+
+def _glob_regex(rule: str) -> str:
+    # fnmatch would read '[' as the start of a character class, [[] matches it literally
+    return translate(rule.replace('[', '[[]'))
+
+
+# Marks the end of a prefix rule in the trie, no symbol name character can collide with it
+_rule_key = ''
+
+
+class IgnoreRules:
+    """Rules of the ignore list.
+
+    A rule is either an exact symbol name, a prefix ending with a single
+    trailing '*' like 'Constants.*', or a glob pattern like '*.bError'.
+    Exact names are looked up in a set and prefixes in a character trie, so
+    only glob patterns cost time per rule.
+    """
+
+    def __init__(self, rules: Iterable[str]):
+        self._exact: set[str] = set()
+        self._prefix_trie: dict = {}
+        self._globs: list[tuple[str, Callable[[str], Optional[re.Match]]]] = []
+        self._any_glob_match: Optional[Callable[[str], Optional[re.Match]]] = None
+        self.counts: dict[str, int] = {}
+
+        for rule in rules:
+            rule = rule.strip()
+            if not rule or rule in self.counts:
+                continue
+            self.counts[rule] = 0
+            if not _glob_chars.search(rule):
+                self._exact.add(rule)
+            elif rule.endswith('*') and not _glob_chars.search(rule[:-1]):
+                node = self._prefix_trie
+                for char in rule[:-1]:
+                    node = node.setdefault(char, {})
+                node[_rule_key] = rule
+            else:
+                self._globs.append((rule, re.compile(_glob_regex(rule)).match))
+        if self._globs:
+            # One pass over the name tells if any glob matches, the single
+            # patterns are only tried to find out which rule it was
+            self._any_glob_match = re.compile('|'.join(f'(?:{_glob_regex(rule)})' for rule, _ in self._globs)).match
+
+    def __len__(self):
+        return len(self.counts)
+
+    def match(self, name: str) -> Optional[str]:
+        """Rule that ignores name, None if no rule does."""
+        if name in self._exact:
+            return name
+        node = self._prefix_trie
+        for char in name:
+            if _rule_key in node:
+                return node[_rule_key]
+            node = node.get(char)
+            if node is None:
+                break
+        else:
+            if _rule_key in node:
+                return node[_rule_key]
+        if self._any_glob_match and self._any_glob_match(name):
+            for rule, glob_match in self._globs:
+                if glob_match(name):
+                    return rule
+        return None
+
+    def filter(self, items: Iterable[T], name_of: Callable[[T], str]) -> list[T]:
+        kept = []
+        for item in items:
+            rule = self.match(name_of(item))
+            if rule is None:
+                kept.append(item)
+            else:
+                self.counts[rule] += 1
+        return kept
+
+    def report(self) -> str:
+        ignored = sum(self.counts.values())
+        lines = [f"{ignored} symbols ignored by {len(self.counts)} rules"]
+        lines.extend(f"  {rule}: {count}" for rule, count in self.counts.items() if count)
+        return '\n'.join(lines)
@@ -1,71 +1,127 @@
 import asyncio
+import dataclasses
+import time
+from typing import Optional
 
 import click
 from prompt_toolkit import PromptSession
-from prompt_toolkit.completion import NestedCompleter
 from prompt_toolkit.history import FileHistory
+from prompt_toolkit.patch_stdout import patch_stdout
 
 from implementations.tc.data_classes import ConsoleArgs, Paths
 from signal_analyzers.generic_signal_analyzers import SignalAnalyzer
 from implementations.tc.tc_signal_analyzer import TCSignalAnalyzer
 from signals.generic_signals import Signal
-from implementations.tc.tc_signals import TCSignalDict, TCSignal
+from implementations.tc.tc_signals import TCSignalDict
+from utilities.completion import SignalCompleter
 
 
-async def input_controller(queue, signal_dict: TCSignalDict):
-    while True:
-        signal: TCSignal
-        completer_dict = dict([(key, signal.nested_completer_dict) for key, signal in signal_dict.items()])
-        completer = NestedCompleter.from_nested_dict(completer_dict)
+class SignalTimings:
+    """Time a signal waited in the queue and time its eval took, per command."""
+
+    def __init__(self):
+        self._timings: dict[str, list[tuple[float, float]]] = {}
+
+    def add(self, command: str, queue_wait: float, eval_time: float):
+        self._timings.setdefault(command, []).append((queue_wait, eval_time))
+        print(f"{command}: queue wait {queue_wait * 1000:.3f} ms, eval {eval_time * 1000:.3f} ms")
+
+    def __str__(self):
+        lines = []
+        for command, timings in self._timings.items():
+            queue_waits = [queue_wait for queue_wait, _ in timings]
+            eval_times = [eval_time for _, eval_time in timings]
+            lines.append(f"{command}: {len(timings)} signals, "
+                         f"queue wait avg {sum(queue_waits) / len(timings) * 1000:.3f} ms "
+                         f"max {max(queue_waits) * 1000:.3f} ms, "
+                         f"eval avg {sum(eval_times) / len(timings) * 1000:.3f} ms "
+                         f"max {max(eval_times) * 1000:.3f} ms")
+        return '\n'.join(lines)
+
+
+def parse_input(user_input: str, signal_dict: TCSignalDict) -> Optional[tuple[str, Signal]]:
+    user_input_list = user_input.split(' ')
+    command = user_input_list[0]
+    del user_input_list[0]
+    filtered_input = []
+    for element in user_input_list:
+        if not element:
+            continue
+        filtered_input.append(element)
+    if command in signal_dict:
+        # Queue a copy, the payload of a queued signal must not change when
+        # the same command is entered again before it got evaluated
+        return command, dataclasses.replace(signal_dict[command], payload=filtered_input)
 
-        session = PromptSession(completer=completer,
-                                history=FileHistory(signal_dict.paths.session_history_file_path))
+
+async def input_controller(queue, signal_dict: TCSignalDict, signal_analyzer: SignalAnalyzer,
+                           script: Optional[str] = None):
+    if script:
+        with open(script, 'r') as script_file:
+            for line in script_file:
+                parsed_input = parse_input(line.strip(), signal_dict)
+                if parsed_input:
+                    queue.put_nowait((*parsed_input, time.perf_counter()))
+                    if parsed_input[1].stop:
+                        return
+
+    completer = SignalCompleter(signal_dict)
+    session = PromptSession(completer=completer, history=FileHistory(signal_dict.paths.session_history_file_path))
+    while True:
+        completer.refresh()
         user_input: str = await session.prompt_async()
-        user_input_list = user_input.split(' ')
-        command = user_input_list[0]
-        del user_input_list[0]
-        filtered_input = []
-        for element in user_input_list:
-            if not element:
-                continue
-            filtered_input.append(element)
-        if command in signal_dict:
-            signal = signal_dict[command]
-            signal.payload = filtered_input
-            queue.put_nowait(signal)
-            if signal.stop:
-                break
-
-
-async def app_loop(queue, signal_analyzer: SignalAnalyzer):
+        parsed_input = parse_input(user_input, signal_dict)
+        if not parsed_input:
+            continue
+        if parsed_input[1].immediate:
+            # The app loop may be waiting for the very command this one cancels
+            await signal_analyzer.eval(parsed_input[1])
+            continue
+        queue.put_nowait((*parsed_input, time.perf_counter()))
+        if parsed_input[1].stop:
+            break
+
+
+async def app_loop(queue, signal_analyzer: SignalAnalyzer, timings: Optional[SignalTimings] = None):
     while True:
-        if queue.empty():
-            await asyncio.sleep(0.1)
-        else:
-            sig: Signal = queue.get_nowait()
-            await signal_analyzer.eval(sig)
-            if sig.stop:
-                break
+        command, sig, queued_at = await queue.get()
+        started_at = time.perf_counter()
+        await signal_analyzer.eval(sig)
+        if timings:
+            timings.add(command, started_at - queued_at, time.perf_counter() - started_at)
+        if sig.stop:
+            break
 
 
-async def main(args: ConsoleArgs):
+async def main(args: ConsoleArgs, script: Optional[str] = None, show_timings: bool = False):
     queue = asyncio.Queue()
+    timings = SignalTimings() if show_timings else None
 
     tc_signal_dict = TCSignalDict(Paths(args.path_config))
     tc_signal_analyzer = TCSignalAnalyzer(args)
-    await asyncio.gather(input_controller(queue, tc_signal_dict), app_loop(queue, tc_signal_analyzer))
+    try:
+        # Background ADS jobs print while the prompt is shown
+        with patch_stdout():
+            await asyncio.gather(input_controller(queue, tc_signal_dict, tc_signal_analyzer, script),
+                                 app_loop(queue, tc_signal_analyzer, timings))
+    finally:
+        tc_signal_analyzer.cleanup()
+        if timings:
+            print(timings)
 
 
 @click.command()
 @click.option('--ams-net-id', default='127.0.0.1.1.1', help='Target AMS Net ID')
 @click.option('--config-path', default='', help='Optional path to a configuration file')
 @click.option("--write-default-config", is_flag=True, default=False, help='Create a default config file')
-def console_args(ams_net_id, config_path, write_default_config):
+@click.option('--script', default=None, help='Optional file with commands to run before the prompt, one per line')
+@click.option("--timings", is_flag=True, default=False, help='Print queue wait and eval time of every command')
+def console_args(ams_net_id, config_path, write_default_config, script, timings):
     if write_default_config:
         Paths.write_default_config_file()
         return
 
-    asyncio.run(main(ConsoleArgs(ams_net_id, config_path)))
+    asyncio.run(main(ConsoleArgs(ams_net_id, config_path), script, timings))
 
 
 if __name__ == '__main__':
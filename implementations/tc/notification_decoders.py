@@ -0,0 +1,73 @@
+import struct
+from ctypes import addressof, c_ubyte, sizeof, Array
+from typing import Any, Callable, Optional
+
+from pyads.constants import DATATYPE_MAP
+from pyads.pyads_ex import type_is_string
+from pyads.structs import SAdsNotificationHeader
+
+# Decoders take a writable buffer (ctypes array, bytearray) holding the raw
+# value and return the python value
+Decoder = Callable[[Any], Any]
+
+_data_offset = SAdsNotificationHeader.data.offset
+
+
+def notification_data(notification_header) -> Array:
+    """Raw value of a notification, as view on the notification buffer without copying it."""
+    contents = notification_header.contents
+    return (c_ubyte * contents.cbSampleSize).from_address(addressof(contents) + _data_offset)
+
+
+def _string_decoder(plc_type) -> Decoder:
+    string_size = sizeof(plc_type) if issubclass(plc_type, Array) else None
+
+    def decode_string(buffer):
+        if len(buffer) == string_size:
+            # The value of a ctypes char array ends at the null terminator
+            return plc_type.from_buffer(buffer).value.decode('utf-8')
+        return bytes(buffer).split(b'\x00', 1)[0].decode('utf-8')
+
+    return decode_string
+
+
+def _wstring_decoder() -> Decoder:
+    def decode_wstring(buffer):
+        return bytes(buffer).decode('utf-16-le').split('\x00', 1)[0]
+
+    return decode_wstring
+
+
+def _scalar_decoder(plc_type) -> Decoder:
+    unpack_from = struct.Struct(DATATYPE_MAP[plc_type]).unpack_from
+
+    def decode_scalar(buffer):
+        return unpack_from(buffer)[0]
+
+    return decode_scalar
+
+
+def _array_decoder(plc_type) -> Decoder:
+    element_format = DATATYPE_MAP[plc_type._type_][1:]
+    unpack_from = struct.Struct(f'<{plc_type._length_}{element_format}').unpack_from
+
+    def decode_array(buffer):
+        return list(unpack_from(buffer))
+
+    return decode_array
+
+
+def make_decoder(plc_type, symbol_type: Optional[str] = None) -> Decoder:
+    """Build the decoder of a symbol once, so decoding a notification doesn't depend on the type anymore."""
+    if symbol_type and symbol_type.startswith('WSTRING'):
+        return _wstring_decoder()
+    if plc_type is None:
+        return bytes
+    if type_is_string(plc_type):
+        return _string_decoder(plc_type)
+    if plc_type in DATATYPE_MAP:
+        return _scalar_decoder(plc_type)
+    if issubclass(plc_type, Array) and plc_type._type_ in DATATYPE_MAP:
+        return _array_decoder(plc_type)
+    # Structures and other types without a known layout stay raw bytes
+    return bytes
@@ -0,0 +1,88 @@
+import threading
+from typing import Iterator, Optional
+
+from pyads import Connection, AdsSymbol
+
+from implementations.tc.notification_decoders import notification_data
+from implementations.tc.notification_log import NotificationSymbol
+from implementations.tc.notification_options import NotificationSetup
+from implementations.tc.notification_writer import NotificationWriter
+
+
+class NotificationRecord:
+    __slots__ = ('symbol', 'setup', 'index_group', 'index_offset', 'handles')
+
+    def __init__(self, symbol: NotificationSymbol, setup: NotificationSetup, index_group: int, index_offset: int):
+        self.symbol = symbol
+        self.setup = setup
+        self.index_group = index_group
+        self.index_offset = index_offset
+        # Notification and user handle, once the notification got added
+        self.handles: Optional[tuple[int, int]] = None
+
+
+class NotificationDispatcher:
+    """One callback for all notifications of a connection, finds the symbol by the notification handle.
+
+    A notification may come in before add_device_notification returned its
+    handle. Until then the record is found by index group and offset, which
+    pyads passes to the callback as well.
+    """
+
+    def __init__(self, plc: Connection, writer: NotificationWriter):
+        self._plc = plc
+        self._writer = writer
+        self._by_handle: dict[int, NotificationRecord] = {}
+        self._by_name: dict[str, NotificationRecord] = {}
+        self._pending: dict[tuple[int, int], NotificationRecord] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, notification_header, index: tuple[int, int]):
+        contents = notification_header.contents
+        record = self._by_handle.get(contents.hNotification)
+        if record is None:
+            record = self._pending.get(index)
+            if record is None:
+                return
+        # Only copy the raw value, the writer thread decodes it if the log format needs it
+        self._writer.put((contents.nTimeStamp, record.symbol, bytearray(notification_data(notification_header))))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._by_name
+
+    def __len__(self):
+        return len(self._by_name)
+
+    def __iter__(self) -> Iterator[NotificationRecord]:
+        return iter(list(self._by_name.values()))
+
+    def add(self, symbol: AdsSymbol, setup: NotificationSetup) -> tuple[int, int]:
+        if setup.partial:
+            # Only part of the value gets notified, it's logged as raw bytes
+            notification_symbol = self._writer.get_symbol(symbol.name, '', None)
+        else:
+            notification_symbol = self._writer.get_symbol(symbol.name, symbol.symbol_type, symbol.plc_type)
+        record = NotificationRecord(notification_symbol, setup, symbol.index_group, symbol.index_offset)
+        index = (record.index_group, record.index_offset)
+        with self._lock:
+            self._pending[index] = record
+            try:
+                record.handles = self._plc.add_device_notification(index, setup.attrib(), self)
+            finally:
+                del self._pending[index]
+            self._by_handle[record.handles[0]] = record
+            self._by_name[symbol.name] = record
+        return record.handles
+
+    def remove(self, name: str) -> bool:
+        with self._lock:
+            record = self._by_name.pop(name, None)
+            if record is None:
+                return False
+            self._by_handle.pop(record.handles[0], None)
+        self._plc.del_device_notification(*record.handles)
+        return True
+
+    def clear(self):
+        for name in list(self._by_name):
+            self.remove(name)
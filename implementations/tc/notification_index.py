@@ -0,0 +1,354 @@
+import os
+import struct
+import zlib
+from typing import BinaryIO, Optional
+
+import numpy as np
+
+from implementations.tc.notification_log import NotificationEvent, NotificationSymbol, decoder_from_symbol_type
+
+# Log bytes covered by one index block. A query reads whole blocks, smaller
+# blocks mean less to decode per query and a bigger index.
+INDEX_BLOCK_BYTES = 0x10000
+INDEX_SUFFIX = '.idx'
+
+_index_magic = b'TCNX'
+_index_format_version = 1
+_index_header_struct = struct.Struct('<4sH')
+
+# A session starts every time the log gets opened, the symbol ids of the log
+# are only valid within a session. A symbol record maps an id to the name and
+# type, a block record holds the range of log bytes, the time range and the
+# ids of the symbols in there. A gap record is a range of log bytes nothing
+# is known about, like the end of a log the console crashed on.
+_INDEX_SESSION = 0
+_INDEX_SYMBOL = 1
+_INDEX_BLOCK = 2
+_INDEX_GAP = 3
+_session_record_struct = struct.Struct('<BQ')
+_symbol_record_struct = struct.Struct('<BIH')
+_block_record_struct = struct.Struct('<BQQqqIQIH')
+_gap_record_struct = struct.Struct('<BQQQI')
+
+_FILETIME_MAX = np.iinfo(np.int64).max
+
+
+def index_file_path(log_file_path: str) -> str:
+    return f'{log_file_path}{INDEX_SUFFIX}'
+
+
+class IndexedNotificationSink:
+    """Writes a sparse time and symbol index next to the notification log the sink writes.
+
+    Every INDEX_BLOCK_BYTES of log the index gets a block record with the
+    time range and the symbols of the notifications in there, so queries
+    only have to read the blocks they need.
+    """
+
+    def __init__(self, sink, file_path: str):
+        self._sink = sink
+        self._file_path = file_path
+        self._file: Optional[BinaryIO] = None
+        self._defined_symbol_ids: set[int] = set()
+        self._start = 0
+        self._first_filetime: Optional[int] = None
+        self._last_filetime: Optional[int] = None
+        self._symbol_ids: set[int] = set()
+        self._count = 0
+
+    def open(self):
+        new_log = not os.path.isfile(self._file_path) or os.path.getsize(self._file_path) == 0
+        self._sink.open()
+        # An index left over from a log that got removed doesn't belong to the new one
+        self._file = open(index_file_path(self._file_path), 'wb' if new_log else 'ab')
+        if self._file.tell() == 0:
+            self._file.write(_index_header_struct.pack(_index_magic, _index_format_version))
+        self._start = self._sink.tell()
+        self._file.write(_session_record_struct.pack(_INDEX_SESSION, self._start))
+        self._defined_symbol_ids = set()
+        self._reset_block()
+
+    def _reset_block(self):
+        self._first_filetime = None
+        self._last_filetime = None
+        self._symbol_ids = set()
+        self._count = 0
+
+    def _write_block(self, end: int):
+        self._file.write(_block_record_struct.pack(_INDEX_BLOCK, self._start, end, self._first_filetime,
+                                                   self._last_filetime, self._count, 0, 0, len(self._symbol_ids)) +
+                         np.array(sorted(self._symbol_ids), dtype='<u4').tobytes())
+        self._start = end
+        self._reset_block()
+
+    def write(self, events: list[NotificationEvent]):
+        self._sink.write(events)
+        filetimes = [filetime for filetime, _, _ in events]
+        first, last = min(filetimes), max(filetimes)
+        if self._first_filetime is None or first < self._first_filetime:
+            self._first_filetime = first
+        if self._last_filetime is None or last > self._last_filetime:
+            self._last_filetime = last
+        for _, symbol, _ in events:
+            if symbol.id not in self._symbol_ids:
+                self._symbol_ids.add(symbol.id)
+                if symbol.id not in self._defined_symbol_ids:
+                    self._define(symbol)
+        self._count += len(events)
+        end = self._sink.tell()
+        if end - self._start >= INDEX_BLOCK_BYTES:
+            self._write_block(end)
+
+    def _define(self, symbol: NotificationSymbol):
+        definition = f'{symbol.name}\x00{symbol.symbol_type}'.encode()
+        self._file.write(_symbol_record_struct.pack(_INDEX_SYMBOL, symbol.id, len(definition)) + definition)
+        self._defined_symbol_ids.add(symbol.id)
+
+    def flush(self):
+        # The log first, the index must not point behind the end of it
+        self._sink.flush()
+        self._file.flush()
+
+    def close(self):
+        if self._count:
+            self._write_block(self._sink.tell())
+        self._sink.close()
+        self._file.close()
+
+
+class NotificationIndex:
+    """Byte ranges of an indexed notification log in log order, what they hold and where they are compressed to.
+
+    Ranges the index knows nothing about are gaps, they have to be scanned
+    by every query.
+    """
+
+    def __init__(self):
+        # Name and type per symbol id, per session
+        self.sessions: list[dict[int, tuple[str, str]]] = []
+        self._ranges: list[tuple] = []
+        self._symbol_ids: list[Optional[frozenset]] = []
+        self._arrays: Optional[dict[str, np.ndarray]] = None
+        self._session_symbols: dict[int, dict[str, set[int]]] = {}
+        self._decoded_sessions: dict[int, dict[int, NotificationSymbol]] = {}
+
+    def __len__(self):
+        return len(self._ranges)
+
+    @classmethod
+    def read(cls, file_path: str) -> 'NotificationIndex':
+        index = cls()
+        with open(file_path, 'rb') as file:
+            data = file.read()
+        if len(data) < _index_header_struct.size or \
+                _index_header_struct.unpack_from(data) != (_index_magic, _index_format_version):
+            raise ValueError(f"{file_path} is not a notification log index")
+        offset = _index_header_struct.size
+        while offset < len(data):
+            kind = data[offset]
+            if kind == _INDEX_SESSION and offset + _session_record_struct.size <= len(data):
+                index.sessions.append({})
+                offset += _session_record_struct.size
+            elif kind == _INDEX_SYMBOL and offset + _symbol_record_struct.size <= len(data):
+                _, symbol_id, length = _symbol_record_struct.unpack_from(data, offset)
+                offset += _symbol_record_struct.size
+                if offset + length > len(data):
+                    break
+                name, symbol_type = data[offset:offset + length].decode().split('\x00', 1)
+                index.sessions[-1][symbol_id] = (name, symbol_type)
+                offset += length
+            elif kind == _INDEX_BLOCK and offset + _block_record_struct.size <= len(data):
+                _, start, end, first, last, count, coffset, clength, id_count = \
+                    _block_record_struct.unpack_from(data, offset)
+                offset += _block_record_struct.size
+                if offset + 4 * id_count > len(data):
+                    break
+                symbol_ids = frozenset(np.frombuffer(data, dtype='<u4', count=id_count, offset=offset).tolist())
+                index._add(start, end, first, last, count, coffset, clength, symbol_ids)
+                offset += 4 * id_count
+            elif kind == _INDEX_GAP and offset + _gap_record_struct.size <= len(data):
+                _, start, end, coffset, clength = _gap_record_struct.unpack_from(data, offset)
+                index._add_gap(start, end, coffset, clength)
+                offset += _gap_record_struct.size
+            elif kind in (_INDEX_SESSION, _INDEX_SYMBOL, _INDEX_BLOCK, _INDEX_GAP):
+                # The writer is in the middle of the record
+                break
+            else:
+                raise ValueError(f"Corrupt notification log index {file_path} at byte {offset}")
+        return index
+
+    def _add(self, start: int, end: int, first: int, last: int, count: int, coffset: int, clength: int,
+             symbol_ids: frozenset):
+        self._ranges.append((start, end, first, last, count, coffset, clength, len(self.sessions) - 1))
+        self._symbol_ids.append(symbol_ids)
+        self._arrays = None
+
+    def _add_gap(self, start: int, end: int, coffset: int = 0, clength: int = 0, session: Optional[int] = None):
+        self._ranges.append((start, end, 0, _FILETIME_MAX, 0, coffset, clength,
+                             len(self.sessions) - 1 if session is None else session))
+        self._symbol_ids.append(None)
+        self._arrays = None
+
+    def with_gaps(self, data_start: int, size: int) -> 'NotificationIndex':
+        """Index of an uncompressed log of size bytes, with the ranges this one doesn't cover as gaps.
+
+        Blocks behind the end of the log, which can only be left by a crash, are dropped.
+        """
+        ranges = []
+        position = data_start
+        session = -1
+        for (start, end, *fields), symbol_ids in zip(self._ranges, self._symbol_ids):
+            if end > size:
+                break
+            if start > position:
+                ranges.append(((position, start, 0, _FILETIME_MAX, 0, 0, 0, session), None))
+            ranges.append(((start, end, *fields), symbol_ids))
+            position = end
+            session = fields[-1]
+        if size > position:
+            ranges.append(((position, size, 0, _FILETIME_MAX, 0, 0, 0, session), None))
+        index = NotificationIndex()
+        index.sessions = self.sessions
+        index._session_symbols = self._session_symbols
+        index._decoded_sessions = self._decoded_sessions
+        index._ranges = [fields for fields, _ in ranges]
+        index._symbol_ids = [symbol_ids for _, symbol_ids in ranges]
+        return index
+
+    def ranges(self) -> list[tuple[int, int]]:
+        return [(start, end) for start, end, *_ in self._ranges]
+
+    def set_compressed(self, compressed: list[tuple[int, int]]):
+        """Offset and length of the gzip member every range got compressed to."""
+        self._ranges = [(*fields[:5], coffset, clength, fields[7])
+                        for fields, (coffset, clength) in zip(self._ranges, compressed)]
+        self._arrays = None
+
+    def save(self, file_path: str):
+        buffer = bytearray(_index_header_struct.pack(_index_magic, _index_format_version))
+        session = -1
+        for (start, end, first, last, count, coffset, clength, range_session), symbol_ids in \
+                zip(self._ranges, self._symbol_ids):
+            if range_session != session:
+                session = range_session
+                buffer += _session_record_struct.pack(_INDEX_SESSION, start)
+                for symbol_id, (name, symbol_type) in self.sessions[session].items():
+                    definition = f'{name}\x00{symbol_type}'.encode()
+                    buffer += _symbol_record_struct.pack(_INDEX_SYMBOL, symbol_id, len(definition)) + definition
+            if symbol_ids is None:
+                buffer += _gap_record_struct.pack(_INDEX_GAP, start, end, coffset, clength)
+            else:
+                buffer += _block_record_struct.pack(_INDEX_BLOCK, start, end, first, last, count, coffset, clength,
+                                                    len(symbol_ids))
+                buffer += np.array(sorted(symbol_ids), dtype='<u4').tobytes()
+        with open(f'{file_path}.tmp', 'wb') as file:
+            file.write(buffer)
+        os.replace(f'{file_path}.tmp', file_path)
+
+    def _get_arrays(self) -> dict[str, np.ndarray]:
+        if self._arrays is None:
+            columns = list(zip(*self._ranges)) or [()] * 8
+            self._arrays = {name: np.array(column, dtype=np.int64) for name, column in
+                            zip(('start', 'end', 'first', 'last', 'count', 'coffset', 'clength', 'session'), columns)}
+        return self._arrays
+
+    def _symbol_ids_of(self, session: int, name: str) -> set[int]:
+        # A name has more than one id if it was notified as a whole and in part
+        if session < 0:
+            return set()
+        ids = self._session_symbols.get(session)
+        if ids is None:
+            ids = self._session_symbols[session] = {}
+            for symbol_id, (symbol_name, _) in self.sessions[session].items():
+                ids.setdefault(symbol_name, set()).add(symbol_id)
+        return ids.get(name, set())
+
+    def select(self, name: str, first: int, last: int) -> list['IndexRange']:
+        """Ranges that may hold notifications of the symbol between the FILETIMEs first and last."""
+        arrays = self._get_arrays()
+        candidates = np.flatnonzero((arrays['last'] >= first) & (arrays['first'] <= last))
+        selected = []
+        for i in candidates.tolist():
+            symbol_ids = self._symbol_ids[i]
+            session = int(arrays['session'][i])
+            if symbol_ids is not None and self._symbol_ids_of(session, name).isdisjoint(symbol_ids):
+                continue
+            selected.append(IndexRange(int(arrays['start'][i]), int(arrays['end'][i]), int(arrays['coffset'][i]),
+                                       int(arrays['clength'][i]), symbol_ids is None, session))
+        return selected
+
+    def symbols(self, session: int) -> dict[int, NotificationSymbol]:
+        """Symbols of a binary log defined before the ranges of the session."""
+        if session < 0:
+            return {}
+        symbols = self._decoded_sessions.get(session)
+        if symbols is None:
+            symbols = self._decoded_sessions[session] = {
+                symbol_id: NotificationSymbol(symbol_id, name, symbol_type, decoder_from_symbol_type(symbol_type))
+                for symbol_id, (name, symbol_type) in self.sessions[session].items()}
+        return symbols
+
+    def tail_range(self, count: int) -> Optional['IndexRange']:
+        """Last range from which on the log holds at least count notifications, None if no range does.
+
+        Gaps count as empty, a log ending in a gap is read a little further back.
+        """
+        arrays = self._get_arrays()
+        counts = np.cumsum(arrays['count'][::-1])
+        found = np.flatnonzero(counts >= count)
+        if not len(found):
+            return None
+        i = len(self._ranges) - 1 - int(found[0])
+        return IndexRange(int(arrays['start'][i]), int(arrays['end'][i]), int(arrays['coffset'][i]),
+                          int(arrays['clength'][i]), self._symbol_ids[i] is None, int(arrays['session'][i]))
+
+
+class IndexRange:
+    __slots__ = ('start', 'end', 'coffset', 'clength', 'gap', 'session')
+
+    def __init__(self, start: int, end: int, coffset: int, clength: int, gap: bool, session: int):
+        self.start = start
+        self.end = end
+        self.coffset = coffset
+        self.clength = clength
+        self.gap = gap
+        self.session = session
+
+    def read(self, file: BinaryIO) -> bytes:
+        """Log bytes of the range, file is the raw log or the segment it got compressed to."""
+        if self.clength:
+            file.seek(self.coffset)
+            return zlib.decompress(file.read(self.clength), wbits=31)
+        file.seek(self.start)
+        return file.read(self.end - self.start)
+
+
+def compress_indexed(log_file_path: str, compressed_file_path: str, data_start: int) -> bool:
+    """Compress every range of an indexed log to a gzip member of its own and write the index of the result.
+
+    Together the members decompress to the whole log, so any gzip reader can
+    still read it. Returns False if the log has no index.
+    """
+    if not os.path.isfile(index_file_path(log_file_path)):
+        return False
+    index = NotificationIndex.read(index_file_path(log_file_path)).with_gaps(data_start,
+                                                                             os.path.getsize(log_file_path))
+    compressed = []
+    with open(log_file_path, 'rb') as source, open(f'{compressed_file_path}.tmp', 'wb') as target:
+        # The header goes in front of the first range
+        target.write(_gzip_member(source.read(data_start)))
+        for start, end in index.ranges():
+            source.seek(start)
+            member = _gzip_member(source.read(end - start))
+            compressed.append((target.tell(), len(member)))
+            target.write(member)
+    index.set_compressed(compressed)
+    index.save(index_file_path(compressed_file_path))
+    os.replace(f'{compressed_file_path}.tmp', compressed_file_path)
+    os.remove(index_file_path(log_file_path))
+    return True
+
+
+def _gzip_member(data: bytes) -> bytes:
+    compressor = zlib.compressobj(wbits=31)
+    return compressor.compress(data) + compressor.flush()
@@ -0,0 +1,456 @@
+import collections
+import csv
+import json
+import os
+import struct
+from datetime import datetime, timedelta
+from typing import Any, Iterator, Optional, BinaryIO
+
+from pyads import AdsSymbol
+
+from implementations.tc.notification_decoders import Decoder, make_decoder
+
+LOG_FORMAT_CSV = 'csv'
+LOG_FORMAT_BINARY = 'binary'
+
+_log_magic = b'TCNL'
+_log_format_version = 1
+_log_header_struct = struct.Struct('<4sH')
+
+# A value record holds the raw FILETIME, the id of the symbol and the raw
+# value bytes. The id is defined by a symbol record written before the first
+# value record of the symbol in every file.
+_RECORD_VALUE = 0
+_RECORD_SYMBOL = 1
+_record_kind_struct = struct.Struct('<B')
+_value_record_struct = struct.Struct('<BQIH')
+_symbol_record_struct = struct.Struct('<BIH')
+# Read size when looking for the last rows of a log
+_TAIL_BLOCK_SIZE = 0x10000
+
+
+class NotificationSymbol:
+    __slots__ = ('id', 'name', 'symbol_type', 'decoder')
+
+    def __init__(self, symbol_id: int, name: str, symbol_type: str, decoder: Decoder):
+        self.id = symbol_id
+        self.name = name
+        self.symbol_type = symbol_type
+        self.decoder = decoder
+
+
+def filetime_to_str(filetime: int) -> str:
+    date_time = datetime(1601, 1, 1) + timedelta(microseconds=filetime // 10)
+    return date_time.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+
+def datetime_to_filetime(date_time: datetime) -> int:
+    return (date_time - datetime(1601, 1, 1)) // timedelta(microseconds=1) * 10
+
+
+# Raw notification as pushed by the ADS callback thread: FILETIME timestamp,
+# symbol and a copy of the value bytes
+NotificationEvent = tuple[int, NotificationSymbol, bytearray]
+
+
+class NotificationSymbolDictionary:
+    """Gives every notification symbol a small id, so log records don't have to repeat the name."""
+
+    def __init__(self):
+        # By name and type, a symbol notified as a whole and one notified in part get different ids
+        self._symbols: dict[tuple[str, str], NotificationSymbol] = {}
+
+    def get(self, name: str, symbol_type: str, plc_type) -> NotificationSymbol:
+        key = (name, symbol_type or '')
+        symbol = self._symbols.get(key)
+        if symbol is None:
+            symbol = NotificationSymbol(len(self._symbols), name, symbol_type or '',
+                                        make_decoder(plc_type, symbol_type))
+            self._symbols[key] = symbol
+        return symbol
+
+
+def decoder_from_symbol_type(symbol_type: str) -> Decoder:
+    try:
+        plc_type = AdsSymbol.get_type_from_str(symbol_type)
+    except TypeError:
+        plc_type = None
+    return make_decoder(plc_type, symbol_type)
+
+
+class CsvNotificationSink:
+    def __init__(self, file_path: str):
+        self._file_path = file_path
+        self._file = None
+        self._writer = None
+
+    def open(self):
+        self._file = open(self._file_path, 'a', newline='')
+        self._writer = csv.writer(self._file)
+
+    def write(self, events: list[NotificationEvent]):
+        self._writer.writerows([filetime_to_str(filetime), symbol.name, symbol.decoder(data)]
+                               for filetime, symbol, data in events)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class BinaryNotificationSink:
+    def __init__(self, file_path: str):
+        self._file_path = file_path
+        self._file: Optional[BinaryIO] = None
+        self._defined_symbol_ids: set[int] = set()
+
+    def open(self):
+        self._file = open(self._file_path, 'ab')
+        self._defined_symbol_ids = set()
+        if self._file.tell() == 0:
+            self._file.write(_log_header_struct.pack(_log_magic, _log_format_version))
+
+    def write(self, events: list[NotificationEvent]):
+        buffer = bytearray()
+        for filetime, symbol, data in events:
+            if symbol.id not in self._defined_symbol_ids:
+                definition = f'{symbol.name}\x00{symbol.symbol_type}'.encode()
+                buffer += _symbol_record_struct.pack(_RECORD_SYMBOL, symbol.id, len(definition))
+                buffer += definition
+                self._defined_symbol_ids.add(symbol.id)
+            buffer += _value_record_struct.pack(_RECORD_VALUE, filetime, symbol.id, len(data))
+            buffer += data
+        self._file.write(buffer)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class MultiNotificationSink:
+    """Passes every batch of the notification writer on to several sinks."""
+
+    def __init__(self, *sinks):
+        self._sinks = sinks
+
+    def open(self):
+        for sink in self._sinks:
+            sink.open()
+
+    def write(self, events: list[NotificationEvent]):
+        for sink in self._sinks:
+            sink.write(events)
+
+    def flush(self):
+        for sink in self._sinks:
+            sink.flush()
+
+    def close(self):
+        for sink in self._sinks:
+            sink.close()
+
+
+def make_notification_sink(log_format: str, file_path: str):
+    if log_format == LOG_FORMAT_BINARY:
+        return BinaryNotificationSink(file_path)
+    if log_format == LOG_FORMAT_CSV:
+        return CsvNotificationSink(file_path)
+    raise ValueError(f"Unknown notification log format {log_format}")
+
+
+def _read_records(file: BinaryIO, symbols: Optional[dict[int, NotificationSymbol]] = None,
+                  end: Optional[int] = None) -> Iterator[tuple[int, str, Any]]:
+    """Decode the records of a binary notification log from the current position on.
+
+    Stops at end, the end of the file or at a record that is not completely
+    written yet. Pass the symbols of an earlier call to continue reading where it stopped.
+    """
+    symbols = {} if symbols is None else symbols
+    while True:
+        position = file.tell()
+        if end is not None and position >= end:
+            return
+        kind = file.read(_record_kind_struct.size)
+        if not kind:
+            return
+        if kind[0] == _RECORD_SYMBOL:
+            header = kind + file.read(_symbol_record_struct.size - 1)
+            if len(header) < _symbol_record_struct.size:
+                file.seek(position)
+                return
+            _, symbol_id, length = _symbol_record_struct.unpack(header)
+            definition = file.read(length)
+            if len(definition) < length:
+                file.seek(position)
+                return
+            name, symbol_type = definition.decode().split('\x00', 1)
+            symbols[symbol_id] = NotificationSymbol(symbol_id, name, symbol_type, decoder_from_symbol_type(symbol_type))
+        elif kind[0] == _RECORD_VALUE:
+            header = kind + file.read(_value_record_struct.size - 1)
+            if len(header) < _value_record_struct.size:
+                file.seek(position)
+                return
+            _, filetime, symbol_id, length = _value_record_struct.unpack(header)
+            data = bytearray(file.read(length))
+            if len(data) < length:
+                file.seek(position)
+                return
+            symbol = symbols[symbol_id]
+            yield filetime, symbol.name, symbol.decoder(data)
+        else:
+            raise ValueError(f"Corrupt notification log at byte {position}")
+
+
+def read_binary_block(data: bytes, symbols: dict[int, NotificationSymbol], names: Optional[set[str]] = None
+                      ) -> Iterator[tuple[int, str, Any]]:
+    """Decode complete records cut out of a binary notification log.
+
+    symbols has to hold the symbols defined before the block. Values of
+    symbols not in names are skipped without decoding them.
+    """
+    view = memoryview(data)
+    offset = 0
+    while offset < len(data):
+        if data[offset] == _RECORD_VALUE:
+            _, filetime, symbol_id, length = _value_record_struct.unpack_from(data, offset)
+            offset += _value_record_struct.size
+            symbol = symbols[symbol_id]
+            if names is None or symbol.name in names:
+                yield filetime, symbol.name, symbol.decoder(bytearray(view[offset:offset + length]))
+            offset += length
+        elif data[offset] == _RECORD_SYMBOL:
+            _, symbol_id, length = _symbol_record_struct.unpack_from(data, offset)
+            offset += _symbol_record_struct.size
+            name, symbol_type = bytes(view[offset:offset + length]).decode().split('\x00', 1)
+            symbols[symbol_id] = NotificationSymbol(symbol_id, name, symbol_type, decoder_from_symbol_type(symbol_type))
+            offset += length
+        else:
+            raise ValueError(f"Corrupt notification log block at byte {offset}")
+
+
+def read_binary_range(file: BinaryIO, start: int, end: Optional[int], symbols: dict[int, NotificationSymbol]
+                      ) -> Iterator[tuple[int, str, Any]]:
+    """Decode the records of a binary notification log between the offsets start and end, or the end of the file."""
+    file.seek(start)
+    yield from _read_records(file, symbols, end)
+
+
+def log_data_start(file: BinaryIO) -> int:
+    """Offset of the first record of a notification log, behind the header of a binary log."""
+    header = file.read(_log_header_struct.size)
+    if len(header) == _log_header_struct.size and _log_header_struct.unpack(header) == (_log_magic,
+                                                                                          _log_format_version):
+        return _log_header_struct.size
+    return 0
+
+
+def _check_header(file: BinaryIO):
+    header = file.read(_log_header_struct.size)
+    magic, format_version = _log_header_struct.unpack(header)
+    if magic != _log_magic or format_version != _log_format_version:
+        raise ValueError(f"{file.name} is not a notification log")
+
+
+def _scan_records(data: bytes, symbols: dict[int, NotificationSymbol], values: collections.deque) -> int:
+    """Step over the complete records in data without decoding the values, values keeps the last ones.
+
+    Returns the offset behind the last complete record.
+    """
+    offset = 0
+    size = len(data)
+    while offset < size:
+        if data[offset] == _RECORD_VALUE:
+            if offset + _value_record_struct.size > size:
+                break
+            _, filetime, symbol_id, length = _value_record_struct.unpack_from(data, offset)
+            end = offset + _value_record_struct.size + length
+            if end > size:
+                break
+            values.append((filetime, symbols[symbol_id], data[end - length:end]))
+        elif data[offset] == _RECORD_SYMBOL:
+            if offset + _symbol_record_struct.size > size:
+                break
+            _, symbol_id, length = _symbol_record_struct.unpack_from(data, offset)
+            end = offset + _symbol_record_struct.size + length
+            if end > size:
+                break
+            name, symbol_type = data[end - length:end].decode().split('\x00', 1)
+            symbols[symbol_id] = NotificationSymbol(symbol_id, name, symbol_type, decoder_from_symbol_type(symbol_type))
+        else:
+            raise ValueError(f"Corrupt notification log record {data[offset]}")
+        offset = end
+    return offset
+
+
+def _csv_tail_offset(file_path: str, tail: int) -> int:
+    """Offset of the first of the last tail complete lines of a csv log, found reading backwards from the end."""
+    with open(file_path, 'rb') as file:
+        position = file.seek(0, os.SEEK_END)
+        newlines = 0
+        while position > 0:
+            size = min(_TAIL_BLOCK_SIZE, position)
+            position -= size
+            file.seek(position)
+            block = file.read(size)
+            index = len(block)
+            while True:
+                index = block.rfind(b'\n', 0, index)
+                if index < 0:
+                    break
+                # The first newline ends the last complete line
+                newlines += 1
+                if newlines > tail:
+                    return position + index + 1
+    return 0
+
+
+def read_binary_log(file_path: str) -> Iterator[tuple[int, str, Any]]:
+    with open(file_path, 'rb') as file:
+        _check_header(file)
+        yield from _read_records(file)
+
+
+class NotificationLogFollower:
+    """Reads what got appended to a notification log since the last call, without blocking.
+
+    Rows are formatted like the csv log, the first call returns the last
+    tail rows already in the file.
+    """
+
+    def __init__(self, file_path: str, log_format: str, tail: int = 10):
+        self._file_path = file_path
+        self._log_format = log_format
+        self._tail = tail
+        self._file = None
+        # The symbol records of a binary log are only written once per file
+        self._symbols: dict[int, NotificationSymbol] = {}
+        self._partial_line = ''
+        self._first_open = True
+
+    def _open(self) -> bool:
+        if not os.path.isfile(self._file_path):
+            return False
+        if self._log_format == LOG_FORMAT_BINARY:
+            if os.path.getsize(self._file_path) < _log_header_struct.size:
+                return False
+            self._file = open(self._file_path, 'rb')
+            _check_header(self._file)
+        else:
+            self._file = open(self._file_path, 'r', newline='')
+        return True
+
+    def _read_binary(self) -> list[tuple[str, str, str]]:
+        return [(filetime_to_str(filetime), name, str(value))
+                for filetime, name, value in _read_records(self._file, self._symbols)]
+
+    def _read_csv(self) -> list[tuple[str, str, str]]:
+        content = self._partial_line + self._file.read()
+        lines = content.split('\n')
+        # The writer may be in the middle of a line
+        self._partial_line = lines.pop()
+        return [tuple(row) for row in csv.reader(lines) if row]
+
+    def _binary_tail_start(self, data_start: int) -> int:
+        """Offset of the index block the last tail records start in, the log is scanned from data_start without one."""
+        # The index module builds on this one
+        from implementations.tc.notification_index import NotificationIndex, index_file_path
+        try:
+            index = NotificationIndex.read(index_file_path(self._file_path)).with_gaps(
+                data_start, os.fstat(self._file.fileno()).st_size)
+        except (OSError, ValueError):
+            return data_start
+        index_range = index.tail_range(self._tail)
+        if index_range is None:
+            return data_start
+        # Symbols defined before the block, the scan adds the ones defined in there
+        self._symbols = dict(index.symbols(index_range.session))
+        return index_range.start
+
+    def _read_tail(self) -> list[tuple[str, str, str]]:
+        # Only the last rows get decoded and formatted, a big log mustn't hold up the event loop
+        if self._log_format != LOG_FORMAT_BINARY:
+            self._file.seek(_csv_tail_offset(self._file_path, self._tail))
+            return self._read_csv()
+        values = collections.deque(maxlen=self._tail)
+        position = self._binary_tail_start(self._file.tell())
+        self._file.seek(position)
+        data = b''
+        while True:
+            chunk = self._file.read(_TAIL_BLOCK_SIZE)
+            if not chunk:
+                break
+            data += chunk
+            offset = _scan_records(data, self._symbols, values)
+            position += offset
+            data = data[offset:]
+        # Go on behind the last complete record
+        self._file.seek(position)
+        return [(filetime_to_str(filetime), symbol.name, str(symbol.decoder(bytearray(data))))
+                for filetime, symbol, data in values]
+
+    def _rotated(self) -> bool:
+        try:
+            return os.stat(self._file_path).st_ino != os.fstat(self._file.fileno()).st_ino
+        except FileNotFoundError:
+            return True
+
+    def read(self) -> list[tuple[str, str, str]]:
+        if self._file is None:
+            if not self._open():
+                return []
+            if self._first_open:
+                self._first_open = False
+                return self._read_tail()
+        rows = self._read_binary() if self._log_format == LOG_FORMAT_BINARY else self._read_csv()
+        if self._rotated():
+            # The log got rotated, what got written to the old file is read, continue with the new one
+            rows += self._read_binary() if self._log_format == LOG_FORMAT_BINARY else self._read_csv()
+            self.close()
+        return rows
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._symbols = {}
+            self._partial_line = ''
+
+
+def read_csv_log(file_path: str) -> Iterator[tuple[str, str, str]]:
+    with open(file_path, 'r', newline='') as file:
+        yield from csv.reader(file)
+
+
+def export_notifications(file_path: str, log_format: str, export_format: str, export_file_path: str) -> int:
+    if log_format == LOG_FORMAT_BINARY:
+        rows = ((filetime_to_str(filetime), name, value) for filetime, name, value in read_binary_log(file_path))
+    else:
+        rows = read_csv_log(file_path)
+
+    count = 0
+    with open(export_file_path, 'w', newline='') as export_file:
+        if export_format == 'csv':
+            writer = csv.writer(export_file)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        elif export_format == 'json':
+            export_file.write('[\n')
+            for timestamp, name, value in rows:
+                if count:
+                    export_file.write(',\n')
+                json.dump({'timestamp': timestamp, 'symbol': name, 'value': value}, export_file, default=str)
+                count += 1
+            export_file.write('\n]\n')
+        else:
+            raise ValueError(f"Unknown export format {export_format}")
+    return count
@@ -0,0 +1,147 @@
+from ctypes import sizeof
+from dataclasses import dataclass
+from typing import Optional
+
+from pyads import AdsSymbol, NotificationAttrib
+from pyads.constants import ADSTRANS_SERVERCYCLE, ADSTRANS_SERVERONCHA
+from pyads.pyads_ex import type_is_string
+
+from implementations.tc.data_classes import AdsSettings
+from utilities.functions import parse_options
+
+MODE_CHANGE = 'change'
+MODE_CYCLIC = 'cyclic'
+OPTION_KEYS = ('cycle', 'max_delay', 'mode', 'size')
+
+_trans_modes = {MODE_CHANGE: ADSTRANS_SERVERONCHA, MODE_CYCLIC: ADSTRANS_SERVERCYCLE}
+# AMS/TCP and AMS header, length and stamp count of a device notification
+# frame, plus timestamp and sample count of its stamp
+_FRAME_OVERHEAD = 6 + 32 + 8 + 12
+# Notification handle and size in front of every sample
+_SAMPLE_OVERHEAD = 8
+
+
+@dataclass
+class NotificationOptions:
+    """Notification attributes given for a symbol, None takes the one of the settings. Times in ms."""
+    cycle_time: Optional[float] = None
+    max_delay: Optional[float] = None
+    mode: Optional[str] = None
+    size: Optional[int] = None
+
+    def __str__(self):
+        tokens = []
+        if self.cycle_time is not None:
+            tokens.append(f'cycle={self.cycle_time:g}')
+        if self.max_delay is not None:
+            tokens.append(f'max_delay={self.max_delay:g}')
+        if self.mode is not None:
+            tokens.append(f'mode={self.mode}')
+        if self.size is not None:
+            tokens.append(f'size={self.size}')
+        return ' '.join(tokens)
+
+
+def parse_notification_options(payload: Optional[list[str]]) -> tuple[NotificationOptions, list[str]]:
+    """Split cycle=, max_delay=, mode= and size= off a payload, raises ValueError on invalid values."""
+    options, rest = parse_options(payload, OPTION_KEYS)
+    notification_options = NotificationOptions()
+    try:
+        if 'cycle' in options:
+            notification_options.cycle_time = float(options['cycle'])
+        if 'max_delay' in options:
+            notification_options.max_delay = float(options['max_delay'])
+        if 'size' in options:
+            notification_options.size = int(options['size'])
+    except ValueError as e:
+        raise ValueError(f"Invalid notification option: {e}")
+    if 'mode' in options:
+        if options['mode'] not in _trans_modes:
+            raise ValueError(f"Unknown notification mode {options['mode']}, use {' or '.join(_trans_modes)}")
+        notification_options.mode = options['mode']
+    if (notification_options.cycle_time or 0) < 0 or (notification_options.max_delay or 0) < 0 or \
+            (notification_options.size is not None and notification_options.size <= 0):
+        raise ValueError("cycle and max_delay must not be negative, size must be greater than 0")
+    return notification_options, rest
+
+
+def notification_entry_name(entry: str) -> str:
+    """Symbol name of a notification list entry, which may have options after the name."""
+    return entry.split(maxsplit=1)[0] if entry.strip() else entry
+
+
+def parse_notification_entry(entry: str) -> tuple[str, NotificationOptions]:
+    """Symbol name and options of a notification list entry like MAIN.x cycle=100 mode=cyclic."""
+    name, *payload = entry.split()
+    options, rest = parse_notification_options(payload)
+    if rest:
+        raise ValueError(f"Unknown notification option {rest[0]} for {name}")
+    return name, options
+
+
+def notification_entry(name: str, options: NotificationOptions) -> str:
+    return f'{name} {options}'.rstrip()
+
+
+@dataclass
+class NotificationSetup:
+    """Notification attributes of a symbol, with the settings filled in for the options not given."""
+    symbol: str
+    mode: str
+    cycle_time: float
+    max_delay: float
+    size: int
+    # Only part of the value gets notified, it can't be decoded like the symbol type anymore
+    partial: bool
+
+    def attrib(self) -> NotificationAttrib:
+        attrib = NotificationAttrib(self.size, _trans_modes[self.mode])
+        # ms to the 100 ns units of ADS
+        attrib.max_delay = int(self.max_delay * 1e4)
+        attrib.cycle_time = int(self.cycle_time * 1e4)
+        return attrib
+
+
+def notification_setup(symbol: AdsSymbol, options: NotificationOptions, settings: AdsSettings) -> NotificationSetup:
+    """Raises ValueError if the size is bigger than the symbol."""
+    symbol_size = sizeof(symbol.plc_type) if symbol.plc_type else 0
+    size = options.size or symbol_size
+    if not size:
+        raise ValueError(f"Size of {symbol.name} of type {symbol.symbol_type} unknown, set size=")
+    if symbol_size and size > symbol_size:
+        raise ValueError(f"size={size} is bigger than {symbol.name}, which has {symbol_size} bytes")
+    mode = options.mode or settings.notification_mode
+    if mode not in _trans_modes:
+        raise ValueError(f"Unknown notification mode {mode}, use {' or '.join(_trans_modes)}")
+    return NotificationSetup(
+        symbol.name, mode,
+        settings.notification_cycle_time if options.cycle_time is None else options.cycle_time,
+        settings.notification_max_delay if options.max_delay is None else options.max_delay,
+        size, size != symbol_size and not (symbol.plc_type and type_is_string(symbol.plc_type)))
+
+
+@dataclass
+class NotificationRate:
+    symbol: str
+    mode: str
+    cycle_ms: float
+    max_delay_ms: float
+    size: int
+    events_per_s: float
+    frames_per_s: float
+    bytes_per_s: float
+    observed_per_s: Optional[float] = None
+
+
+def notification_rate(setup: NotificationSetup, plc_cycle_time: float) -> NotificationRate:
+    """Notifications, ADS frames and bytes per second a symbol costs at most.
+
+    A cyclic notification comes every cycle, one on change at most every
+    cycle. The server collects the samples for up to max delay into one frame.
+    """
+    interval = max(setup.cycle_time, plc_cycle_time)
+    events_per_s = 1000 / interval if interval else 0
+    frames_per_s = min(events_per_s, 1000 / setup.max_delay) if setup.max_delay else events_per_s
+    return NotificationRate(setup.symbol, setup.mode, setup.cycle_time, setup.max_delay, setup.size, events_per_s,
+                            frames_per_s,
+                            events_per_s * (_SAMPLE_OVERHEAD + setup.size) + frames_per_s * _FRAME_OVERHEAD)
@@ -0,0 +1,191 @@
+import csv
+import io
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Iterator, Optional
+
+from implementations.tc.notification_index import NotificationIndex, IndexRange, index_file_path
+from implementations.tc.notification_log import LOG_FORMAT_BINARY, NotificationSymbol, filetime_to_str, \
+    datetime_to_filetime, log_data_start, read_binary_block, read_binary_range
+from implementations.tc.notification_rotation import COMPRESSED_SUFFIX, read_manifest, open_segment
+from utilities.file import FileCache
+
+_date_time_formats = ('%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M', '%Y-%m-%d')
+_time_formats = ('%H:%M:%S.%f', '%H:%M:%S', '%H:%M')
+
+
+def parse_query_time(text: str) -> int:
+    """FILETIME of YYYY-mm-ddTHH:MM[:SS] or of HH:MM[:SS] today.
+
+    Times are taken like the log shows them, which is the UTC time of the PLC timestamps.
+    """
+    for time_format in _date_time_formats:
+        try:
+            return datetime_to_filetime(datetime.strptime(text, time_format))
+        except ValueError:
+            pass
+    for time_format in _time_formats:
+        try:
+            time_of_day = datetime.strptime(text, time_format).time()
+        except ValueError:
+            continue
+        return datetime_to_filetime(datetime.combine(datetime.now(timezone.utc).date(), time_of_day))
+    raise ValueError(f"Invalid time {text}, use HH:MM[:SS] or YYYY-mm-ddTHH:MM[:SS]")
+
+
+@dataclass
+class QueryRow:
+    timestamp: str
+    value: Any
+
+
+@dataclass
+class QueryAggregate:
+    symbol: str
+    count: int = 0
+    min: Optional[float] = None
+    max: Optional[float] = None
+    mean: Optional[float] = None
+    first: Any = None
+    last: Any = None
+
+
+@dataclass
+class QueryReport:
+    files: int = 0
+    ranges: int = 0
+    unindexed_ranges: int = 0
+    bytes_read: int = 0
+    elapsed: float = 0
+
+    def __str__(self):
+        return (f"{self.files} log files, {self.ranges} ranges read ({self.unindexed_ranges} not indexed), "
+                f"{self.bytes_read} bytes, {self.elapsed * 1e3:.1f} ms")
+
+
+class NotificationQuery:
+    """Notifications of a symbol in a time range, from the notification log and its rotated segments.
+
+    Only the ranges the index lists for the symbol and time are read, a log
+    without an index is scanned as a whole.
+    """
+
+    def __init__(self, file_path: str, log_format: str):
+        self._file_path = file_path
+        self._directory = os.path.dirname(os.path.abspath(file_path))
+        self._log_format = log_format
+        self._indexes: dict[str, FileCache] = {}
+
+    def _log_files(self, first: int, last: int) -> list[str]:
+        file_paths = []
+        for segment in read_manifest(self._file_path):
+            if segment['first_filetime'] is None or segment['last_filetime'] < first or \
+                    segment['first_filetime'] > last:
+                continue
+            file_paths.append(os.path.join(self._directory, segment['file']))
+        file_paths.append(self._file_path)
+        return [file_path for file_path in file_paths if os.path.isfile(file_path)]
+
+    def _index(self, file_path: str) -> Optional[NotificationIndex]:
+        index_path = index_file_path(file_path)
+        cache = self._indexes.get(index_path)
+        if cache is None:
+            cache = self._indexes[index_path] = FileCache(index_path, lambda: NotificationIndex.read(index_path))
+        return cache.get()
+
+    def rows(self, name: str, first: int, last: int, report: QueryReport) -> Iterator[tuple[str, Any]]:
+        """Timestamp and value of the notifications of the symbol between the FILETIMEs first and last."""
+        start = time.perf_counter()
+        try:
+            for file_path in self._log_files(first, last):
+                report.files += 1
+                yield from self._file_rows(file_path, name, first, last, report)
+        finally:
+            report.elapsed += time.perf_counter() - start
+
+    def _file_rows(self, file_path: str, name: str, first: int, last: int, report: QueryReport
+                   ) -> Iterator[tuple[str, Any]]:
+        compressed = file_path.endswith(COMPRESSED_SUFFIX)
+        index = self._index(file_path)
+        if index is None and compressed:
+            report.unindexed_ranges += 1
+            with open_segment(file_path) as file:
+                yield from self._scan(file, log_data_start(file), None, {}, name, first, last)
+            return
+
+        with open(file_path, 'rb') as file:
+            data_start = log_data_start(file)
+            if not compressed:
+                index = (index or NotificationIndex()).with_gaps(data_start, os.path.getsize(file_path))
+            for index_range in index.select(name, first, last):
+                report.ranges += 1
+                report.unindexed_ranges += int(index_range.gap)
+                report.bytes_read += index_range.clength or index_range.end - index_range.start
+                # Symbol records in the range replace entries, the ones of the index stay as they are
+                symbols = dict(index.symbols(index_range.session))
+                if index_range.gap and not compressed:
+                    # Gaps can be big, they are read record by record
+                    yield from self._scan(file, index_range.start, index_range.end, symbols, name, first, last)
+                else:
+                    yield from self._block_rows(index_range, file, symbols, name, first, last)
+
+    def _block_rows(self, index_range: IndexRange, file: BinaryIO, symbols: dict[int, NotificationSymbol],
+                    name: str, first: int, last: int) -> Iterator[tuple[str, Any]]:
+        data = index_range.read(file)
+        if self._log_format == LOG_FORMAT_BINARY:
+            for filetime, _, value in read_binary_block(data, symbols, {name}):
+                if first <= filetime <= last:
+                    yield filetime_to_str(filetime), value
+        else:
+            yield from _csv_rows(csv.reader(io.StringIO(data.decode(), newline='')), name, first, last)
+
+    def _scan(self, file: BinaryIO, start: int, end: Optional[int], symbols: dict[int, NotificationSymbol],
+              name: str, first: int, last: int) -> Iterator[tuple[str, Any]]:
+        if self._log_format == LOG_FORMAT_BINARY:
+            for filetime, symbol_name, value in read_binary_range(file, start, end, symbols):
+                if symbol_name == name and first <= filetime <= last:
+                    yield filetime_to_str(filetime), value
+        else:
+            file.seek(start)
+            yield from _csv_rows(csv.reader(line.decode() for line in _lines(file, end)), name, first, last)
+
+    def aggregate(self, name: str, first: int, last: int, report: QueryReport) -> QueryAggregate:
+        aggregate = QueryAggregate(name)
+        total = 0.0
+        numeric = 0
+        for _, value in self.rows(name, first, last, report):
+            if not aggregate.count:
+                aggregate.first = value
+            aggregate.last = value
+            aggregate.count += 1
+            try:
+                number = float(value)
+            except (TypeError, ValueError):
+                continue
+            numeric += 1
+            total += number
+            aggregate.min = number if aggregate.min is None else min(aggregate.min, number)
+            aggregate.max = number if aggregate.max is None else max(aggregate.max, number)
+        if numeric:
+            aggregate.mean = total / numeric
+        return aggregate
+
+
+def _lines(file: BinaryIO, end: Optional[int]) -> Iterator[bytes]:
+    position = file.tell()
+    for line in file:
+        if end is not None and position >= end:
+            return
+        position += len(line)
+        yield line
+
+
+def _csv_rows(rows: Iterator[list[str]], name: str, first: int, last: int) -> Iterator[tuple[str, Any]]:
+    # The csv log has the timestamps as text, which compares like the time
+    first_str = filetime_to_str(first)
+    last_str = filetime_to_str(last)
+    for row in rows:
+        if len(row) == 3 and row[1] == name and first_str <= row[0] <= last_str:
+            yield row[0], row[2]
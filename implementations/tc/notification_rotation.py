@@ -0,0 +1,256 @@
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+from implementations.tc.notification_index import compress_indexed, index_file_path
+from implementations.tc.notification_log import NotificationEvent, filetime_to_str, log_data_start
+
+COMPRESSION_NONE = 'none'
+COMPRESSION_GZIP = 'gzip'
+COMPRESSED_SUFFIX = '.gz'
+# Seconds to wait before trying again after a segment couldn't be renamed
+ROTATION_RETRY_INTERVAL = 10
+
+
+def manifest_file_path(file_path: str) -> str:
+    return f'{file_path}.manifest.json'
+
+
+def read_manifest(file_path: str) -> list[dict]:
+    """Closed segments of a rotated notification log, oldest first."""
+    try:
+        with open(manifest_file_path(file_path), 'r') as manifest_file:
+            return json.load(manifest_file)
+    except FileNotFoundError:
+        return []
+
+
+def open_segment(segment_path: str, mode: str = 'rb'):
+    if segment_path.endswith(COMPRESSED_SUFFIX):
+        return gzip.open(segment_path, mode if 'b' in mode else mode + 't', newline='' if 'b' not in mode else None)
+    return open(segment_path, mode, newline='' if 'b' not in mode else None)
+
+
+class SegmentCompressor:
+    """Compresses closed segments and keeps the manifest, on a thread of its own.
+
+    The manifest is only written from this thread. Segments that were not
+    compressed yet when the console stopped are compressed on the next start.
+    """
+
+    def __init__(self, file_path: str, compression: str, keep_segments: int):
+        self._file_path = file_path
+        self._directory = os.path.dirname(os.path.abspath(file_path))
+        self._compression = compression
+        self._keep_segments = keep_segments
+        self._queue: queue.Queue[Optional[dict]] = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self.compressed = 0
+        self.removed = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='SegmentCompressor', daemon=True)
+            self._thread.start()
+
+    def add(self, segment: dict):
+        self._queue.put(segment)
+
+    def stop(self):
+        if self._thread is not None:
+            # Segments not compressed yet stay in the manifest for the next start
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _write_manifest(self, segments: list[dict]):
+        tmp_file_path = f'{manifest_file_path(self._file_path)}.tmp'
+        with open(tmp_file_path, 'w') as manifest_file:
+            json.dump(segments, manifest_file, indent=4)
+        os.replace(tmp_file_path, manifest_file_path(self._file_path))
+
+    def _compress(self, segment: dict):
+        segment_path = os.path.join(self._directory, segment['file'])
+        compressed_path = segment_path + COMPRESSED_SUFFIX
+        with open(segment_path, 'rb') as source:
+            data_start = log_data_start(source)
+        # Indexed segments get a gzip member per index block, so queries can still seek
+        if not compress_indexed(segment_path, compressed_path, data_start):
+            with open(segment_path, 'rb') as source, gzip.open(f'{compressed_path}.tmp', 'wb') as target:
+                shutil.copyfileobj(source, target)
+            os.replace(f'{compressed_path}.tmp', compressed_path)
+        os.remove(segment_path)
+        segment['file'] += COMPRESSED_SUFFIX
+        segment['compressed_size'] = os.path.getsize(compressed_path)
+        self.compressed += 1
+
+    def _apply_retention(self, segments: list[dict]) -> list[dict]:
+        if not self._keep_segments or len(segments) <= self._keep_segments:
+            return segments
+        for segment in segments[:-self._keep_segments]:
+            segment_path = os.path.join(self._directory, segment['file'])
+            for file_path in (segment_path, index_file_path(segment_path)):
+                if os.path.isfile(file_path):
+                    os.remove(file_path)
+            self.removed += 1
+        return segments[-self._keep_segments:]
+
+    def _run(self):
+        segments = read_manifest(self._file_path)
+        pending = [segment for segment in segments if not segment['file'].endswith(COMPRESSED_SUFFIX)
+                   and os.path.isfile(os.path.join(self._directory, segment['file']))]
+        while True:
+            # New segments go into the manifest before the next compression starts
+            try:
+                segment = self._queue.get(block=not pending)
+            except queue.Empty:
+                pass
+            else:
+                if segment is None:
+                    break
+                segments.append(segment)
+                pending.append(segment)
+                segments = self._apply_retention(segments)
+                self._write_manifest(segments)
+                continue
+
+            segment = pending.pop(0)
+            # Not removed by the retention in the meantime
+            if segment in segments and self._compression == COMPRESSION_GZIP:
+                self._compress(segment)
+                self._write_manifest(segments)
+
+
+class RotatingNotificationSink:
+    """Notification log sink starting a new segment once the log got too big or too old.
+
+    The log always gets written to file_path. On rotation it's renamed to a
+    segment file next to it, which is handed over to a SegmentCompressor, so
+    the writer never waits for the compression.
+    """
+
+    def __init__(self, make_sink: Callable[[str], object], file_path: str, max_bytes: int, max_age: float,
+                 compression: str, keep_segments: int):
+        if compression not in (COMPRESSION_NONE, COMPRESSION_GZIP):
+            raise ValueError(f"Unknown notification log compression {compression}")
+        self._make_sink = make_sink
+        self._file_path = file_path
+        self._max_bytes = max_bytes
+        self._max_age = max_age
+        self._sink = None
+        self._compressor = SegmentCompressor(file_path, compression, keep_segments)
+        self._opened_at = 0.0
+        self._first_filetime: Optional[int] = None
+        self._last_filetime: Optional[int] = None
+        self._events = 0
+        self._retry_at = 0.0
+        self.rotations = 0
+        self.failed_rotations = 0
+        self.last_error: Optional[str] = None
+
+    def __str__(self):
+        text = (f"{self.rotations} rotations ({self.failed_rotations} failed), "
+                f"{self._compressor.compressed} segments compressed, {self._compressor.removed} removed")
+        if self.last_error:
+            text += f", last error: {self.last_error}"
+        return text
+
+    def open(self):
+        self._compressor.start()
+        self._open_segment()
+
+    def _open_segment(self):
+        self._sink = self._make_sink(self._file_path)
+        self._sink.open()
+        self._opened_at = time.monotonic()
+        self._first_filetime = None
+        self._last_filetime = None
+        self._events = 0
+
+    def _segment_file_name(self) -> str:
+        root, ext = os.path.splitext(os.path.basename(self._file_path))
+        name = f"{root}.{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        directory = os.path.dirname(os.path.abspath(self._file_path))
+        # Two rotations within a second, or a segment from an earlier run
+        candidate = f'{name}{ext}'
+        counter = 1
+        while any(os.path.exists(os.path.join(directory, candidate + suffix)) for suffix in ('', COMPRESSED_SUFFIX)):
+            candidate = f'{name}.{counter}{ext}'
+            counter += 1
+        return candidate
+
+    def _rotation_failed(self, error: OSError):
+        self.failed_rotations += 1
+        self.last_error = str(error)
+        self._retry_at = time.monotonic() + ROTATION_RETRY_INTERVAL
+        print(f"Notification log not rotated, trying again in {ROTATION_RETRY_INTERVAL} s: {error}")
+
+    def _rotate(self):
+        self._sink.close()
+        segment_file_name = self._segment_file_name()
+        segment_path = os.path.join(os.path.dirname(os.path.abspath(self._file_path)), segment_file_name)
+        try:
+            size = os.path.getsize(self._file_path)
+            os.replace(self._file_path, segment_path)
+        except OSError as e:
+            # On Windows a log another console follows can't be renamed, the segment goes on
+            self._rotation_failed(e)
+            self._sink = self._make_sink(self._file_path)
+            self._sink.open()
+            return
+        try:
+            if os.path.isfile(index_file_path(self._file_path)):
+                os.replace(index_file_path(self._file_path), index_file_path(segment_path))
+        except OSError as e:
+            # The segment is read without an index then, the new log truncates the old one
+            self._rotation_failed(e)
+        self._compressor.add({
+            'file': segment_file_name,
+            'first': filetime_to_str(self._first_filetime) if self._first_filetime is not None else None,
+            'last': filetime_to_str(self._last_filetime) if self._last_filetime is not None else None,
+            'first_filetime': self._first_filetime,
+            'last_filetime': self._last_filetime,
+            'events': self._events,
+            'size': size,
+        })
+        self.rotations += 1
+        self._open_segment()
+
+    def _needs_rotation(self) -> bool:
+        if not self._events or time.monotonic() < self._retry_at:
+            return False
+        if self._max_age and time.monotonic() - self._opened_at >= self._max_age:
+            return True
+        if not self._max_bytes:
+            return False
+        try:
+            return os.path.getsize(self._file_path) >= self._max_bytes
+        except OSError as e:
+            self._rotation_failed(e)
+            return False
+
+    def write(self, events: list[NotificationEvent]):
+        self._sink.write(events)
+        # Events of several symbols and connections don't come in time order
+        filetimes = [filetime for filetime, _, _ in events]
+        first, last = min(filetimes), max(filetimes)
+        if self._first_filetime is None or first < self._first_filetime:
+            self._first_filetime = first
+        if self._last_filetime is None or last > self._last_filetime:
+            self._last_filetime = last
+        self._events += len(events)
+
+    def flush(self):
+        self._sink.flush()
+        if self._needs_rotation():
+            self._rotate()
+
+    def close(self):
+        self._sink.close()
+        self._compressor.stop()
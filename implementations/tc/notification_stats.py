@@ -0,0 +1,254 @@
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+from pyads import AdsSymbol
+from pyads.constants import DATATYPE_MAP
+from pyads.pyads_ex import type_is_string
+
+from implementations.tc.notification_log import NotificationEvent, NotificationSymbol
+
+FILETIME_PER_SECOND = 10_000_000
+# Buckets per window, the window moves on in steps of window / buckets
+WINDOW_BUCKETS = 20
+
+_sum_fields = ('count', 'value_count', 'sum', 'square_sum', 'interval_count', 'interval_sum')
+_min_fields = ('min', 'interval_min')
+_max_fields = ('max', 'interval_max')
+_bucket_dtype = np.dtype([('id', np.int64)] + [(name, np.float64) for name in _sum_fields + _min_fields + _max_fields])
+
+
+def numeric_dtype(symbol_type: str) -> Optional[np.dtype]:
+    """NumPy type to decode a whole batch of values of a scalar symbol at once, None for other symbols."""
+    try:
+        plc_type = AdsSymbol.get_type_from_str(symbol_type)
+    except TypeError:
+        return None
+    if plc_type is None or type_is_string(plc_type) or plc_type not in DATATYPE_MAP:
+        return None
+    return np.dtype(DATATYPE_MAP[plc_type])
+
+
+def _empty_buckets(count: int) -> np.ndarray:
+    buckets = np.zeros(count, dtype=_bucket_dtype)
+    buckets['id'] = -1
+    for name in _min_fields:
+        buckets[name] = math.inf
+    for name in _max_fields:
+        buckets[name] = -math.inf
+    return buckets
+
+
+class _Accumulator:
+    """Sums, minimum and maximum of the values and the intervals between them, per time bucket.
+
+    Values are summed relative to the first value of the symbol, which keeps
+    the variance exact for values far away from 0.
+    """
+
+    def __init__(self, bucket_width: float, bucket_count: int):
+        self.bucket_width = bucket_width
+        self.buckets = _empty_buckets(bucket_count)
+
+    def add(self, timestamps: np.ndarray, values: Optional[np.ndarray], intervals: np.ndarray):
+        """values and intervals are NaN where there is none."""
+        bucket_ids = (timestamps // self.bucket_width).astype(np.int64)
+        # Notifications arrive in time order, a batch covers one or a few buckets
+        starts = np.flatnonzero(np.r_[True, bucket_ids[1:] != bucket_ids[:-1]])
+        has_interval = ~np.isnan(intervals)
+        interval_values = np.where(has_interval, intervals, 0)
+        group_sums = {
+            'count': np.add.reduceat(np.ones(len(timestamps)), starts),
+            'interval_count': np.add.reduceat(has_interval.astype(np.float64), starts),
+            'interval_sum': np.add.reduceat(interval_values, starts),
+        }
+        group_mins = {'interval_min': np.minimum.reduceat(np.where(has_interval, intervals, math.inf), starts)}
+        group_maxs = {'interval_max': np.maximum.reduceat(np.where(has_interval, intervals, -math.inf), starts)}
+        if values is not None:
+            has_value = ~np.isnan(values)
+            sum_values = np.where(has_value, values, 0)
+            group_sums['value_count'] = np.add.reduceat(has_value.astype(np.float64), starts)
+            group_sums['sum'] = np.add.reduceat(sum_values, starts)
+            group_sums['square_sum'] = np.add.reduceat(sum_values * sum_values, starts)
+            group_mins['min'] = np.minimum.reduceat(np.where(has_value, values, math.inf), starts)
+            group_maxs['max'] = np.maximum.reduceat(np.where(has_value, values, -math.inf), starts)
+
+        buckets = self.buckets
+        for group, bucket_id in enumerate(bucket_ids[starts]):
+            index = bucket_id % len(buckets)
+            if buckets['id'][index] != bucket_id:
+                if buckets['id'][index] > bucket_id:
+                    # Older than the whole window
+                    continue
+                buckets[index] = _empty_buckets(1)[0]
+                buckets['id'][index] = bucket_id
+            for name, sums in group_sums.items():
+                buckets[name][index] += sums[group]
+            for name, mins in group_mins.items():
+                buckets[name][index] = min(buckets[name][index], mins[group])
+            for name, maxs in group_maxs.items():
+                buckets[name][index] = max(buckets[name][index], maxs[group])
+
+    def total(self, now: Optional[float] = None) -> np.void:
+        """Buckets summed up, with now only the ones inside the window ending at now."""
+        buckets = self.buckets[self.buckets['id'] >= 0]
+        if now is not None:
+            now_id = int(now // self.bucket_width)
+            buckets = buckets[(buckets['id'] > now_id - len(self.buckets)) & (buckets['id'] <= now_id)]
+        total = _empty_buckets(1)[0]
+        if len(buckets):
+            for name in _sum_fields:
+                total[name] = buckets[name].sum()
+            for name in _min_fields:
+                total[name] = buckets[name].min()
+            for name in _max_fields:
+                total[name] = buckets[name].max()
+        return total
+
+
+@dataclass(slots=True)
+class NotificationStatsRow:
+    symbol: str
+    window: str
+    count: int
+    rate: float
+    min: Optional[float]
+    max: Optional[float]
+    mean: Optional[float]
+    std: Optional[float]
+    interval_mean_ms: Optional[float]
+    interval_min_ms: Optional[float]
+    interval_max_ms: Optional[float]
+
+
+class SymbolStats:
+    def __init__(self, symbol: NotificationSymbol, windows: list[float]):
+        self.symbol = symbol
+        self.dtype = numeric_dtype(symbol.symbol_type)
+        self.reference: Optional[float] = None
+        self.first_timestamp: Optional[float] = None
+        self.last_timestamp: Optional[float] = None
+        self.last_filetime: Optional[int] = None
+        # Notifications whose size doesn't fit the symbol type, they are counted but have no value
+        self.size_mismatches = 0
+        self.windows = [(window, _Accumulator(window / WINDOW_BUCKETS, WINDOW_BUCKETS)) for window in windows]
+        # One bucket that never moves on holds the statistics since the start
+        self.lifetime = _Accumulator(math.inf, 1)
+
+    def _values(self, datas: list[bytearray]) -> np.ndarray:
+        itemsize = self.dtype.itemsize
+        valid = np.fromiter((len(data) == itemsize for data in datas), dtype=bool, count=len(datas))
+        if valid.all():
+            return np.frombuffer(b''.join(datas), dtype=self.dtype).astype(np.float64)
+        self.size_mismatches += int(len(datas) - valid.sum())
+        values = np.full(len(datas), np.nan)
+        values[valid] = np.frombuffer(b''.join(data for data, ok in zip(datas, valid) if ok), dtype=self.dtype)
+        return values
+
+    def add(self, filetimes: np.ndarray, datas: list[bytearray]):
+        values = None
+        if self.dtype is not None:
+            values = self._values(datas)
+            if self.reference is None:
+                has_value = np.flatnonzero(~np.isnan(values))
+                if len(has_value):
+                    self.reference = values[has_value[0]]
+            if self.reference is not None:
+                values -= self.reference
+        # Intervals from the int64 FILETIMEs, as float seconds they'd lose the 100 ns resolution
+        intervals = np.empty(len(filetimes))
+        intervals[0] = np.nan if self.last_filetime is None else filetimes[0] - self.last_filetime
+        intervals[1:] = np.diff(filetimes)
+        intervals /= FILETIME_PER_SECOND
+        timestamps = filetimes / FILETIME_PER_SECOND
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamps[0]
+        self.last_timestamp = timestamps[-1]
+        self.last_filetime = int(filetimes[-1])
+        for _, accumulator in self.windows:
+            accumulator.add(timestamps, values, intervals)
+        self.lifetime.add(np.zeros(len(timestamps)), values, intervals)
+
+    def _row(self, window_name: str, total: np.void, duration: float) -> NotificationStatsRow:
+        count = int(total['count'])
+        row = NotificationStatsRow(self.symbol.name, window_name, count, count / duration if duration > 0 else 0,
+                                   None, None, None, None, None, None, None)
+        value_count = total['value_count']
+        if value_count and self.dtype is not None:
+            mean = total['sum'] / value_count
+            row.min = total['min'] + self.reference
+            row.max = total['max'] + self.reference
+            row.mean = mean + self.reference
+            row.std = math.sqrt(max(total['square_sum'] / value_count - mean * mean, 0))
+        if total['interval_count']:
+            row.interval_mean_ms = total['interval_sum'] / total['interval_count'] * 1e3
+            row.interval_min_ms = total['interval_min'] * 1e3
+            row.interval_max_ms = total['interval_max'] * 1e3
+        return row
+
+    def rows(self, now: float) -> list[NotificationStatsRow]:
+        rows = []
+        for window, accumulator in self.windows:
+            duration = min(window, now - self.first_timestamp)
+            rows.append(self._row(f'{window:g} s', accumulator.total(now), duration))
+        rows.append(self._row('all', self.lifetime.total(), now - self.first_timestamp))
+        return rows
+
+
+class NotificationStatsSink:
+    """Rolling statistics per notification symbol, fed with the batches of the notification writer.
+
+    Every symbol keeps a fixed number of time buckets per window, the memory
+    doesn't grow with the number of notifications. Time is the PLC timestamp
+    of the notifications.
+    """
+
+    def __init__(self, windows: list[float]):
+        self._windows = windows
+        self._stats: dict[int, SymbolStats] = {}
+        self._lock = threading.Lock()
+        # Latest PLC time seen and when, to move the windows on while no notification comes in
+        self._last_timestamp: Optional[float] = None
+        self._last_monotonic = 0.0
+
+    def open(self):
+        pass
+
+    def write(self, events: list[NotificationEvent]):
+        by_symbol: dict[int, tuple[NotificationSymbol, list[int], list[bytearray]]] = {}
+        for filetime, symbol, data in events:
+            entry = by_symbol.get(symbol.id)
+            if entry is None:
+                entry = by_symbol[symbol.id] = (symbol, [], [])
+            entry[1].append(filetime)
+            entry[2].append(data)
+
+        with self._lock:
+            for symbol_id, (symbol, filetimes, datas) in by_symbol.items():
+                stats = self._stats.get(symbol_id)
+                if stats is None:
+                    stats = self._stats[symbol_id] = SymbolStats(symbol, self._windows)
+                stats.add(np.array(filetimes, dtype=np.int64), datas)
+                if self._last_timestamp is None or stats.last_timestamp > self._last_timestamp:
+                    self._last_timestamp = stats.last_timestamp
+            self._last_monotonic = time.monotonic()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def rows(self, symbol_names: Optional[list[str]] = None) -> list[NotificationStatsRow]:
+        with self._lock:
+            if self._last_timestamp is None:
+                return []
+            now = self._last_timestamp + time.monotonic() - self._last_monotonic
+            rows = []
+            for stats in self._stats.values():
+                if not symbol_names or stats.symbol.name in symbol_names:
+                    rows.extend(stats.rows(now))
+            return rows
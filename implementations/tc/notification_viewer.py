@@ -0,0 +1,177 @@
+import asyncio
+import re
+import time
+from typing import Optional, Pattern
+
+from implementations.tc.notification_log import NotificationEvent, NotificationLogFollower, NotificationSymbol, \
+    filetime_to_str
+
+DEFAULT_RATE = 20
+FILE_POLL_INTERVAL = 0.1
+
+
+class NotificationViewer:
+    """Prints notifications above the prompt from a task of the console event loop.
+
+    Only symbols given by name or matching the regex are shown, at most rate
+    lines per second. Lines over the rate are counted and reported once a second.
+    With changes_only a notification is only shown if its value differs from
+    the previous one of the symbol.
+    """
+
+    def __init__(self, symbol_names: Optional[list[str]] = None, pattern: Optional[Pattern] = None,
+                 rate: float = DEFAULT_RATE, changes_only: bool = False):
+        self._symbol_names = set(symbol_names or [])
+        self._pattern = pattern
+        self._rate = rate
+        self._changes_only = changes_only
+        self._matches: dict[str, bool] = {}
+        self._last_values: dict[str, str] = {}
+        self._tokens = float(rate)
+        self._last_refill = time.monotonic()
+        self.shown = 0
+        self.suppressed = 0
+        self._unreported = 0
+
+    def __str__(self):
+        return f"{self.shown} notifications shown, {self.suppressed} over the rate of {self._rate:g}/s not shown"
+
+    def matches(self, name: str) -> bool:
+        matches = self._matches.get(name)
+        if matches is None:
+            if not self._symbol_names and not self._pattern:
+                matches = True
+            else:
+                matches = name in self._symbol_names or bool(self._pattern and self._pattern.search(name))
+            self._matches[name] = matches
+        return matches
+
+    def _allowed(self) -> bool:
+        now = time.monotonic()
+        self._tokens = min(self._rate, self._tokens + (now - self._last_refill) * self._rate)
+        self._last_refill = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def show(self, timestamp: str, name: str, value: str):
+        if not self.matches(name):
+            return
+        if self._changes_only:
+            if self._last_values.get(name) == value:
+                return
+            self._last_values[name] = value
+        if self._allowed():
+            print(f'{timestamp},{name},{value}')
+            self.shown += 1
+        else:
+            self.suppressed += 1
+            self._unreported += 1
+
+    def report_suppressed(self):
+        if self._unreported:
+            print(f"... {self._unreported} notifications not shown, rate limit {self._rate:g}/s")
+            self._unreported = 0
+
+    async def show_events(self, events: 'asyncio.Queue[list[NotificationEvent]]'):
+        """Show the batches the notification writer passes on, until cancelled."""
+        while True:
+            try:
+                batch = await asyncio.wait_for(events.get(), timeout=1)
+            except asyncio.TimeoutError:
+                self.report_suppressed()
+                continue
+            for filetime, symbol, data in batch:
+                self.show(filetime_to_str(filetime), symbol.name, str(symbol.decoder(data)))
+            self.report_suppressed()
+
+    async def show_file(self, follower: NotificationLogFollower):
+        """Show what gets appended to the notification log, until cancelled."""
+        last_report = time.monotonic()
+        try:
+            while True:
+                # Off the event loop, the first read of a binary log steps through all of it to find the last rows
+                for timestamp, name, value in await asyncio.to_thread(follower.read):
+                    self.show(timestamp, name, value)
+                if time.monotonic() - last_report >= 1:
+                    self.report_suppressed()
+                    last_report = time.monotonic()
+                await asyncio.sleep(FILE_POLL_INTERVAL)
+        finally:
+            follower.close()
+
+
+class NotificationViewerSink:
+    """Passes the batches of the notification writer on to the viewer shown at the moment.
+
+    write() runs on the writer thread, the batches are handed over to the
+    event loop of the viewer. Events the viewer filters out don't get there.
+    """
+
+    def __init__(self):
+        self._viewer: Optional[NotificationViewer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+
+    def attach(self, viewer: NotificationViewer, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        self._viewer, self._loop, self._queue = viewer, loop, queue
+
+    def detach(self):
+        self._viewer = self._loop = self._queue = None
+
+    def open(self):
+        pass
+
+    def write(self, events: list[NotificationEvent]):
+        viewer, loop, queue = self._viewer, self._loop, self._queue
+        if viewer is None:
+            return
+        matches: dict[int, bool] = {}
+        batch = []
+        for event in events:
+            symbol: NotificationSymbol = event[1]
+            match = matches.get(symbol.id)
+            if match is None:
+                match = matches[symbol.id] = viewer.matches(symbol.name)
+            if match:
+                batch.append(event)
+        if batch:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, batch)
+            except RuntimeError:
+                # The event loop is closed already
+                pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def make_viewer(payload: Optional[list[str]]) -> NotificationViewer:
+    """Viewer for a ShowNotifications payload: symbol names, regex=<pattern>, rate=<lines/s> and changes.
+
+    Raises ValueError on an invalid regex or rate.
+    """
+    symbol_names = []
+    pattern = None
+    rate = DEFAULT_RATE
+    changes_only = False
+    for token in payload or []:
+        key, separator, value = token.partition('=')
+        if separator and key == 'regex':
+            try:
+                pattern = re.compile(value)
+            except re.error as e:
+                raise ValueError(f"Invalid regex {value}: {e}")
+        elif separator and key == 'rate':
+            rate = float(value)
+            if rate <= 0:
+                raise ValueError("rate must be greater than 0")
+        elif token == 'changes':
+            changes_only = True
+        else:
+            symbol_names.append(token)
+    return NotificationViewer(symbol_names, pattern, rate, changes_only)
@@ -0,0 +1,116 @@
+import queue
+import threading
+import time
+from typing import Optional, Union
+
+from implementations.tc.notification_log import NotificationEvent, NotificationSymbol, \
+    NotificationSymbolDictionary, CsvNotificationSink, BinaryNotificationSink, MultiNotificationSink
+
+
+class NotificationWriter:
+    """Writes notifications to the notification log from a dedicated thread.
+
+    The ADS callback thread only puts the raw event into a bounded queue.
+    When the queue is full the event is dropped and counted instead of
+    blocking the callback thread. Decoding and formatting, if the sink does
+    it at all, happens on the writer thread.
+    """
+
+    def __init__(self, sink: Union[CsvNotificationSink, BinaryNotificationSink, MultiNotificationSink],
+                 flush_interval: float,
+                 batch_size: int, queue_size: int):
+        self._sink = sink
+        self._symbols = NotificationSymbolDictionary()
+        self._flush_interval = flush_interval
+        self._batch_size = batch_size
+        self._queue: queue.Queue[Optional[NotificationEvent]] = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self.received = 0
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+        self.peak_queue_size = 0
+
+    def __str__(self):
+        text = (f"{self.received} received, {self.written} written, {self.dropped} dropped, {self.failed} failed, "
+                f"{self.flushes} flushes, queue {self._queue.qsize()}/{self._queue.maxsize} "
+                f"(peak {self.peak_queue_size})")
+        if self.last_error:
+            text += f", last error: {self.last_error}"
+        return text
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='NotificationWriter', daemon=True)
+            self._thread.start()
+
+    def get_symbol(self, name: str, symbol_type: str, plc_type) -> NotificationSymbol:
+        return self._symbols.get(name, symbol_type, plc_type)
+
+    def put(self, event: NotificationEvent):
+        self.received += 1
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            return
+        queue_size = self._queue.qsize()
+        if queue_size > self.peak_queue_size:
+            self.peak_queue_size = queue_size
+
+    def stop(self):
+        """Write out every queued notification and stop the writer thread."""
+        if self._thread is not None:
+            # The sentinel has to get in even if the queue is full, as long as the thread is there to take it
+            while self._thread.is_alive():
+                try:
+                    self._queue.put(None, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            self._thread.join()
+            self._thread = None
+
+    def _get_batch(self) -> tuple[list[NotificationEvent], bool]:
+        # Block until the first event arrives, then collect more until the
+        # batch is full or the flush interval is over
+        event = self._queue.get()
+        if event is None:
+            return [], True
+        batch = [event]
+        deadline = time.monotonic() + self._flush_interval
+        while len(batch) < self._batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                event = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if event is None:
+                return batch, True
+            batch.append(event)
+        return batch, False
+
+    def _run(self):
+        self._sink.open()
+        try:
+            stopped = False
+            while not stopped:
+                batch, stopped = self._get_batch()
+                if batch:
+                    try:
+                        self._sink.write(batch)
+                        self._sink.flush()
+                    except Exception as e:
+                        # Lose the batch, not the thread, the next batch may get through again
+                        self.failed += len(batch)
+                        self.last_error = f"{type(e).__name__}: {e}"
+                        print(f"Notification writer: {len(batch)} notifications not written, {self.last_error}")
+                        continue
+                    self.written += len(batch)
+                    self.flushes += 1
+        finally:
+            self._sink.close()
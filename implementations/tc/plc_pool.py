@@ -0,0 +1,140 @@
+import os
+import threading
+from typing import Optional
+
+import pyads
+
+from implementations.tc.ads_executor import AdsExecutor, AdsExecutorPool
+from implementations.tc.data_classes import Paths, AdsSettings
+from implementations.tc.handle_cache import HandleCache
+from implementations.tc.symbol_cache import SymbolTableCache, SymbolVersionWatcher
+
+DEFAULT_TARGET = 'default'
+ALL_TARGETS = 'all'
+TARGET_PREFIX = '@'
+
+
+class PLCTarget:
+    """Connection to one PLC together with the caches that belong to it."""
+
+    def __init__(self, alias: str, ams_net_id: str, port: int, symbol_cache_file_path: str, settings: AdsSettings,
+                 executor: AdsExecutor):
+        self.alias = alias
+        self.address = (ams_net_id, port)
+        self.executor = executor
+        self.plc = pyads.Connection(ams_net_id, port)
+        self.plc.open()
+        self.symbol_version_watcher = SymbolVersionWatcher(self.plc)
+        self.symbol_table = SymbolTableCache(self.plc, symbol_cache_file_path, self.symbol_version_watcher)
+        self.handle_cache = HandleCache(self.plc, self.symbol_version_watcher, settings.handle_cache_size)
+
+    def close(self):
+        self.handle_cache.release_all()
+        self.symbol_version_watcher.stop()
+        self.plc.close()
+
+
+class PLCPool:
+    """The PLC given on the command line plus the targets of the config file, addressed by alias.
+
+    Every target has its own connection and executor thread, so a command fanned
+    out to several targets takes about as long as on the slowest of them.
+    Connections to the config file targets are opened on first use.
+    """
+
+    def __init__(self, paths: Paths, settings: AdsSettings, targets: dict[str, tuple[str, int]],
+                 executors: AdsExecutorPool):
+        self._paths = paths
+        self._settings = settings
+        self._addresses: dict[str, tuple[str, int]] = {}
+        self._targets: dict[str, PLCTarget] = {}
+        # get() runs on the executor threads of several targets at once
+        self._lock = threading.Lock()
+        self._connect_locks: dict[tuple[str, int], threading.Lock] = {}
+        self._executors = executors
+        self._configured = targets
+
+    def add_default(self, ams_net_id: str, port: int) -> PLCTarget:
+        self._addresses[DEFAULT_TARGET] = (ams_net_id, port)
+        for alias, address in self._configured.items():
+            # A config file target pointing to the default PLC shares its connection
+            self._addresses.setdefault(alias, address)
+        return self.get(DEFAULT_TARGET)
+
+    @property
+    def aliases(self) -> list[str]:
+        return list(self._addresses)
+
+    def _symbol_cache_file_path(self, alias: str) -> str:
+        if alias == DEFAULT_TARGET:
+            return self._paths.symbol_cache_file_path
+        root, ext = os.path.splitext(self._paths.symbol_cache_file_path)
+        return f'{root}_{alias}{ext}'
+
+    def get(self, alias: str) -> PLCTarget:
+        """Target of alias, connected on first use.
+
+        Call it on the executor of the target, the caches of a target are only
+        used from there.
+        """
+        address = self._addresses[alias]
+        with self._lock:
+            target = self._find(alias, address)
+            if target is not None:
+                return target
+            connect_lock = self._connect_locks.setdefault(address, threading.Lock())
+        # Connecting takes a while, only aliases of the same PLC wait for each other
+        with connect_lock:
+            with self._lock:
+                target = self._find(alias, address)
+            if target is None:
+                target = PLCTarget(alias, *address, self._symbol_cache_file_path(alias), self._settings,
+                                   self.executor(alias))
+                with self._lock:
+                    self._targets[alias] = target
+        return target
+
+    def _find(self, alias: str, address: tuple[str, int]) -> Optional[PLCTarget]:
+        target = self._targets.get(alias)
+        if target is None:
+            for other in self._targets.values():
+                if other.address == address:
+                    return other
+        return target
+
+    def executor(self, alias: str) -> AdsExecutor:
+        address = self._addresses[alias]
+        # Aliases of the same PLC share the executor, the connection is not thread safe
+        for other_alias, other_address in self._addresses.items():
+            if other_address == address:
+                return self._executors.get(other_alias)
+        return self._executors.get(alias)
+
+    def select(self, aliases: list[str]) -> list[str]:
+        """Aliases of the targets to run a command on, one per PLC. Raises ValueError on an unknown alias."""
+        if ALL_TARGETS in aliases:
+            aliases = self.aliases
+        selected = {}
+        for alias in aliases:
+            if alias not in self._addresses:
+                raise ValueError(f"Unknown target {alias}, known targets: {', '.join(self.aliases)}")
+            selected.setdefault(self._addresses[alias], alias)
+        return list(selected.values())
+
+    def close(self):
+        with self._lock:
+            targets = list(self._targets.values())
+        for target in targets:
+            target.close()
+
+
+def parse_targets(payload: Optional[list[str]]) -> tuple[list[str], list[str]]:
+    """Split @alias tokens from a payload, e.g. ['MAIN.x', '@plc1,plc2'] -> (['plc1', 'plc2'], ['MAIN.x'])."""
+    aliases = []
+    rest = []
+    for token in payload or []:
+        if token.startswith(TARGET_PREFIX):
+            aliases.extend(alias for alias in token[len(TARGET_PREFIX):].split(',') if alias)
+        else:
+            rest.append(token)
+    return aliases, rest
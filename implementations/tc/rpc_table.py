@@ -0,0 +1,95 @@
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from implementations.tc.tc_types import RPCDefinition, RPCMethod, validate_model_definitions, get_plc_type, \
+    get_plc_array_type
+from utilities.file import FileCache, get_json
+
+
+@dataclass(slots=True)
+class CompiledRPCMethod:
+    symbol_path: str
+    method: RPCMethod
+    # Name of the method handle, symbol_path#method
+    symbol: str
+    args_datatype: Any = None
+    return_datatype: Any = None
+    # Raised on call, an unknown type in one method must not break the other methods
+    error: Optional[ValueError] = None
+
+
+def compile_rpc_method(symbol_path: str, method: RPCMethod) -> CompiledRPCMethod:
+    compiled = CompiledRPCMethod(symbol_path, method, f'{symbol_path}#{method.name}')
+    try:
+        arguments = method.arguments
+        if len(arguments) > 1:
+            compiled.args_datatype = get_plc_array_type(arguments[0].type)(len(arguments))
+        elif arguments:
+            compiled.args_datatype = get_plc_type(arguments[0].type)
+
+        # FB has more than one return value, for example variables defined in the
+        # VAR_OUTPUT section
+        return_types = method.return_types
+        if len(return_types) > 1:
+            compiled.return_datatype = get_plc_array_type(return_types[0])(len(return_types))
+        elif return_types:
+            compiled.return_datatype = get_plc_type(return_types[0])
+    except ValueError as e:
+        compiled.error = e
+    return compiled
+
+
+class RPCTable:
+    """RPC definitions compiled into a dict keyed by (symbol path, method name).
+
+    The definitions file is only read and validated again when it changed.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._file_cache = FileCache(file_path, self._compile)
+
+    def _compile(self) -> Optional[tuple[dict[tuple[str, str], CompiledRPCMethod], dict[str, dict[str, None]]]]:
+        rpc_definitions_json = get_json(self.file_path)
+        if not rpc_definitions_json:
+            return None
+        rpc_definitions: list[RPCDefinition] = validate_model_definitions(rpc_definitions_json, RPCDefinition,
+                                                                          silent=True)
+        if not rpc_definitions:
+            return None
+        methods = {}
+        hints = {}
+        for rpc_definition in rpc_definitions:
+            symbol_path = rpc_definition.symbol_path
+            hints[symbol_path] = dict.fromkeys(method.name for method in rpc_definition.methods)
+            for method in rpc_definition.methods:
+                methods[(symbol_path, method.name)] = compile_rpc_method(symbol_path, method)
+        return methods, hints
+
+    def __bool__(self):
+        return self._file_cache.get() is not None
+
+    def hints(self) -> Optional[dict[str, dict[str, None]]]:
+        compiled = self._file_cache.get()
+        if compiled:
+            return compiled[1]
+
+    def get(self, symbol_path: str, method_name: str) -> CompiledRPCMethod:
+        methods, hints = self._file_cache.get() or ({}, {})
+        compiled_method = methods.get((symbol_path, method_name))
+        if compiled_method is None:
+            if symbol_path not in hints:
+                raise ValueError(f"Symbol {symbol_path} not found in rpc definitions")
+            raise ValueError(f'Method {method_name} not found in rpc methods')
+        if compiled_method.error:
+            raise compiled_method.error
+        return compiled_method
+
+
+_rpc_tables: dict[str, RPCTable] = {}
+
+
+def get_rpc_table(file_path: str) -> RPCTable:
+    if file_path not in _rpc_tables:
+        _rpc_tables[file_path] = RPCTable(file_path)
+    return _rpc_tables[file_path]
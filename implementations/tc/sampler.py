@@ -0,0 +1,181 @@
+import ctypes
+import math
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+from pyads import Connection, AdsSymbol
+from pyads.pyads_ex import adsSumReadBytes
+
+from implementations.tc.ads_executor import check_cancelled
+from implementations.tc.sum_commands import chunk_by_size, symbol_size, SUM_ERROR_SIZE
+
+TIMESTAMP_FIELD = 'timestamp'
+
+
+def numpy_dtype(plc_type) -> np.dtype:
+    """NumPy type with the memory layout of a pyads plc type, raw bytes if numpy can't map it."""
+    size = ctypes.sizeof(plc_type)
+    if issubclass(plc_type, ctypes.Array) and plc_type._type_ is ctypes.c_char:
+        return np.dtype(f'S{size}')
+    try:
+        dtype = np.dtype(plc_type)
+    except (TypeError, ValueError):
+        return np.dtype(f'V{size}')
+    return dtype if dtype.itemsize == size else np.dtype(f'V{size}')
+
+
+class SampleRing:
+    """The last capacity responses of a sampled sum read, one row per cycle.
+
+    A row keeps the raw bytes of the sum read responses of a cycle, a
+    structured view on top names the value of every symbol in there. Storing
+    a cycle is a single copy, nothing is decoded while sampling.
+    """
+
+    def __init__(self, record_dtype: np.dtype, error_fields: list[str], capacity: int):
+        self.record_dtype = record_dtype
+        self._error_fields = error_fields
+        self.capacity = capacity
+        self._raw = np.zeros((capacity, record_dtype.itemsize), dtype=np.uint8)
+        self._records = self._raw.view(record_dtype).reshape(capacity)
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def row(self, timestamp: float) -> np.ndarray:
+        """Row for the next cycle to write the responses into."""
+        index = self.count % self.capacity
+        self._timestamps[index] = timestamp
+        self.count += 1
+        return self._raw[index]
+
+    def _order(self) -> np.ndarray:
+        if self.count <= self.capacity:
+            return np.arange(self.count)
+        start = self.count % self.capacity
+        return np.concatenate((np.arange(start, self.capacity), np.arange(start)))
+
+    def errors(self) -> int:
+        order = self._order()
+        return int(sum(np.count_nonzero(self._records[field][order]) for field in self._error_fields))
+
+    def to_array(self) -> np.ndarray:
+        """Samples oldest first, with a timestamp field and a field per symbol."""
+        order = self._order()
+        value_fields = [name for name in self.record_dtype.names if name not in self._error_fields]
+        array = np.empty(len(order), dtype=[(TIMESTAMP_FIELD, np.float64)] +
+                                           [(name, self.record_dtype.fields[name][0]) for name in value_fields])
+        array[TIMESTAMP_FIELD] = self._timestamps[order]
+        for name in value_fields:
+            array[name] = self._records[name][order]
+        return array
+
+    def save(self, file_path: str):
+        np.save(file_path, self.to_array())
+
+
+@dataclass
+class SampleReport:
+    symbols: int = 0
+    period: float = 0
+    cycles: int = 0
+    missed_cycles: int = 0
+    round_trips: int = 0
+    errors: int = 0
+    jitter_sum: float = 0
+    jitter_square_sum: float = 0
+    jitter_max: float = 0
+    read_time_sum: float = 0
+    read_time_max: float = 0
+
+    def add_cycle(self, jitter: float, read_time: float):
+        self.cycles += 1
+        self.jitter_sum += jitter
+        self.jitter_square_sum += jitter * jitter
+        self.jitter_max = max(self.jitter_max, jitter)
+        self.read_time_sum += read_time
+        self.read_time_max = max(self.read_time_max, read_time)
+
+    def __str__(self):
+        cycles = self.cycles or 1
+        jitter_mean = self.jitter_sum / cycles
+        jitter_std = math.sqrt(max(self.jitter_square_sum / cycles - jitter_mean * jitter_mean, 0))
+        return (f"{self.cycles} cycles of {self.symbols} symbols every {self.period * 1e3:g} ms, "
+                f"{self.missed_cycles} missed cycles, {self.errors} errors, {self.round_trips} ADS round trips\n"
+                f"jitter mean {jitter_mean * 1e3:.3f} ms, std {jitter_std * 1e3:.3f} ms, "
+                f"max {self.jitter_max * 1e3:.3f} ms\n"
+                f"read time mean {self.read_time_sum / cycles * 1e3:.3f} ms, max {self.read_time_max * 1e3:.3f} ms")
+
+
+class Sampler:
+    """Reads a fixed set of symbols every period with one sum read per chunk of symbols.
+
+    Cycles are scheduled on a fixed grid from the start, a late cycle doesn't
+    shift the following ones. Cycles that can't be made up anymore are skipped
+    and counted as missed.
+    """
+
+    def __init__(self, plc: Connection, symbols: list[AdsSymbol], period: float, capacity: int, chunk_size: int,
+                 max_bytes: int):
+        self._plc = plc
+        self._period = period
+        self._chunks: list[tuple[list[tuple[int, int, int]], int, int]] = []
+
+        fields = []
+        error_fields = []
+        offset = 0
+        for i, chunk in enumerate(chunk_by_size(symbols, symbol_size, chunk_size, max_bytes)):
+            # A sum read response holds the error codes of the chunk followed by the values
+            error_field = f'_errors{i}'
+            fields.append((error_field, np.dtype(('<u4', (len(chunk),))), offset))
+            error_fields.append(error_field)
+            chunk_offset = offset
+            offset += SUM_ERROR_SIZE * len(chunk)
+            for symbol in chunk:
+                fields.append((symbol.name, numpy_dtype(symbol.plc_type), offset))
+                offset += symbol_size(symbol)
+            self._chunks.append(([(symbol.index_group, symbol.index_offset, symbol_size(symbol)) for symbol in chunk],
+                                 chunk_offset, offset - chunk_offset))
+
+        record_dtype = np.dtype({'names': [name for name, _, _ in fields],
+                                 'formats': [dtype for _, dtype, _ in fields],
+                                 'offsets': [field_offset for _, _, field_offset in fields],
+                                 'itemsize': offset})
+        self.ring = SampleRing(record_dtype, error_fields, capacity)
+        self.report = SampleReport(symbols=len(symbols), period=period)
+
+    def _read_cycle(self, timestamp: float):
+        row = self.ring.row(timestamp)
+        for requests, offset, size in self._chunks:
+            response = adsSumReadBytes(self._plc._port, self._plc._adr, requests)
+            row[offset:offset + size] = np.frombuffer(response, dtype=np.uint8, count=size)
+        self.report.round_trips += len(self._chunks)
+
+    def run(self, duration: Optional[float] = None, cycles: Optional[int] = None):
+        """Sample until duration seconds passed or cycles were read, or the job gets cancelled."""
+        start = time.perf_counter()
+        cycle = 0
+        try:
+            while (cycles is None or self.report.cycles < cycles) and \
+                    (duration is None or cycle * self._period < duration):
+                check_cancelled()
+                scheduled = start + cycle * self._period
+                now = time.perf_counter()
+                if now < scheduled:
+                    time.sleep(scheduled - now)
+                    now = time.perf_counter()
+                elif now - scheduled >= self._period:
+                    # Too late for this cycle, continue with the next one on the grid
+                    missed = int((now - scheduled) // self._period)
+                    self.report.missed_cycles += missed
+                    cycle += missed
+                    continue
+                self._read_cycle(time.time())
+                self.report.add_cycle(now - scheduled, time.perf_counter() - now)
+                cycle += 1
+        finally:
+            self.report.errors = self.ring.errors()
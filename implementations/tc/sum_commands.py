@@ -0,0 +1,177 @@
+import struct
+from ctypes import sizeof, c_ubyte
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator, TypeVar, Optional
+
+from pyads import Connection, AdsSymbol
+from pyads.constants import ADSIGRP_SUMUP_WRITE
+from pyads.errorcodes import ERROR_CODES
+from pyads.pyads_ex import adsSumReadBytes, get_value_from_ctype_data, type_is_string, type_is_wstring
+
+from implementations.tc.ads_executor import check_cancelled
+
+ADSIGRP_SUMUP_READWRITE = 0xF082
+
+# Every sub command of a sum read sends index group, index offset and length
+# and gets back a 4 byte error code in front of the data
+SUM_REQUEST_SIZE = 12
+# Sum read/write sub requests also carry the length of their write data
+SUM_READ_WRITE_REQUEST_SIZE = 16
+SUM_ERROR_SIZE = 4
+# Sum read/write sub commands get back the error code and the number of bytes read
+SUM_READ_WRITE_RESPONSE_SIZE = 8
+
+T = TypeVar('T')
+
+
+@dataclass
+class SumCommandReport:
+    symbols: int = 0
+    errors: int = 0
+    round_trips: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+
+    def __str__(self):
+        return (f"{self.symbols} symbols, {self.errors} errors, {self.round_trips} ADS round trips, "
+                f"{self.bytes_sent} bytes sent, {self.bytes_received} bytes received")
+
+
+def error_to_str(error: int) -> str:
+    return ERROR_CODES.get(error, f"ADS error {error}")
+
+
+def symbol_size(symbol: AdsSymbol) -> int:
+    return sizeof(symbol.plc_type) if symbol.plc_type else 0
+
+
+def chunk_by_size(items: Iterable[T], size_of: Callable[[T], int], chunk_size: int, max_bytes: int) -> Iterator[list[T]]:
+    # An item bigger than max_bytes still gets a chunk of its own. Every chunk
+    # is one round trip, a cancelled command stops before the next one.
+    chunk = []
+    chunk_bytes = 0
+    for item in items:
+        item_bytes = size_of(item) + SUM_ERROR_SIZE
+        if chunk and (len(chunk) >= chunk_size or chunk_bytes + item_bytes > max_bytes):
+            check_cancelled()
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+        chunk.append(item)
+        chunk_bytes += item_bytes
+    if chunk:
+        check_cancelled()
+        yield chunk
+
+
+def decode_value(plc_type, buffer) -> Any:
+    return get_value_from_ctype_data(plc_type.from_buffer_copy(buffer), plc_type)
+
+
+def encode_value(plc_type, value) -> bytes:
+    size = sizeof(plc_type)
+    if type_is_string(plc_type):
+        # Keep room for the null terminator
+        return value.encode('utf-8')[:size - 1].ljust(size, b'\x00')
+    if type_is_wstring(plc_type):
+        return value.encode('utf-16-le')[:size - 2].ljust(size, b'\x00')
+    if type(plc_type).__name__ == 'PyCArrayType':
+        return bytes(plc_type(*value))
+    return bytes(plc_type(value))
+
+
+def sum_read_chunk(plc: Connection, requests: list[tuple[int, int, int]],
+                   report: SumCommandReport) -> list[tuple[int, memoryview]]:
+    """Read (index group, index offset, size) requests in one round trip, returns (error, data) per request."""
+    response = adsSumReadBytes(plc._port, plc._adr, requests)
+    report.round_trips += 1
+    report.bytes_sent += SUM_REQUEST_SIZE * len(requests)
+    report.bytes_received += sizeof(response)
+
+    response_view = memoryview(response).cast('B')
+    offset = SUM_ERROR_SIZE * len(requests)
+    results = []
+    for i, (_, _, size) in enumerate(requests):
+        error = struct.unpack_from('<I', response, i * SUM_ERROR_SIZE)[0]
+        if error:
+            report.errors += 1
+        results.append((error, response_view[offset:offset + size]))
+        offset += size
+    return results
+
+
+def sum_write_chunk(plc: Connection, requests: list[tuple[int, int, bytes]], report: SumCommandReport) -> list[int]:
+    """Write (index group, index offset, data) requests in one round trip, returns the error per request."""
+    buffer = bytearray()
+    for index_group, index_offset, data in requests:
+        buffer += struct.pack('<III', index_group, index_offset, len(data))
+    for _, _, data in requests:
+        buffer += data
+
+    response = plc.read_write(ADSIGRP_SUMUP_WRITE, len(requests), None, buffer, None, check_length=False)
+    report.round_trips += 1
+    report.bytes_sent += len(buffer)
+    report.bytes_received += sizeof(response)
+
+    errors = [error for error, in struct.iter_unpack('<I', response)]
+    report.errors += sum(1 for error in errors if error)
+    return errors
+
+
+def sum_read_write_chunk(plc: Connection, requests: list[tuple[int, int, int, bytes]],
+                         report: SumCommandReport) -> list[tuple[int, bytes]]:
+    """Send (index group, index offset, read length, write data) requests in one round trip.
+
+    Returns (error, read data) per request.
+    """
+    buffer = bytearray()
+    for index_group, index_offset, read_length, data in requests:
+        buffer += struct.pack('<IIII', index_group, index_offset, read_length, len(data))
+    for *_, data in requests:
+        buffer += data
+    read_length = sum(SUM_READ_WRITE_RESPONSE_SIZE + request[2] for request in requests)
+
+    response = plc.read_write(ADSIGRP_SUMUP_READWRITE, len(requests), c_ubyte * read_length, buffer,
+                              c_ubyte * len(buffer), return_ctypes=True, check_length=False)
+    report.round_trips += 1
+    report.bytes_sent += len(buffer)
+    report.bytes_received += read_length
+
+    response_bytes = bytes(response)
+    offset = SUM_READ_WRITE_RESPONSE_SIZE * len(requests)
+    results = []
+    for error, length in struct.iter_unpack('<II', response_bytes[:offset]):
+        if error:
+            report.errors += 1
+        results.append((error, response_bytes[offset:offset + length]))
+        offset += length
+    return results
+
+
+def sum_read(plc: Connection, requests: Iterable[tuple[int, int, int]], chunk_size: int, max_bytes: int,
+             report: SumCommandReport) -> Iterator[tuple[int, memoryview]]:
+    for chunk in chunk_by_size(requests, lambda request: request[2], chunk_size, max_bytes):
+        yield from sum_read_chunk(plc, chunk, report)
+
+
+def sum_write(plc: Connection, requests: Iterable[tuple[int, int, bytes]], chunk_size: int, max_bytes: int,
+              report: SumCommandReport) -> Iterator[int]:
+    for chunk in chunk_by_size(requests, lambda request: SUM_REQUEST_SIZE + len(request[2]), chunk_size, max_bytes):
+        yield from sum_write_chunk(plc, chunk, report)
+
+
+def sum_read_symbols(plc: Connection, symbols: Iterable[AdsSymbol], chunk_size: int, max_bytes: int,
+                     report: SumCommandReport) -> Iterator[tuple[AdsSymbol, Any]]:
+    # Symbols without a known plc type are not read and yield None as value,
+    # like AdsSymbol.read() would never have been called on them
+    for chunk in chunk_by_size(symbols, symbol_size, chunk_size, max_bytes):
+        readable = [symbol for symbol in chunk if symbol.plc_type]
+        results = iter(sum_read_chunk(plc, [(symbol.index_group, symbol.index_offset, symbol_size(symbol))
+                                            for symbol in readable], report) if readable else [])
+        for symbol in chunk:
+            report.symbols += 1
+            value: Optional[Any] = None
+            if symbol.plc_type:
+                error, data = next(results)
+                value = error_to_str(error) if error else decode_value(symbol.plc_type, data)
+            yield symbol, value
@@ -0,0 +1,273 @@
+import os
+import struct
+from ctypes import create_string_buffer, sizeof
+from dataclasses import dataclass
+from functools import partial
+from typing import Optional
+
+from pyads import Connection, AdsSymbol, NotificationAttrib, PLCTYPE_BYTE
+from pyads.constants import ADSIGRP_SYM_VERSION, ADSIGRP_SYM_UPLOADINFO2, ADSIGRP_SYM_UPLOAD, \
+    ADSIGRP_SYM_INFOBYNAMEEX
+from pyads.pyads_ex import adsSumReadBytes
+from pyads.structs import SAdsSymbolEntry
+from pyads.utils import decode_ads
+
+from implementations.tc.sum_commands import SumCommandReport, chunk_by_size, sum_read_write_chunk
+
+# Symbol version (1 byte) followed by the upload info: symbol count, symbol
+# table size, data type count, data type table size, max and used dynamic symbols
+SYMBOL_VERSION_SIZE = 1
+UPLOAD_INFO_SIZE = 24
+
+# SAdsSymbolEntry: entry length, index group, index offset, size, data type,
+# flags, name length, type length, comment length
+_symbol_entry_struct = struct.Struct('<IIIIIIHHH')
+
+_cache_magic = b'TCSC'
+_cache_format_version = 1
+# magic, format version, symbol version, symbol count, symbol table size, record count
+_cache_header_struct = struct.Struct('<4sHIIII')
+# index group, index offset, size, data type, name length, type length, comment length
+_cache_record_struct = struct.Struct('<IIIIHHH')
+
+
+@dataclass(frozen=True)
+class SymbolVersion:
+    symbol_version: int
+    symbol_count: int
+    symbol_table_size: int
+
+
+@dataclass
+class SymbolInfo:
+    name: str
+    symbol_type: str
+    comment: str
+    index_group: int
+    index_offset: int
+    size: int
+    data_type: int
+
+
+def read_symbol_version(plc: Connection) -> SymbolVersion:
+    # Both values come back with a single sum read round trip
+    response = adsSumReadBytes(plc._port, plc._adr, [(ADSIGRP_SYM_VERSION, 0, SYMBOL_VERSION_SIZE),
+                                                     (ADSIGRP_SYM_UPLOADINFO2, 0, UPLOAD_INFO_SIZE)])
+    version_error, upload_info_error = struct.unpack_from('<II', response)
+    symbol_version = 0 if version_error else response[8]
+    symbol_count, symbol_table_size = (0, 0) if upload_info_error else struct.unpack_from('<II', response, 9)
+    return SymbolVersion(symbol_version, symbol_count, symbol_table_size)
+
+
+def parse_symbol_entry(buffer, ptr: int = 0) -> tuple[SymbolInfo, int]:
+    """Parse the SAdsSymbolEntry at ptr, returns the symbol info and the entry length."""
+    (entry_length, index_group, index_offset, size, data_type, _flags,
+     name_length, type_length, comment_length) = _symbol_entry_struct.unpack_from(buffer, ptr)
+    name_start = ptr + _symbol_entry_struct.size
+    type_start = name_start + name_length + 1
+    comment_start = type_start + type_length + 1
+    symbol_info = SymbolInfo(
+        name=decode_ads(buffer[name_start:name_start + name_length]),
+        symbol_type=decode_ads(buffer[type_start:type_start + type_length]),
+        comment=decode_ads(buffer[comment_start:comment_start + comment_length]),
+        index_group=index_group,
+        index_offset=index_offset,
+        size=size,
+        data_type=data_type)
+    return symbol_info, entry_length
+
+
+def upload_symbol_infos(plc: Connection, version: SymbolVersion) -> list[SymbolInfo]:
+    symbol_table = plc.read(ADSIGRP_SYM_UPLOAD, 0, partial(create_string_buffer, version.symbol_table_size),
+                            return_ctypes=True)
+    symbol_infos = []
+    ptr = 0
+    for _ in range(version.symbol_count):
+        symbol_info, entry_length = parse_symbol_entry(symbol_table, ptr)
+        symbol_infos.append(symbol_info)
+        ptr += entry_length
+    return symbol_infos
+
+
+def write_symbol_cache(file_path: str, version: SymbolVersion, symbol_infos: list[SymbolInfo]):
+    records = bytearray()
+    strings = bytearray()
+    for info in symbol_infos:
+        # Lengths are stored in characters so that the string block can be
+        # decoded at once and sliced when reading the cache back
+        records += _cache_record_struct.pack(info.index_group, info.index_offset, info.size, info.data_type,
+                                             len(info.name), len(info.symbol_type), len(info.comment))
+        strings += (info.name + info.symbol_type + info.comment).encode()
+
+    tmp_file_path = file_path + '.tmp'
+    with open(tmp_file_path, 'wb') as file:
+        file.write(_cache_header_struct.pack(_cache_magic, _cache_format_version, version.symbol_version,
+                                             version.symbol_count, version.symbol_table_size, len(symbol_infos)))
+        file.write(records)
+        file.write(strings)
+    os.replace(tmp_file_path, file_path)
+
+
+def read_symbol_cache(file_path: str, version: SymbolVersion) -> Optional[list[SymbolInfo]]:
+    if not os.path.isfile(file_path):
+        return None
+
+    with open(file_path, 'rb') as file:
+        data = file.read()
+
+    if len(data) < _cache_header_struct.size:
+        return None
+    magic, format_version, *cached_version, record_count = _cache_header_struct.unpack_from(data)
+    if (magic != _cache_magic or format_version != _cache_format_version
+            or SymbolVersion(*cached_version) != version):
+        return None
+
+    strings_start = _cache_header_struct.size + record_count * _cache_record_struct.size
+    records = data[_cache_header_struct.size:strings_start]
+    strings = data[strings_start:].decode()
+
+    symbol_infos = []
+    ptr = 0
+    for (index_group, index_offset, size, data_type,
+         name_length, type_length, comment_length) in _cache_record_struct.iter_unpack(records):
+        type_start = ptr + name_length
+        comment_start = type_start + type_length
+        end = comment_start + comment_length
+        symbol_infos.append(SymbolInfo(strings[ptr:type_start], strings[type_start:comment_start],
+                                       strings[comment_start:end], index_group, index_offset, size, data_type))
+        ptr = end
+    return symbol_infos
+
+
+class SymbolVersionWatcher:
+    """Counts the changes of the PLC symbol version reported by an ADS notification.
+
+    Caches remember the generation they were filled in and drop their content
+    once it differs, e.g. after an online change or a new download.
+    """
+
+    def __init__(self, plc: Connection):
+        self._plc = plc
+        self._notification_handles: Optional[tuple[int, int]] = None
+        self._symbol_version: Optional[int] = None
+        self._generation = 0
+
+    def _callback(self, notification, _data):
+        symbol_version = notification.contents.data
+        if self._symbol_version is not None and symbol_version != self._symbol_version:
+            self._generation += 1
+        self._symbol_version = symbol_version
+
+    @property
+    def generation(self) -> int:
+        if self._notification_handles is None:
+            self._symbol_version = self._plc.read(ADSIGRP_SYM_VERSION, 0, PLCTYPE_BYTE)
+            self._notification_handles = self._plc.add_device_notification(
+                (ADSIGRP_SYM_VERSION, 0), NotificationAttrib(SYMBOL_VERSION_SIZE), self._callback)
+        return self._generation
+
+    def stop(self):
+        if self._notification_handles is not None:
+            self._plc.del_device_notification(*self._notification_handles)
+            self._notification_handles = None
+
+
+class SymbolTableCache:
+    """Symbol table of a PLC, uploaded only when the PLC symbol version changes."""
+
+    def __init__(self, plc: Connection, cache_file_path: str, watcher: SymbolVersionWatcher):
+        self._plc = plc
+        self._cache_file_path = self._file_path_for_target(cache_file_path, plc)
+        self._watcher = watcher
+        self._generation: Optional[int] = None
+        self._version: Optional[SymbolVersion] = None
+        self._symbol_infos: list[SymbolInfo] = []
+        self._symbol_info_dict: dict[str, SymbolInfo] = {}
+        # Symbols outside the uploaded table, e.g. members of a FB instance,
+        # resolved one by one through the symbol info of the PLC
+        self._resolved_symbol_info_dict: dict[str, SymbolInfo] = {}
+
+    @staticmethod
+    def _file_path_for_target(cache_file_path: str, plc: Connection) -> str:
+        root, ext = os.path.splitext(cache_file_path)
+        return f"{root}_{plc.ams_netid}_{plc.ams_port}{ext}"
+
+    @property
+    def version(self) -> Optional[SymbolVersion]:
+        return self._version
+
+    def _check_generation(self):
+        generation = self._watcher.generation
+        if generation != self._generation:
+            self._generation = generation
+            self._version = None
+            self._symbol_infos = []
+            self._symbol_info_dict = {}
+            self._resolved_symbol_info_dict = {}
+
+    def refresh(self) -> bool:
+        """Make sure the symbol table matches the PLC, returns True if it changed."""
+        self._check_generation()
+        version = read_symbol_version(self._plc)
+        if version == self._version:
+            return False
+
+        symbol_infos = read_symbol_cache(self._cache_file_path, version)
+        if symbol_infos is None:
+            symbol_infos = upload_symbol_infos(self._plc, version)
+            write_symbol_cache(self._cache_file_path, version, symbol_infos)
+
+        self._version = version
+        self._symbol_infos = symbol_infos
+        self._symbol_info_dict = {info.name: info for info in symbol_infos}
+        return True
+
+    def get_symbol_info(self, name: str) -> Optional[SymbolInfo]:
+        return self._symbol_info_dict.get(name)
+
+    def get_symbol_infos(self) -> list[SymbolInfo]:
+        return self._symbol_infos
+
+    def to_ads_symbol(self, info: SymbolInfo) -> AdsSymbol:
+        return AdsSymbol(self._plc, name=info.name, index_group=info.index_group, index_offset=info.index_offset,
+                         symbol_type=info.symbol_type, comment=info.comment)
+
+    def get_symbol(self, name: str) -> AdsSymbol:
+        """Create the AdsSymbol of name without asking the PLC for its symbol info if it is known already."""
+        self._check_generation()
+        info = self._symbol_info_dict.get(name) or self._resolved_symbol_info_dict.get(name)
+        if info:
+            return self.to_ads_symbol(info)
+
+        symbol = self._plc.get_symbol(name)
+        size = sizeof(symbol.plc_type) if symbol.plc_type else 0
+        self._resolved_symbol_info_dict[name] = SymbolInfo(name, symbol.symbol_type, symbol.comment or '',
+                                                           symbol.index_group, symbol.index_offset, size, 0)
+        return symbol
+
+    def get_symbols(self, names: list[str], chunk_size: int, max_bytes: int,
+                    report: SumCommandReport) -> list[Optional[AdsSymbol]]:
+        """Like get_symbol for many names, unknown names are looked up with sum read/write commands.
+
+        Names the PLC does not know are returned as None.
+        """
+        self._check_generation()
+        unknown_names = [name for name in dict.fromkeys(names)
+                         if name not in self._symbol_info_dict and name not in self._resolved_symbol_info_dict]
+
+        for chunk in chunk_by_size(unknown_names, lambda _: sizeof(SAdsSymbolEntry), chunk_size, max_bytes):
+            requests = [(ADSIGRP_SYM_INFOBYNAMEEX, 0, sizeof(SAdsSymbolEntry), name.encode('utf-8') + b'\x00')
+                        for name in chunk]
+            for name, (error, data) in zip(chunk, sum_read_write_chunk(self._plc, requests, report)):
+                if not error:
+                    self._resolved_symbol_info_dict[name], _ = parse_symbol_entry(data)
+
+        symbols = []
+        for name in names:
+            info = self._symbol_info_dict.get(name) or self._resolved_symbol_info_dict.get(name)
+            symbols.append(self.to_ads_symbol(info) if info else None)
+        return symbols
+
+    def get_all_symbols(self) -> list[AdsSymbol]:
+        self.refresh()
+        return [self.to_ads_symbol(info) for info in self._symbol_infos]
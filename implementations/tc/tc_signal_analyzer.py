@@ -1,29 +1,57 @@
+import asyncio
 import dataclasses
 import os
+from datetime import datetime, timezone
+from operator import attrgetter
 from typing import Optional
 
 from prompt_toolkit import print_formatted_text, HTML
 from prompt_toolkit.shortcuts import yes_no_dialog
 from pyads import ADSError
 from tabulate import tabulate
-from implementations.tc.data_classes import ConsoleArgs, Paths
+from implementations.tc.ads_executor import AdsExecutorPool, CommandCancelled
+from implementations.tc.async_ads import AsyncAdsConnection, WATCHLIST_TRANSPORT_ASYNC, WATCHLIST_TRANSPORT_PYADS
+from implementations.tc.data_classes import ConsoleArgs, Paths, AdsSettings, Targets
+from implementations.tc.ignore_rules import IgnoreRules
+from implementations.tc.notification_log import LOG_FORMAT_BINARY, make_notification_sink, export_notifications, \
+    MultiNotificationSink, NotificationLogFollower, datetime_to_filetime
+from implementations.tc.notification_index import IndexedNotificationSink
+from implementations.tc.notification_dispatcher import NotificationDispatcher
+from implementations.tc.notification_options import NotificationOptions, NotificationRate, \
+    parse_notification_options, parse_notification_entry, notification_entry, notification_entry_name, \
+    notification_setup, notification_rate
+from implementations.tc.notification_query import NotificationQuery, QueryRow, QueryAggregate, QueryReport, \
+    parse_query_time
+from implementations.tc.notification_stats import NotificationStatsSink, NotificationStatsRow
+from implementations.tc.notification_viewer import NotificationViewer, NotificationViewerSink, make_viewer
+from implementations.tc.notification_rotation import RotatingNotificationSink
+from implementations.tc.notification_writer import NotificationWriter
+from implementations.tc.plc_pool import PLCPool, parse_targets
+from implementations.tc.rpc_table import get_rpc_table
+from implementations.tc.sampler import Sampler
+from implementations.tc.sum_commands import SumCommandReport
 from implementations.tc.tc_types import validate_model_definitions, RPCDefinition
 from signal_analyzers.generic_signal_analyzers import SignalAnalyzer
 from implementations.tc.ads import (
     print_out_symbols,
+    print_out_symbols_async,
     get_symbol_str,
     print_out_symbol,
     get_ads_symbol,
     add_notification,
     set_symbol,
-    signal_to_rpc_call, download_recipe, upload_recipe
+    signal_to_rpc_call, download_recipe, upload_recipe, rpc_batch, split_rpc_calls, RPCCallResult,
+    read_target_symbol_rows, TargetRecipeDownload
 )
-from utilities.file import get_list_from_file, add_to_file, remove_from_file, get_json
+from utilities.file import get_list_from_file, add_to_file, remove_from_file, clear_file, get_json
+from utilities.list_store import get_list_store, compact_list_stores
 from signals.generic_signals import Signal
 import pyads
 
 from implementations.tc.tc_signals import TCSignal
-from utilities.functions import show_notifications
+from utilities.functions import parse_page, page, fill_table, parse_options
+
+QUERY_LIMIT = 1000
 
 
 class TCSignalAnalyzer(SignalAnalyzer):
@@ -31,65 +59,320 @@ class TCSignalAnalyzer(SignalAnalyzer):
     def __init__(self, args: ConsoleArgs, port=pyads.PORT_TC3PLC1):
         super().__init__()
         self._paths = Paths(args.path_config)
-        self._plc = pyads.Connection(args.ams_net_id, port)
-        self._plc.open()
-        self._notification_dict = {}
+        self._settings = AdsSettings(args.path_config)
+        self._executors = AdsExecutorPool()
+        self._plc_pool = PLCPool(self._paths, self._settings, Targets(args.path_config).targets, self._executors)
+        default_target = self._plc_pool.add_default(args.ams_net_id, port)
+        self._plc = default_target.plc
+        self._executor = default_target.executor
+        self._symbol_table = default_target.symbol_table
+        self._handle_cache = default_target.handle_cache
+        self._async_ads: Optional[AsyncAdsConnection] = None
+        if self._settings.watchlist_transport == WATCHLIST_TRANSPORT_ASYNC:
+            # Opened on first use, on the event loop of the console
+            self._async_ads = AsyncAdsConnection(args.ams_net_id, port, self._settings.ads_ip_address or None)
+        elif self._settings.watchlist_transport != WATCHLIST_TRANSPORT_PYADS:
+            raise ValueError(f"Unknown watchlist transport {self._settings.watchlist_transport}, "
+                             f"use {WATCHLIST_TRANSPORT_PYADS} or {WATCHLIST_TRANSPORT_ASYNC}")
+        self._notification_log_file_path = (self._paths.ads_notifications_log_file_path
+                                            if self._settings.notification_log_format == LOG_FORMAT_BINARY
+                                            else self._paths.ads_notifications_file_path)
+        self._notification_stats = NotificationStatsSink(self._settings.notification_stats_windows)
+        self._notification_viewer_sink = NotificationViewerSink()
+        self._viewer: Optional[NotificationViewer] = None
+        self._viewer_task: Optional[asyncio.Task] = None
+        self._notification_log_sink = RotatingNotificationSink(
+            lambda file_path: IndexedNotificationSink(
+                make_notification_sink(self._settings.notification_log_format, file_path), file_path),
+            self._notification_log_file_path, self._settings.notification_log_max_bytes,
+            self._settings.notification_log_max_age, self._settings.notification_log_compression,
+            self._settings.notification_log_keep)
+        self._notification_writer = NotificationWriter(
+            MultiNotificationSink(self._notification_log_sink, self._notification_stats,
+                                  self._notification_viewer_sink),
+            self._settings.notification_flush_interval, self._settings.notification_batch_size,
+            self._settings.notification_queue_size)
+        self._notification_writer.start()
+        self._notification_dispatcher = NotificationDispatcher(self._plc, self._notification_writer)
+        self._notification_query = NotificationQuery(self._notification_log_file_path,
+                                                     self._settings.notification_log_format)
 
     def cleanup(self):
-        for notification in self._notification_dict.values():
-            notification.clear_device_notifications()
+        self._hide_notifications()
+        # Wait for running ADS jobs before the connection state goes away
+        self._executors.shutdown()
+        self._notification_dispatcher.clear()
+        self._notification_writer.stop()
+        if self._async_ads is not None:
+            self._async_ads.abort()
+        self._plc_pool.close()
+        compact_list_stores()
+
+    def _hide_notifications(self):
+        self._notification_viewer_sink.detach()
+        if self._viewer_task is not None:
+            self._viewer_task.cancel()
+            self._viewer_task = None
+        self._viewer = None
+
+    @staticmethod
+    def _command_name(tc_signal: TCSignal) -> str:
+        for signal_field in dataclasses.fields(tc_signal):
+            if getattr(tc_signal, signal_field.name) is True:
+                return signal_field.name
+        return 'signal'
 
     async def eval(self, signal: Signal):
         tc_signal = TCSignal(**dataclasses.asdict(signal))
+        if tc_signal.clear_hint_list:
+            if os.path.isfile(self._paths.symbol_hints_file_path):
+                result = await yes_no_dialog(
+                    title='Clear hint list',
+                    text='Are you sure you want to clear the hint list?',
+                ).run_async()
+                if result:
+                    clear_file(self._paths.symbol_hints_file_path)
+
+        elif tc_signal.clear_ignore_list:
+            if os.path.isfile(self._paths.ignore_ads_symbols_file_path):
+                result = await yes_no_dialog(
+                    title='Clear ignore list',
+                    text='Are you sure you want to clear the ignore list?',
+                ).run_async()
+                if result:
+                    clear_file(self._paths.ignore_ads_symbols_file_path)
+
+        elif tc_signal.clear_watchlist:
+            if os.path.isfile(self._paths.watchlist_file_path):
+                result = await yes_no_dialog(
+                    title='Clear watchlist',
+                    text='Are you sure you want to clear the watchlist?',
+                ).run_async()
+                if result:
+                    clear_file(self._paths.watchlist_file_path)
+
+        elif tc_signal.clear_notification_list:
+            if os.path.isfile(self._paths.notification_symbols_file_path):
+                result = await yes_no_dialog(
+                    title='Clear notification list',
+                    text='Are you sure you want to clear the notification list?',
+                ).run_async()
+                if result:
+                    clear_file(self._paths.notification_symbols_file_path)
+
+        elif tc_signal.show_notifications:
+            try:
+                viewer = make_viewer(tc_signal.payload)
+            except ValueError as e:
+                print(e)
+                return
+            self._hide_notifications()
+            if self._notification_dispatcher:
+                # Notifications of this console come straight from the writer
+                events = asyncio.Queue()
+                self._notification_viewer_sink.attach(viewer, asyncio.get_running_loop(), events)
+                self._viewer_task = asyncio.create_task(viewer.show_events(events))
+            else:
+                follower = NotificationLogFollower(self._notification_log_file_path,
+                                                   self._settings.notification_log_format)
+                self._viewer_task = asyncio.create_task(viewer.show_file(follower))
+            self._viewer = viewer
+            print("Showing notifications, HideNotifications to stop.")
+
+        elif tc_signal.hide_notifications:
+            if self._viewer is None:
+                print("Nothing to do")
+            else:
+                viewer = self._viewer
+                self._hide_notifications()
+                print(viewer)
+
+        elif tc_signal.notification_stats:
+            rows = self._notification_stats.rows(tc_signal.payload)
+            if rows:
+                print(fill_table(rows, NotificationStatsRow))
+            elif tc_signal.payload:
+                print(f"No notifications received for {', '.join(tc_signal.payload)}")
+            else:
+                print("No notifications received yet")
+
+        elif tc_signal.jobs:
+            for executor in self._executors:
+                print(executor)
+                for job in executor.jobs:
+                    print(f"  {job}")
+
+        elif tc_signal.cancel:
+            if tc_signal.payload and tc_signal.payload[0] != 'all':
+                if not tc_signal.payload[0].isdigit():
+                    print(f"Unknown job {tc_signal.payload[0]}")
+                    return
+                cancelled = self._executor.cancel(int(tc_signal.payload[0]))
+            else:
+                cancelled = sum(executor.cancel() for executor in self._executors)
+            print(f"{cancelled} jobs cancelled")
+
+        elif (tc_signal.get_symbol or tc_signal.watchlist or tc_signal.download_recipe) and \
+                parse_targets(tc_signal.payload)[0]:
+            await self._fan_out(tc_signal)
+
+        elif tc_signal.payload and tc_signal.payload[-1] == '&':
+            # Run in the background, the next command doesn't wait for it
+            tc_signal.payload = tc_signal.payload[:-1]
+            job = self._executor.run_in_background(self._command_name(tc_signal), self._eval_ads, tc_signal)
+            print(f"Job {job.id} started")
+
+        elif tc_signal.watchlist and self._async_ads is not None:
+            await self._watchlist_async(tc_signal)
+
+        else:
+            try:
+                await self._executor.run(self._command_name(tc_signal), self._eval_ads, tc_signal)
+            except CommandCancelled:
+                print("Cancelled")
+
+    def _watchlist_symbols(self, watchlist: list[str]) -> list[pyads.AdsSymbol]:
+        symbols = []
+        for symbol_str, symbol in zip(watchlist, self._symbol_table.get_symbols(
+                watchlist, self._settings.sum_read_chunk_size, self._settings.sum_read_max_bytes,
+                SumCommandReport())):
+            if symbol is None:
+                print_formatted_text(HTML(f'<red>ERR: Unknown symbol {symbol_str}</red>'))
+            else:
+                symbols.append(symbol)
+        return symbols
+
+    async def _watchlist_async(self, tc_signal: TCSignal):
+        """Watchlist values read on the event loop with the async transport, instead of on the executor."""
+        if not os.path.isfile(self._paths.watchlist_file_path):
+            return
+        offset, limit, _ = parse_page(tc_signal.payload)
+        watchlist = list(page(get_list_from_file(self._paths.watchlist_file_path), offset, limit))
+        if not watchlist:
+            return
         try:
-            if tc_signal.get_all_symbols:
-                ignore_symbols: Optional[list] = get_list_from_file(self._paths.ignore_ads_symbols_file_path)
-                symbols = self._plc.get_all_symbols()
+            # The symbol table belongs to the executor thread
+            symbols = await self._executor.run('watchlist', self._watchlist_symbols, watchlist)
+            await self._async_ads.open()
+            await print_out_symbols_async(self._async_ads, symbols, self._settings)
+        except CommandCancelled:
+            print("Cancelled")
+        except (ADSError, OSError, asyncio.TimeoutError) as e:
+            print_formatted_text(HTML(f'<red>ERR: {e}</red>'))
 
-                filtered_symbols = []
-                for symbol in symbols:
-                    if ignore_symbols and symbol.name in ignore_symbols:
-                        continue
-                    add_to_file(self._paths.symbol_hints_file_path, symbol.name)
-                    filtered_symbols.append(symbol)
-                    if symbol.plc_type:
-                        symbol.read()
+    async def _fan_out(self, tc_signal: TCSignal):
+        """Run the command on every @target concurrently and print the rows of all targets in one table."""
+        aliases, tc_signal.payload = parse_targets(tc_signal.payload)
+        try:
+            aliases = self._plc_pool.select(aliases)
+        except ValueError as e:
+            print(e)
+            return
+
+        watchlist = None
+        if tc_signal.watchlist:
+            if not os.path.isfile(self._paths.watchlist_file_path):
+                return
+            offset, limit, _ = parse_page(tc_signal.payload)
+            watchlist = list(page(get_list_from_file(self._paths.watchlist_file_path), offset, limit))
+            if not watchlist:
+                return
+        elif tc_signal.get_symbol and not tc_signal.payload:
+            return
+
+        name = self._command_name(tc_signal)
+        results = await asyncio.gather(*(self._plc_pool.executor(alias).run(name, self._eval_target, alias,
+                                                                            tc_signal, watchlist)
+                                         for alias in aliases), return_exceptions=True)
+        rows = []
+        for alias, result in zip(aliases, results):
+            if isinstance(result, (CommandCancelled, asyncio.CancelledError)):
+                print(f"{alias}: Cancelled")
+            elif isinstance(result, BaseException):
+                print_formatted_text(HTML(f'<red>ERR: {alias}: {result}</red>'))
+            else:
+                rows.extend(result)
+        if rows:
+            print(fill_table(rows, type(rows[0])))
+
+    def _eval_target(self, alias: str, tc_signal: TCSignal, watchlist: Optional[list[str]]) -> list:
+        # Runs on the executor of the target, next to the same command on the other targets
+        target = self._plc_pool.get(alias)
+        if tc_signal.get_symbol:
+            symbol = target.symbol_table.get_symbol(tc_signal.payload[0])
+            return read_target_symbol_rows(alias, target.plc, [symbol], self._settings)
+
+        elif tc_signal.watchlist:
+            symbols = []
+            for symbol_str, symbol in zip(watchlist, target.symbol_table.get_symbols(
+                    watchlist, self._settings.sum_read_chunk_size, self._settings.sum_read_max_bytes,
+                    SumCommandReport())):
+                if symbol is None:
+                    print_formatted_text(HTML(f'<red>ERR: {alias}: Unknown symbol {symbol_str}</red>'))
+                else:
+                    symbols.append(symbol)
+            return read_target_symbol_rows(alias, target.plc, symbols, self._settings)
 
-                print_out_symbols(filtered_symbols)
+        elif tc_signal.download_recipe:
+            diff = bool(tc_signal.payload) and tc_signal.payload[0] == 'diff'
+            result = download_recipe(target.plc, target.symbol_table, self._settings, self._paths.recipe_file_path,
+                                     diff)
+            return [TargetRecipeDownload(alias, result.written, result.skipped, str(result.report))] if result else []
+        return []
+
+    def _eval_ads(self, tc_signal: TCSignal):
+        try:
+            if tc_signal.get_all_symbols:
+                offset, limit, _ = parse_page(tc_signal.payload)
+                ignore_rules = IgnoreRules(get_list_store(self._paths.ignore_ads_symbols_file_path))
+                hint_store = get_list_store(self._paths.symbol_hints_file_path)
+                self._symbol_table.refresh()
+                # Ignored symbols are dropped before an AdsSymbol is created or a value is read
+                symbol_infos = ignore_rules.filter(self._symbol_table.get_symbol_infos(), attrgetter('name'))
+
+                with hint_store.batch():
+                    for symbol_info in symbol_infos:
+                        hint_store.add(symbol_info.name)
+
+                # Only the symbols of the requested page are read
+                print_out_symbols(self._plc, (self._symbol_table.to_ads_symbol(symbol_info)
+                                              for symbol_info in page(symbol_infos, offset, limit)), self._settings)
+                if len(ignore_rules):
+                    print(ignore_rules.report())
 
             elif tc_signal.get_symbol:
-                if signal.payload:
-                    symbol_str = get_symbol_str(signal)
-                    print_out_symbol(self._plc, symbol_str)
+                if tc_signal.payload:
+                    symbol_str = get_symbol_str(tc_signal)
+                    print_out_symbol(self._symbol_table, symbol_str)
 
             elif tc_signal.set_symbol:
-                if signal.payload and len(signal.payload) > 1:
-                    symbol_str = signal.payload[0]
-                    value = signal.payload[1]
-                    set_symbol(self._plc, symbol_str, value)
-                    print_out_symbol(self._plc, symbol_str)
+                if tc_signal.payload and len(tc_signal.payload) > 1:
+                    symbol_str = tc_signal.payload[0]
+                    value = tc_signal.payload[1]
+                    set_symbol(self._plc, self._handle_cache, symbol_str, value)
+                    print_out_symbol(self._symbol_table, symbol_str)
 
             elif tc_signal.add_to_ignore:
-                if signal.payload:
-                    symbol_str = get_symbol_str(signal)
+                if tc_signal.payload:
+                    symbol_str = get_symbol_str(tc_signal)
                     add_to_file(self._paths.ignore_ads_symbols_file_path, symbol_str)
 
             elif tc_signal.add_to_watchlist:
-                if signal.payload:
-                    symbol_str = get_symbol_str(signal)
+                if tc_signal.payload:
+                    symbol_str = get_symbol_str(tc_signal)
                     add_to_file(self._paths.watchlist_file_path, symbol_str)
                     add_to_file(self._paths.symbol_hints_file_path, symbol_str)
-                    print_out_symbol(self._plc, symbol_str)
+                    print_out_symbol(self._symbol_table, symbol_str)
 
             elif tc_signal.remove_from_ignore:
-                if signal.payload:
-                    symbol_str = get_symbol_str(signal)
+                if tc_signal.payload:
+                    symbol_str = get_symbol_str(tc_signal)
                     remove_from_file(self._paths.ignore_ads_symbols_file_path, symbol_str)
                     add_to_file(self._paths.symbol_hints_file_path, symbol_str)
 
             elif tc_signal.remove_from_watchlist:
-                if signal.payload:
-                    symbol_str = get_symbol_str(signal)
+                if tc_signal.payload:
+                    symbol_str = get_symbol_str(tc_signal)
                     remove_from_file(self._paths.watchlist_file_path, symbol_str)
 
             elif tc_signal.ignore_list:
@@ -100,65 +383,35 @@ class TCSignalAnalyzer(SignalAnalyzer):
 
             elif tc_signal.watchlist:
                 if os.path.isfile(self._paths.watchlist_file_path):
-                    watchlist = get_list_from_file(self._paths.watchlist_file_path)
+                    offset, limit, _ = parse_page(tc_signal.payload)
+                    watchlist = list(page(get_list_from_file(self._paths.watchlist_file_path), offset, limit))
                     if watchlist:
-                        watchlist_symbols = []
-                        for watchlist_symbol in watchlist:
-                            symbol = get_ads_symbol(self._plc, watchlist_symbol)
-                            watchlist_symbols.append(symbol)
-                        print_out_symbols(watchlist_symbols)
+                        print_out_symbols(self._plc, self._watchlist_symbols(watchlist), self._settings)
 
             elif tc_signal.add_to_hint_list:
-                if signal.payload:
-                    symbol_str = get_symbol_str(signal)
+                if tc_signal.payload:
+                    symbol_str = get_symbol_str(tc_signal)
                     add_to_file(self._paths.symbol_hints_file_path, symbol_str)
-                    print_out_symbol(self._plc, symbol_str)
+                    print_out_symbol(self._symbol_table, symbol_str)
 
             elif tc_signal.remove_from_hint_list:
-                if signal.payload:
-                    symbol_str = get_symbol_str(signal)
+                if tc_signal.payload:
+                    symbol_str = get_symbol_str(tc_signal)
                     remove_from_file(self._paths.symbol_hints_file_path, symbol_str)
 
-            elif tc_signal.clear_hint_list:
-                if os.path.isfile(self._paths.symbol_hints_file_path):
-                    result = await yes_no_dialog(
-                        title='Clear hint list',
-                        text='Are you sure you want to clear the hint list?',
-                    ).run_async()
-                    if result:
-                        os.remove(self._paths.symbol_hints_file_path)
-
-            elif tc_signal.clear_ignore_list:
-                if os.path.isfile(self._paths.ignore_ads_symbols_file_path):
-                    result = await yes_no_dialog(
-                        title='Clear ignore list',
-                        text='Are you sure you want to clear the ignore list?',
-                    ).run_async()
-                    if result:
-                        os.remove(self._paths.ignore_ads_symbols_file_path)
-
-            elif tc_signal.clear_watchlist:
-                if os.path.isfile(self._paths.watchlist_file_path):
-                    result = await yes_no_dialog(
-                        title='Clear watchlist',
-                        text='Are you sure you want to clear the watchlist?',
-                    ).run_async()
-                    if result:
-                        os.remove(self._paths.watchlist_file_path)
-
             elif tc_signal.notify:
                 if tc_signal.payload:
-                    symbol_str = get_symbol_str(tc_signal)
-                    target_symbol = get_ads_symbol(self._plc, symbol_str)
-
-                    add_notification(target_symbol, self._notification_dict, self._paths)
+                    try:
+                        options, payload = parse_notification_options(tc_signal.payload)
+                    except ValueError as e:
+                        print(e)
+                        return
+                    self._notify(payload[0], options)
 
             elif tc_signal.stop_notification:
                 if tc_signal.payload:
                     symbol_str = get_symbol_str(tc_signal)
-                    if symbol_str in self._notification_dict:
-                        self._notification_dict[symbol_str].clear_device_notifications()
-                        del self._notification_dict[symbol_str]
+                    if self._notification_dispatcher.remove(symbol_str):
                         print("Done")
                     else:
                         print("Nothing to do")
@@ -167,64 +420,232 @@ class TCSignalAnalyzer(SignalAnalyzer):
                 if os.path.isfile(self._paths.notification_symbols_file_path):
                     notification_list = get_list_from_file(self._paths.notification_symbols_file_path)
                     if notification_list:
-                        for notification_str in notification_list:
-                            symbol = get_ads_symbol(self._plc, notification_str)
-                            add_notification(symbol, notification_dict=self._notification_dict, paths=self._paths)
+                        for notification_entry_str in notification_list:
+                            try:
+                                symbol_str, options = parse_notification_entry(notification_entry_str)
+                            except ValueError as e:
+                                print(e)
+                                continue
+                            self._notify(symbol_str, options)
                 else:
                     print(f"Nothing to do: No file {self._paths.notification_symbols_file_path} found.")
 
-            elif tc_signal.show_notifications:
-                show_notifications(file_path=self._paths.ads_notifications_file_path)
-
             elif tc_signal.add_to_notification_list:
-                if signal.payload:
-                    symbol_str = get_symbol_str(signal)
-                    add_to_file(self._paths.notification_symbols_file_path, symbol_str)
+                if tc_signal.payload:
+                    try:
+                        options, payload = parse_notification_options(tc_signal.payload)
+                    except ValueError as e:
+                        print(e)
+                        return
+                    symbol_str = payload[0]
+                    # An entry per symbol, new options replace the old ones
+                    self._remove_from_notification_list(symbol_str)
+                    add_to_file(self._paths.notification_symbols_file_path, notification_entry(symbol_str, options))
                     add_to_file(self._paths.symbol_hints_file_path, symbol_str)
 
             elif tc_signal.remove_from_notification_list:
-                if signal.payload:
-                    symbol_str = get_symbol_str(signal)
-                    remove_from_file(self._paths.notification_symbols_file_path, symbol_str)
-
-            elif tc_signal.clear_notification_list:
-                if os.path.isfile(self._paths.notification_symbols_file_path):
-                    result = await yes_no_dialog(
-                        title='Clear notification list',
-                        text='Are you sure you want to clear the notification list?',
-                    ).run_async()
-                    if result:
-                        os.remove(self._paths.notification_symbols_file_path)
+                if tc_signal.payload:
+                    symbol_str = get_symbol_str(tc_signal)
+                    self._remove_from_notification_list(symbol_str)
 
             elif tc_signal.stop_notifications:
                 if os.path.isfile(self._paths.notification_symbols_file_path):
                     notification_list = get_list_from_file(self._paths.notification_symbols_file_path)
                     if notification_list:
-                        for notification in notification_list:
-                            if notification in self._notification_dict:
-                                self._notification_dict[notification].clear_device_notifications()
-                                del self._notification_dict[notification]
+                        for notification in map(notification_entry_name, notification_list):
+                            if self._notification_dispatcher.remove(notification):
                                 print(f"Notification for {notification} symbol stopped")
 
             elif tc_signal.rpc:
-                rpc_definitions_json = get_json(self._paths.rpc_definitions_file_path)
-                if rpc_definitions_json:
-                    rpc_definitions = validate_model_definitions(rpc_definitions_json, RPCDefinition)
-                    if not rpc_definitions:
-                        return
+                rpc_table = get_rpc_table(self._paths.rpc_definitions_file_path)
+                if rpc_table:
                     try:
-                        signal_to_rpc_call(self._plc, tc_signal, rpc_definitions)
+                        signal_to_rpc_call(self._plc, self._handle_cache, tc_signal, rpc_table)
                     except ValueError as e:
                         print(e)
+                elif rpc_definitions_json := get_json(self._paths.rpc_definitions_file_path):
+                    # The table validates silently, show why the definitions are not usable
+                    validate_model_definitions(rpc_definitions_json, RPCDefinition)
 
                 else:
                     print(f"No rpc definitions or file {self._paths.rpc_definitions_file_path} found.")
 
+            elif tc_signal.rpc_batch:
+                rpc_table = get_rpc_table(self._paths.rpc_definitions_file_path)
+                if not rpc_table:
+                    print(f"No rpc definitions or file {self._paths.rpc_definitions_file_path} found.")
+                elif tc_signal.payload:
+                    results, report = rpc_batch(self._plc, self._handle_cache, rpc_table,
+                                                split_rpc_calls(tc_signal.payload), self._settings)
+                    print(fill_table(results, RPCCallResult))
+                    print(report)
+
             elif tc_signal.download_recipe:
-                download_recipe(self._plc, self._paths.recipe_file_path)
+                diff = bool(tc_signal.payload) and tc_signal.payload[0] == 'diff'
+                result = download_recipe(self._plc, self._symbol_table, self._settings, self._paths.recipe_file_path,
+                                         diff)
+                if result:
+                    print(result)
 
             elif tc_signal.upload_recipe:
-                upload_recipe(self._plc, self._paths.recipe_file_path)
+                upload_recipe(self._plc, self._symbol_table, self._settings, self._paths.recipe_file_path)
+
+            elif tc_signal.handle_cache:
+                print(self._handle_cache)
+
+            elif tc_signal.notification_writer:
+                print(self._notification_writer)
+                print(f"Log: {self._notification_log_sink}")
+
+            elif tc_signal.export_notifications:
+                export_format = tc_signal.payload[0] if tc_signal.payload else 'csv'
+                if export_format not in ('csv', 'json'):
+                    print(f"Unknown export format {export_format}, use csv or json.")
+                    return
+                if not os.path.isfile(self._notification_log_file_path):
+                    print(f"Nothing to do: No file {self._notification_log_file_path} found.")
+                    return
+                export_file_path = (tc_signal.payload[1] if tc_signal.payload and len(tc_signal.payload) > 1
+                                    else f'{os.path.splitext(self._notification_log_file_path)[0]}_export.{export_format}')
+                count = export_notifications(self._notification_log_file_path, self._settings.notification_log_format,
+                                             export_format, export_file_path)
+                print(f"{count} notifications exported to {export_file_path}")
+
+            elif tc_signal.query_notifications:
+                self._query_notifications(tc_signal)
+
+            elif tc_signal.notification_rates:
+                self._notification_rates()
+
+            elif tc_signal.sample:
+                self._sample(tc_signal)
 
         except ADSError as e:
             print_formatted_text(HTML(f'<red>ERR: {e}</red>'))
+
+    def _notify(self, symbol_str: str, options: NotificationOptions):
+        if symbol_str in self._notification_dispatcher:
+            print(f"Notification for {symbol_str} already running")
+            return
+        symbol = get_ads_symbol(self._symbol_table, symbol_str)
+        try:
+            setup = notification_setup(symbol, options, self._settings)
+        except ValueError as e:
+            print(e)
+            return
+        add_notification(symbol, self._notification_dispatcher, setup)
+
+    def _remove_from_notification_list(self, symbol_str: str):
+        notification_list = get_list_from_file(self._paths.notification_symbols_file_path) or []
+        for notification_entry_str in notification_list:
+            if notification_entry_name(notification_entry_str) == symbol_str:
+                remove_from_file(self._paths.notification_symbols_file_path, notification_entry_str)
+
+    def _notification_rates(self):
+        if self._notification_dispatcher:
+            setups = [record.setup for record in self._notification_dispatcher]
+        else:
+            # Nothing running, what the notification list would cost
+            setups = []
+            for notification_entry_str in get_list_from_file(self._paths.notification_symbols_file_path) or []:
+                try:
+                    symbol_str, options = parse_notification_entry(notification_entry_str)
+                    setups.append(notification_setup(get_ads_symbol(self._symbol_table, symbol_str), options,
+                                                     self._settings))
+                except ValueError as e:
+                    print(e)
+        if not setups:
+            print("Nothing to do: No notifications running and the notification list is empty.")
+            return
+
+        observed = {row.symbol: row.rate for row in self._notification_stats.rows()
+                    if row.window == f'{self._settings.notification_stats_windows[0]:g} s'} \
+            if self._settings.notification_stats_windows else {}
+        rates = []
+        for setup in setups:
+            rate = notification_rate(setup, self._settings.plc_cycle_time)
+            rate.observed_per_s = observed.get(setup.symbol)
+            rates.append(rate)
+        print(fill_table(rates, NotificationRate))
+        print(f"Total at most {sum(rate.events_per_s for rate in rates):.0f} notifications/s in "
+              f"{sum(rate.frames_per_s for rate in rates):.0f} ADS frames/s, "
+              f"{sum(rate.bytes_per_s for rate in rates) / 1024:.1f} KiB/s, "
+              f"with a PLC cycle of {self._settings.plc_cycle_time:g} ms")
+        if self._notification_dispatcher:
+            print(f"Observed over the last {self._settings.notification_stats_windows[0]:g} s: "
+                  f"{sum(rate.observed_per_s or 0 for rate in rates):.0f} notifications/s")
+
+    def _query_notifications(self, tc_signal: TCSignal):
+        offset, limit, payload = parse_page(tc_signal.payload)
+        aggregate = 'agg' in payload
+        payload = [token for token in payload if token != 'agg']
+        if not 2 <= len(payload) <= 3:
+            print("Usage: QueryNotifications <symbol> <from> [<to>] [agg] [offset=N] [limit=N]")
+            return
+        try:
+            first = parse_query_time(payload[1])
+            last = parse_query_time(payload[2]) if len(payload) > 2 else \
+                datetime_to_filetime(datetime.now(timezone.utc).replace(tzinfo=None))
+        except ValueError as e:
+            print(e)
+            return
+        report = QueryReport()
+        if aggregate:
+            print(fill_table([self._notification_query.aggregate(payload[0], first, last, report)], QueryAggregate))
+        else:
+            limit = QUERY_LIMIT if limit is None else limit
+            rows = [QueryRow(timestamp, value) for timestamp, value in
+                    page(self._notification_query.rows(payload[0], first, last, report), offset, limit)]
+            if rows:
+                print(fill_table(rows, QueryRow))
+            else:
+                print(f"No notifications of {payload[0]} in that time")
+            if len(rows) == limit:
+                print(f"First {limit} notifications shown, use offset= and limit= for more")
+        print(report)
+
+    def _sample(self, tc_signal: TCSignal):
+        options, symbol_strs = parse_options(tc_signal.payload, ('period', 'duration', 'cycles', 'buffer', 'file'))
+        if not symbol_strs and os.path.isfile(self._paths.watchlist_file_path):
+            symbol_strs = get_list_from_file(self._paths.watchlist_file_path)
+        if not symbol_strs:
+            print("Nothing to sample: No symbols given and the watchlist is empty.")
+            return
+        try:
+            period = float(options.get('period', 10)) / 1000
+            duration = float(options['duration']) if 'duration' in options else None
+            cycles = int(options['cycles']) if 'cycles' in options else None
+            capacity = int(options.get('buffer', self._settings.sample_buffer_size))
+        except ValueError as e:
+            print(f"Invalid sample option: {e}")
+            return
+        if period <= 0 or capacity <= 0:
+            print("Sample period and buffer must be greater than 0")
+            return
+        if duration is None and cycles is None:
+            cycles = capacity
+
+        symbols = []
+        symbol_strs = list(dict.fromkeys(symbol_strs))
+        for symbol_str, symbol in zip(symbol_strs, self._symbol_table.get_symbols(
+                symbol_strs, self._settings.sum_read_chunk_size, self._settings.sum_read_max_bytes,
+                SumCommandReport())):
+            if symbol is None:
+                print_formatted_text(HTML(f'<red>ERR: Unknown symbol {symbol_str}</red>'))
+            elif not symbol.plc_type:
+                print(f"Symbol {symbol_str} of unsupported type {symbol.symbol_type} not sampled")
+            else:
+                symbols.append(symbol)
+        if not symbols:
+            return
+
+        sampler = Sampler(self._plc, symbols, period, capacity, self._settings.sum_read_chunk_size,
+                          self._settings.sum_read_max_bytes)
+        try:
+            sampler.run(duration, cycles)
+        finally:
+            print(sampler.report)
+            if 'file' in options:
+                file_path = options['file'] if options['file'].endswith('.npy') else f"{options['file']}.npy"
+                sampler.ring.save(file_path)
+                print(f"{len(sampler.ring)} samples saved to {file_path}")
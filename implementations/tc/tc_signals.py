@@ -1,8 +1,10 @@
 from dataclasses import dataclass
 
-from implementations.tc.data_classes import Paths
+from implementations.tc.data_classes import Paths, Targets
+from implementations.tc.plc_pool import ALL_TARGETS, DEFAULT_TARGET, TARGET_PREFIX
 from signals.generic_signals import Signal, SignalDict
-from implementations.tc.console_hints import symbol_hint_callback, rpc_hint_callback
+from implementations.tc.console_hints import symbol_hint_callback, rpc_hint_callback, notification_hint_callback, \
+    notification_viewer_hint_callback, notification_query_hint_callback
 
 
 @dataclass
@@ -22,6 +24,7 @@ class TCSignal(Signal):
     stop_notification: bool = False
     start_notifications: bool = False
     show_notifications: bool = False
+    hide_notifications: bool = False
     add_to_notification_list: bool = False
     remove_from_notification_list: bool = False
     clear_notification_list: bool = False
@@ -32,27 +35,54 @@ class TCSignal(Signal):
     rpc: bool = False
     download_recipe: bool = False
     upload_recipe: bool = False
+    handle_cache: bool = False
+    notification_writer: bool = False
+    export_notifications: bool = False
+    rpc_batch: bool = False
+    jobs: bool = False
+    cancel: bool = False
+    sample: bool = False
+    notification_stats: bool = False
+    query_notifications: bool = False
+    notification_rates: bool = False
+
+
+_page_hints = {'offset=': None, 'limit=': None}
+
+
+def page_hint() -> dict[str, None]:
+    return _page_hints
+
+
+def target_hints(paths: Paths) -> dict[str, None]:
+    return dict.fromkeys(f'{TARGET_PREFIX}{alias}' for alias in
+                         [ALL_TARGETS, DEFAULT_TARGET, *Targets(paths.path_to_config_file).targets])
 
 
 class TCSignalDict(SignalDict):
     def __init__(self, paths: Paths):
         self.paths = paths
+        watchlist_hints = {**page_hint(), **target_hints(paths)}
+        recipe_hints = {'diff': None, **target_hints(paths)}
+        sample_hints = dict.fromkeys(['period=', 'duration=', 'cycles=', 'buffer=', 'file='])
         self._tc_signals = {
-            "GetAllSymbols": TCSignal(get_all_symbols=True),
+            "GetAllSymbols": TCSignal(get_all_symbols=True, nested_completer_func=page_hint),
             "GetSymbol": TCSignal(get_symbol=True, nested_completer_func=symbol_hint_callback(paths)),
             "SetSymbol": TCSignal(set_symbol=True, nested_completer_func=symbol_hint_callback(paths)),
             "IgnoreList": TCSignal(ignore_list=True),
             "AddToIgnore": TCSignal(add_to_ignore=True, nested_completer_func=symbol_hint_callback(paths)),
             "RemoveFromIgnore": TCSignal(remove_from_ignore=True),
             "ClearIgnoreList": TCSignal(clear_ignore_list=True),
-            "Watchlist": TCSignal(watchlist=True),
+            "Watchlist": TCSignal(watchlist=True, nested_completer_func=lambda: watchlist_hints),
             "AddToWatchlist": TCSignal(add_to_watchlist=True, nested_completer_func=symbol_hint_callback(paths)),
             "RemoveFromWatchlist": TCSignal(remove_from_watchlist=True),
             "ClearWatchlist": TCSignal(clear_watchlist=True),
             "Notify": TCSignal(notify=True, nested_completer_func=symbol_hint_callback(paths)),
             "StopNotification": TCSignal(stop_notification=True),
             "StartNotifications": TCSignal(start_notifications=True),
-            "ShowNotifications": TCSignal(show_notifications=True),
+            "ShowNotifications": TCSignal(show_notifications=True,
+                                          nested_completer_func=notification_viewer_hint_callback(paths)),
+            "HideNotifications": TCSignal(hide_notifications=True),
             "AddToNotificationList": TCSignal(add_to_notification_list=True,
                                               nested_completer_func=symbol_hint_callback(paths)),
             "RemoveFromNotificationList": TCSignal(remove_from_notification_list=True),
@@ -62,7 +92,20 @@ class TCSignalDict(SignalDict):
             "RemoveFromHintList": TCSignal(remove_from_hint_list=True),
             "ClearHintList": TCSignal(clear_hint_list=True),
             "RPC": TCSignal(rpc=True, nested_completer_func=rpc_hint_callback(paths)),
-            "DownloadRecipe": TCSignal(download_recipe=True),
-            "UploadRecipe": TCSignal(upload_recipe=True)
+            "RPCBatch": TCSignal(rpc_batch=True, nested_completer_func=rpc_hint_callback(paths)),
+            "DownloadRecipe": TCSignal(download_recipe=True, nested_completer_func=lambda: recipe_hints),
+            "UploadRecipe": TCSignal(upload_recipe=True),
+            "HandleCache": TCSignal(handle_cache=True),
+            "NotificationWriter": TCSignal(notification_writer=True),
+            "Jobs": TCSignal(jobs=True, immediate=True),
+            "Cancel": TCSignal(cancel=True, nested_completer_func=lambda: {'all': None}, immediate=True),
+            "ExportNotifications": TCSignal(export_notifications=True,
+                                            nested_completer_func=lambda: {'csv': None, 'json': None}),
+            "Sample": TCSignal(sample=True, nested_completer_func=lambda: sample_hints),
+            "NotificationStats": TCSignal(notification_stats=True,
+                                          nested_completer_func=notification_hint_callback(paths)),
+            "QueryNotifications": TCSignal(query_notifications=True,
+                                           nested_completer_func=notification_query_hint_callback(paths)),
+            "NotificationRates": TCSignal(notification_rates=True)
         }
         super().__init__(self._tc_signals)
@@ -9,6 +9,8 @@ class Signal(ABC):
     stop: bool = False
     payload: Optional[Any] = None
     nested_completer_func: Optional[Callable[[], dict]] = None
+    # Evaluated as soon as it is entered, not after the signals queued before it
+    immediate: bool = False
 
     @property
     def nested_completer_dict(self) -> Optional[dict]:
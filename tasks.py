@@ -6,3 +6,8 @@ def build_exe(c):
     cmd = "pyinstaller -p implementations/tc --name tcexplorer --onefile implementations/tc/main.py"
     result = run(cmd, hide=True, warn=True)
     print(result)
+
+
+@task
+def test(c):
+    run("python -m unittest discover -s tests -t .", warn=True)
@@ -0,0 +1,181 @@
+import asyncio
+import itertools
+import struct
+from typing import Optional
+
+from pyads.constants import ADSIGRP_SUMUP_READ, ADSIGRP_SUMUP_WRITE
+
+from implementations.tc.async_ads import ADS_COMMAND_READ, ADS_COMMAND_WRITE, ADS_COMMAND_READ_WRITE, \
+    ADS_COMMAND_READ_STATE, ADS_COMMAND_ADD_NOTIFICATION, ADS_COMMAND_DEL_NOTIFICATION, ADS_COMMAND_NOTIFICATION
+from implementations.tc.sum_commands import ADSIGRP_SUMUP_READWRITE
+
+ADS_STATE_RUN = 5
+ERROR_SERVICE_NOT_SUPPORTED = 0x701
+ERROR_SYMBOL_NOT_FOUND = 0x710
+ERROR_INVALID_SIZE = 0x705
+
+_tcp_header_struct = struct.Struct('<HI')
+_ams_header_struct = struct.Struct('<6sH6sHHHIII')
+_STATE_RESPONSE = 0x0005
+
+
+class AmsServer:
+    """Stand-in ADS device on AMS/TCP for the tests, holding values by index group and offset.
+
+    hold collects that many responses and sends them in reverse order, to
+    answer out of order. early_notifications sends a sample of a new
+    notification before the response to the add request.
+    """
+
+    def __init__(self, values: Optional[dict[tuple[int, int], bytes]] = None):
+        self.values: dict[tuple[int, int], bytearray] = {key: bytearray(value) for key, value in
+                                                         (values or {}).items()}
+        self.hold = 0
+        self.early_notifications = False
+        self.requests: list[int] = []
+        self.notifications: dict[int, tuple[int, int, int]] = {}
+        self._handles = itertools.count(1)
+        self._held: list[tuple] = []
+        self._server: Optional[asyncio.Server] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self.port = 0
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, '127.0.0.1', 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._server.close()
+        await self._server.wait_closed()
+
+    def notify(self, handle: int, filetime: int, data: bytes):
+        """Send a device notification with one sample."""
+        sample = struct.pack('<QIII', filetime, 1, handle, len(data)) + data
+        self._send(ADS_COMMAND_NOTIFICATION, 0, 0, struct.pack('<II', len(sample) + 4, 1) + sample, None)
+
+    def _send(self, command: int, error: int, invoke_id: int, data: bytes, request_header: Optional[tuple]):
+        target_net_id, target_port, source_net_id, source_port = request_header[:4] if request_header else \
+            (bytes(6), 0, bytes(6), 0)
+        header = _ams_header_struct.pack(source_net_id, source_port, target_net_id, target_port, command,
+                                         _STATE_RESPONSE, len(data), error, invoke_id)
+        self._writer.write(_tcp_header_struct.pack(0, len(header) + len(data)) + header + data)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._writer = writer
+        try:
+            while True:
+                _, length = _tcp_header_struct.unpack(await reader.readexactly(_tcp_header_struct.size))
+                packet = await reader.readexactly(length)
+                header = _ams_header_struct.unpack_from(packet)
+                command, invoke_id = header[4], header[8]
+                self.requests.append(command)
+                data = packet[_ams_header_struct.size:]
+                handler = self._handlers.get(command)
+                if handler is None:
+                    self._respond(command, ERROR_SERVICE_NOT_SUPPORTED, invoke_id, b'', header)
+                else:
+                    self._respond(command, 0, invoke_id, handler(self, data, header), header)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    def _respond(self, command: int, error: int, invoke_id: int, data: bytes, request_header: tuple):
+        if not self.hold:
+            self._send(command, error, invoke_id, data, request_header)
+            return
+        self._held.append((command, error, invoke_id, data, request_header))
+        if len(self._held) >= self.hold:
+            for response in reversed(self._held):
+                self._send(*response)
+            self._held = []
+
+    def _read_value(self, index_group: int, index_offset: int, size: int) -> tuple[int, bytes]:
+        value = self.values.get((index_group, index_offset))
+        if value is None:
+            return ERROR_SYMBOL_NOT_FOUND, b''
+        if size > len(value):
+            return ERROR_INVALID_SIZE, b''
+        return 0, bytes(value[:size])
+
+    def _write_value(self, index_group: int, index_offset: int, data: bytes) -> int:
+        if (index_group, index_offset) not in self.values:
+            return ERROR_SYMBOL_NOT_FOUND
+        self.values[(index_group, index_offset)][:len(data)] = data
+        return 0
+
+    def _read(self, data: bytes, _) -> bytes:
+        error, value = self._read_value(*struct.unpack_from('<III', data))
+        return struct.pack('<II', error, len(value)) + value
+
+    def _write(self, data: bytes, _) -> bytes:
+        index_group, index_offset, length = struct.unpack_from('<III', data)
+        return struct.pack('<I', self._write_value(index_group, index_offset, data[12:12 + length]))
+
+    def _read_state(self, *_) -> bytes:
+        return struct.pack('<IHH', 0, ADS_STATE_RUN, 0)
+
+    def _read_write(self, data: bytes, _) -> bytes:
+        index_group, index_offset, read_length, length = struct.unpack_from('<IIII', data)
+        write_data = data[16:16 + length]
+        # The index offset of a sum command is its number of sub requests
+        count = index_offset
+        if index_group == ADSIGRP_SUMUP_READ:
+            requests = list(struct.iter_unpack('<III', write_data[:12 * count]))
+            results = [self._read_value(*request) for request in requests]
+            response = b''.join(struct.pack('<I', error) for error, _ in results)
+            # Every sub request gets its size of data, failed ones too
+            response += b''.join(value.ljust(size, b'\x00') for (error, value), (_, _, size) in zip(results, requests))
+        elif index_group == ADSIGRP_SUMUP_WRITE:
+            offset = 12 * count
+            response = b''
+            for request_group, request_offset, size in struct.iter_unpack('<III', write_data[:offset]):
+                response += struct.pack('<I', self._write_value(request_group, request_offset,
+                                                                write_data[offset:offset + size]))
+                offset += size
+        elif index_group == ADSIGRP_SUMUP_READWRITE:
+            offset = 16 * count
+            results = []
+            for request_group, request_offset, read_length, write_length in struct.iter_unpack(
+                    '<IIII', write_data[:offset]):
+                value = write_data[offset:offset + write_length]
+                offset += write_length
+                # Writes the value and reads it back
+                error = self._write_value(request_group, request_offset, value) if value else 0
+                if not error:
+                    error, value = self._read_value(request_group, request_offset, read_length)
+                results.append((error, b'' if error else value))
+            response = b''.join(struct.pack('<II', error, len(value)) for error, value in results)
+            response += b''.join(value for _, value in results)
+        else:
+            # Writes the value and reads it back
+            error = self._write_value(index_group, index_offset, write_data) if write_data else 0
+            if not error:
+                error, response = self._read_value(index_group, index_offset, read_length)
+            if error:
+                return struct.pack('<II', error, 0)
+        return struct.pack('<II', 0, len(response)) + response
+
+    def _add_notification(self, data: bytes, header: tuple) -> bytes:
+        index_group, index_offset, size = struct.unpack_from('<III', data)
+        if (index_group, index_offset) not in self.values:
+            return struct.pack('<II', ERROR_SYMBOL_NOT_FOUND, 0)
+        handle = next(self._handles)
+        self.notifications[handle] = (index_group, index_offset, size)
+        if self.early_notifications:
+            self.notify(handle, 1, bytes(self.values[(index_group, index_offset)][:size]))
+        return struct.pack('<II', 0, handle)
+
+    def _del_notification(self, data: bytes, _) -> bytes:
+        handle, = struct.unpack_from('<I', data)
+        return struct.pack('<I', 0 if self.notifications.pop(handle, None) else ERROR_SYMBOL_NOT_FOUND)
+
+    _handlers = {
+        ADS_COMMAND_READ: _read,
+        ADS_COMMAND_WRITE: _write,
+        ADS_COMMAND_READ_STATE: _read_state,
+        ADS_COMMAND_READ_WRITE: _read_write,
+        ADS_COMMAND_ADD_NOTIFICATION: _add_notification,
+        ADS_COMMAND_DEL_NOTIFICATION: _del_notification,
+    }
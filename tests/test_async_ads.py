@@ -0,0 +1,143 @@
+import asyncio
+import struct
+import threading
+import unittest
+
+from pyads import ADSError
+from pyads.constants import PLCTYPE_DINT, PLCTYPE_INT
+
+from implementations.tc.async_ads import AsyncAdsConnection, AdsClientThread, read_symbols
+from implementations.tc.sum_commands import SumCommandReport
+from tests.ams_server import AmsServer, ADS_STATE_RUN, ERROR_SERVICE_NOT_SUPPORTED, ERROR_SYMBOL_NOT_FOUND
+
+GROUP = 0x4020
+
+
+def dint(value: int) -> bytes:
+    return struct.pack('<i', value)
+
+
+class FakeSymbol:
+    def __init__(self, name: str, index_offset: int, plc_type):
+        self.name = name
+        self.index_group = GROUP
+        self.index_offset = index_offset
+        self.plc_type = plc_type
+
+
+class AsyncAdsConnectionTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.server = AmsServer({(GROUP, 0): dint(1), (GROUP, 4): dint(2), (GROUP, 8): dint(3)})
+        await self.server.start()
+        self.connection = AsyncAdsConnection('127.0.0.1.1.1', 851, '127.0.0.1', timeout=2,
+                                             tcp_port=self.server.port)
+        await self.connection.open()
+
+    async def asyncTearDown(self):
+        await self.connection.close()
+        await self.server.stop()
+
+    async def test_read_write(self):
+        self.assertEqual(await self.connection.read(GROUP, 4, 4), dint(2))
+        await self.connection.write(GROUP, 4, dint(-5))
+        self.assertEqual(await self.connection.read(GROUP, 4, 4), dint(-5))
+
+    async def test_read_write_command(self):
+        self.assertEqual(await self.connection.read_write(GROUP, 8, 4), dint(3))
+
+    async def test_read_state(self):
+        self.assertEqual(await self.connection.read_state(), (ADS_STATE_RUN, 0))
+
+    async def test_sum_read(self):
+        results = await self.connection.sum_read([(GROUP, 0, 4), (GROUP, 100, 4), (GROUP, 8, 4)])
+        self.assertEqual(results, [(0, dint(1)), (ERROR_SYMBOL_NOT_FOUND, bytes(4)), (0, dint(3))])
+
+    async def test_sum_write(self):
+        errors = await self.connection.sum_write([(GROUP, 0, dint(10)), (GROUP, 100, dint(0)), (GROUP, 8, dint(30))])
+        self.assertEqual(errors, [0, ERROR_SYMBOL_NOT_FOUND, 0])
+        self.assertEqual(self.server.values[(GROUP, 0)], dint(10))
+        self.assertEqual(self.server.values[(GROUP, 8)], dint(30))
+
+    async def test_sum_read_write(self):
+        results = await self.connection.sum_read_write([(GROUP, 0, 4, dint(7)), (GROUP, 100, 4, b''),
+                                                        (GROUP, 4, 4, b'')])
+        self.assertEqual(results, [(0, dint(7)), (ERROR_SYMBOL_NOT_FOUND, b''), (0, dint(2))])
+
+    async def test_out_of_order_responses(self):
+        self.server.hold = 3
+        results = await asyncio.gather(*(self.connection.read(GROUP, offset, 4) for offset in (0, 4, 8)))
+        self.assertEqual(results, [dint(1), dint(2), dint(3)])
+        self.assertEqual(self.connection.max_in_flight, 3)
+
+    async def test_ads_error_in_response(self):
+        with self.assertRaises(ADSError) as context:
+            await self.connection.read(GROUP, 100, 4)
+        self.assertEqual(context.exception.err_code, ERROR_SYMBOL_NOT_FOUND)
+
+    async def test_ads_error_in_header(self):
+        with self.assertRaises(ADSError) as context:
+            await self.connection.request(1)
+        self.assertEqual(context.exception.err_code, ERROR_SERVICE_NOT_SUPPORTED)
+        # The connection is still usable
+        self.assertEqual(await self.connection.read(GROUP, 0, 4), dint(1))
+
+    async def test_notifications(self):
+        samples = []
+        handle = await self.connection.add_device_notification(
+            GROUP, 0, 4, lambda *sample: samples.append(sample))
+        self.server.notify(handle, 100, dint(42))
+        await self.connection.read_state()
+        self.assertEqual(samples, [(handle, 100, dint(42))])
+        await self.connection.del_device_notification(handle)
+        self.assertEqual(self.server.notifications, {})
+
+    async def test_early_notification(self):
+        self.server.early_notifications = True
+        samples = []
+        handle = await self.connection.add_device_notification(
+            GROUP, 4, 4, lambda *sample: samples.append(sample))
+        self.assertEqual(samples, [(handle, 1, dint(2))])
+
+    async def test_connection_lost(self):
+        await self.server.stop()
+        with self.assertRaises(ConnectionError):
+            await self.connection.read(GROUP, 0, 4)
+
+    async def test_read_symbols(self):
+        symbols = [FakeSymbol('MAIN.a', 0, PLCTYPE_DINT), FakeSymbol('MAIN.b', 4, None),
+                   FakeSymbol('MAIN.c', 100, PLCTYPE_DINT), FakeSymbol('MAIN.d', 8, PLCTYPE_INT)]
+        report = SumCommandReport()
+        # One symbol per sum read, all of them in flight at once
+        values = await read_symbols(self.connection, symbols, 1, 0x10000, report)
+        self.assertEqual([value for _, value in values], [1, None, 'symbol not found', 3])
+        self.assertEqual((report.symbols, report.errors, report.round_trips), (4, 1, 3))
+        self.assertEqual(self.connection.max_in_flight, 3)
+
+
+class AdsClientThreadTest(unittest.TestCase):
+
+    def test_blocking_calls(self):
+        server = AmsServer({(GROUP, 0): dint(1)})
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(server.start())
+        server_thread = threading.Thread(target=loop.run_forever, daemon=True)
+        server_thread.start()
+        client = AdsClientThread(AsyncAdsConnection('127.0.0.1.1.1', 851, '127.0.0.1', timeout=2,
+                                                    tcp_port=server.port))
+        client.open()
+        try:
+            client.write(GROUP, 0, dint(9))
+            self.assertEqual(client.read(GROUP, 0, 4), dint(9))
+            self.assertEqual(client.sum_read([(GROUP, 0, 4)]), [(0, dint(9))])
+            self.assertEqual(client.read_state(), (ADS_STATE_RUN, 0))
+        finally:
+            client.close()
+            asyncio.run_coroutine_threadsafe(server.stop(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            server_thread.join()
+            loop.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+
+from implementations.tc.ignore_rules import IgnoreRules
+
+
+class IgnoreRulesTest(unittest.TestCase):
+
+    def test_exact(self):
+        rules = IgnoreRules(['MAIN.x', ' MAIN.y ', ''])
+        self.assertEqual(rules.match('MAIN.x'), 'MAIN.x')
+        self.assertEqual(rules.match('MAIN.y'), 'MAIN.y')
+        self.assertIsNone(rules.match('MAIN.xy'))
+        self.assertEqual(len(rules), 2)
+
+    def test_prefix(self):
+        rules = IgnoreRules(['Constants.*', 'Const*'])
+        self.assertEqual(rules.match('Constants.k'), 'Const*')
+        self.assertEqual(rules.match('Constantin'), 'Const*')
+        self.assertIsNone(rules.match('Cons'))
+        rules = IgnoreRules(['Constants.*'])
+        self.assertEqual(rules.match('Constants.'), 'Constants.*')
+        self.assertIsNone(rules.match('Constants'))
+
+    def test_glob(self):
+        rules = IgnoreRules(['*.bError', 'GVL.?x'])
+        self.assertEqual(rules.match('MAIN.fb.bError'), '*.bError')
+        self.assertEqual(rules.match('GVL.ax'), 'GVL.?x')
+        self.assertIsNone(rules.match('GVL.abx'))
+        self.assertIsNone(rules.match('MAIN.bErrorCount'))
+
+    def test_brackets_are_literal(self):
+        rules = IgnoreRules(['MAIN.arr[1]', 'GVL.a[*', '*.b[2].x'])
+        self.assertEqual(rules.match('MAIN.arr[1]'), 'MAIN.arr[1]')
+        self.assertIsNone(rules.match('MAIN.arr1'))
+        self.assertEqual(rules.match('GVL.a[3]'), 'GVL.a[*')
+        self.assertEqual(rules.match('MAIN.b[2].x'), '*.b[2].x')
+        self.assertIsNone(rules.match('MAIN.b2.x'))
+
+    def test_filter_counts(self):
+        rules = IgnoreRules(['MAIN.x', 'GVL.*'])
+        kept = rules.filter(['MAIN.x', 'MAIN.y', 'GVL.a', 'GVL.b'], lambda name: name)
+        self.assertEqual(kept, ['MAIN.y'])
+        self.assertEqual(rules.counts, {'MAIN.x': 1, 'GVL.*': 2})
+        self.assertEqual(rules.report().splitlines()[0], "3 symbols ignored by 2 rules")
+
+
+if __name__ == '__main__':
+    unittest.main()
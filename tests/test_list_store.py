@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from utilities.list_store import ListStore
+
+
+class ListStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.directory, 'list.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_journal_and_compact(self):
+        store = ListStore(self.file_path, compact_threshold=3)
+        for entry in ('a', 'b', 'c'):
+            store.add(entry)
+        store.remove('b')
+        store.add('d')
+        self.assertEqual(list(ListStore(self.file_path)), ['a', 'c', 'd'])
+        self.assertTrue(os.path.isfile(f'{self.file_path}.journal'))
+        store.compact()
+        self.assertFalse(os.path.isfile(f'{self.file_path}.journal'))
+        with open(self.file_path) as file:
+            self.assertEqual(file.read(), 'a\nc\nd\n')
+
+    def test_concurrent_changes(self):
+        store = ListStore(self.file_path, compact_threshold=50)
+        barrier = threading.Barrier(4)
+
+        def change(thread: int):
+            barrier.wait()
+            for i in range(200):
+                store.add(f'{thread}.{i}')
+                if i % 2:
+                    store.remove(f'{thread}.{i - 1}')
+                if i % 50 == 0:
+                    with store.batch():
+                        store.add(f'{thread}.batch{i}')
+                        store.to_dict()
+
+        threads = [threading.Thread(target=change, args=(thread,)) for thread in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        expected = {f'{thread}.{i}' for thread in range(4) for i in range(1, 200, 2)} | \
+            {f'{thread}.batch{i}' for thread in range(4) for i in range(0, 200, 50)}
+        self.assertEqual(set(store), expected)
+        # What got written to the file and the journal holds the same entries
+        self.assertEqual(set(ListStore(self.file_path)), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from implementations.tc import main
+from implementations.tc.tc_signals import TCSignal
+from signal_analyzers.generic_signal_analyzers import SignalAnalyzer
+from signals.generic_signals import Signal
+
+
+class FakeSignalDict(dict):
+    paths = SimpleNamespace(session_history_file_path='')
+
+
+class FakePromptSession:
+    def __init__(self, inputs: list[str]):
+        self._inputs = iter(inputs)
+
+    async def prompt_async(self) -> str:
+        # The app loop gets to run between two inputs
+        await asyncio.sleep(0.01)
+        return next(self._inputs)
+
+
+class BlockingAnalyzer(SignalAnalyzer):
+    """Holds a foreground command until Cancel got evaluated."""
+
+    def __init__(self):
+        self.cancelled = asyncio.Event()
+        self.evaluated: list[str] = []
+
+    async def eval(self, signal: Signal):
+        if signal.cancel:
+            self.cancelled.set()
+        elif signal.get_symbol:
+            await asyncio.wait_for(self.cancelled.wait(), 2)
+        self.evaluated.append(signal.payload[0])
+
+    def cleanup(self):
+        pass
+
+
+class InputControllerTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_cancel_bypasses_the_queue(self):
+        signal_dict = FakeSignalDict({
+            'GetSymbol': TCSignal(get_symbol=True),
+            'Jobs': TCSignal(jobs=True, immediate=True),
+            'Cancel': TCSignal(cancel=True, immediate=True),
+            'Quit': TCSignal(stop=True),
+        })
+        analyzer = BlockingAnalyzer()
+        queue = asyncio.Queue()
+        session = FakePromptSession(['GetSymbol get', 'Jobs jobs', 'Cancel cancel', 'Quit quit'])
+        with mock.patch.object(main, 'PromptSession', return_value=session), \
+                mock.patch.object(main, 'SignalCompleter'), mock.patch.object(main, 'FileHistory'):
+            await asyncio.gather(main.input_controller(queue, signal_dict, analyzer), main.app_loop(queue, analyzer))
+        self.assertEqual(analyzer.evaluated, ['jobs', 'cancel', 'get', 'quit'])
+
+
+if __name__ == '__main__':
+    unittest.main()
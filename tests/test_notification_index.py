@@ -0,0 +1,137 @@
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from pyads.constants import PLCTYPE_DINT, PLCTYPE_REAL
+
+from implementations.tc import notification_index
+from implementations.tc.notification_index import IndexedNotificationSink, NotificationIndex, compress_indexed, \
+    index_file_path
+from implementations.tc.notification_log import NotificationSymbolDictionary, make_notification_sink, \
+    read_binary_log, datetime_to_filetime, filetime_to_str, log_data_start
+from implementations.tc.notification_query import NotificationQuery, QueryReport, parse_query_time
+
+BASE = 133_000_000_000_000_000
+STEP = 10_000
+
+
+class NotificationIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.directory, 'notifications.bin')
+        symbols = NotificationSymbolDictionary()
+        self.x = symbols.get('MAIN.x', 'DINT', PLCTYPE_DINT)
+        self.y = symbols.get('MAIN.y', 'REAL', PLCTYPE_REAL)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_log(self, log_format: str, count: int, block_bytes: int = 0x10000):
+        """Notifications of MAIN.x with the values 0 to count - 1, MAIN.y only in the second half."""
+        sink = IndexedNotificationSink(make_notification_sink(log_format, self.file_path), self.file_path)
+        with mock.patch.object(notification_index, 'INDEX_BLOCK_BYTES', block_bytes):
+            sink.open()
+            for i in range(0, count, 10):
+                events = [(BASE + j * STEP, self.x, bytearray(struct.pack('<i', j))) for j in range(i, i + 10)]
+                if i >= count // 2:
+                    events.append((BASE + i * STEP, self.y, bytearray(struct.pack('<f', 0.5))))
+                sink.write(events)
+            sink.close()
+
+    def rows(self, log_format: str, name: str, first: int, last: int, report: QueryReport = None) -> list:
+        return list(NotificationQuery(self.file_path, log_format).rows(name, first, last, report or QueryReport()))
+
+    def test_binary_log_round_trip(self):
+        self.write_log('binary', 20)
+        records = list(read_binary_log(self.file_path))
+        self.assertEqual(len(records), 21)
+        self.assertEqual(records[0], (BASE, 'MAIN.x', 0))
+        self.assertEqual(records[-1], (BASE + 10 * STEP, 'MAIN.y', 0.5))
+
+    def test_index_records(self):
+        self.write_log('binary', 100, block_bytes=200)
+        index = NotificationIndex.read(index_file_path(self.file_path))
+        self.assertEqual(index.sessions, [{0: ('MAIN.x', 'DINT'), 1: ('MAIN.y', 'REAL')}])
+        ranges = index.ranges()
+        self.assertGreater(len(ranges), 1)
+        # The blocks cover the log without holes
+        self.assertEqual(ranges[0][0], 6)
+        self.assertEqual(ranges[-1][1], os.path.getsize(self.file_path))
+        self.assertTrue(all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:])))
+        self.assertEqual(int(index._get_arrays()['count'].sum()), 105)
+        # MAIN.y is only in the blocks of the second half
+        self.assertLess(len(index.select('MAIN.y', 0, 2 ** 62)), len(index.select('MAIN.x', 0, 2 ** 62)))
+        selected = index.select('MAIN.x', BASE + 45 * STEP, BASE + 46 * STEP)
+        self.assertEqual(len(selected), 1)
+        self.assertFalse(selected[0].gap)
+        self.assertEqual(index.select('MAIN.z', 0, 2 ** 62), [])
+
+    def test_unindexed_tail_is_a_gap(self):
+        self.write_log('binary', 20)
+        with open(self.file_path, 'ab') as file:
+            file.write(b'\x00' * 3)
+        with open(self.file_path, 'rb') as file:
+            data_start = log_data_start(file)
+        index = NotificationIndex.read(index_file_path(self.file_path))
+        gapped = index.with_gaps(data_start, os.path.getsize(self.file_path))
+        self.assertEqual(len(gapped), len(index) + 1)
+        self.assertTrue(gapped.select('MAIN.z', 0, 1)[0].gap)
+
+    def test_query(self):
+        for log_format in ('binary', 'csv'):
+            with self.subTest(log_format=log_format):
+                self.write_log(log_format, 1000, block_bytes=1000)
+                report = QueryReport()
+                rows = self.rows(log_format, 'MAIN.x', BASE + 500 * STEP, BASE + 509 * STEP, report)
+                self.assertEqual([int(value) for _, value in rows], list(range(500, 510)))
+                self.assertEqual(rows[0][0], filetime_to_str(BASE + 500 * STEP))
+                self.assertEqual(report.files, 1)
+                self.assertLess(report.bytes_read, os.path.getsize(self.file_path) // 10)
+                self.assertEqual(report.unindexed_ranges, 0)
+                os.remove(self.file_path)
+                os.remove(index_file_path(self.file_path))
+
+    def test_query_without_index(self):
+        self.write_log('binary', 100)
+        os.remove(index_file_path(self.file_path))
+        report = QueryReport()
+        rows = self.rows('binary', 'MAIN.y', BASE, BASE + 1000 * STEP, report)
+        self.assertEqual([value for _, value in rows], [0.5] * 5)
+        self.assertEqual(report.unindexed_ranges, 1)
+
+    def test_query_compressed(self):
+        self.write_log('binary', 1000, block_bytes=1000)
+        compressed_path = os.path.join(self.directory, 'segment.bin.gz')
+        with open(self.file_path, 'rb') as file:
+            data_start = log_data_start(file)
+        self.assertTrue(compress_indexed(self.file_path, compressed_path, data_start))
+        self.assertFalse(os.path.isfile(index_file_path(self.file_path)))
+        query = NotificationQuery(self.file_path, 'binary')
+        report = QueryReport()
+        rows = list(query._file_rows(compressed_path, 'MAIN.x', BASE + 900 * STEP, BASE + 904 * STEP, report))
+        self.assertEqual([value for _, value in rows], list(range(900, 905)))
+        self.assertLess(report.bytes_read, os.path.getsize(compressed_path) // 10)
+
+    def test_aggregate(self):
+        self.write_log('csv', 100)
+        aggregate = NotificationQuery(self.file_path, 'csv').aggregate('MAIN.x', BASE + 10 * STEP,
+                                                                      BASE + 19 * STEP, QueryReport())
+        self.assertEqual((aggregate.count, aggregate.min, aggregate.max, aggregate.mean), (10, 10, 19, 14.5))
+        self.assertEqual((aggregate.first, aggregate.last), ('10', '19'))
+
+    def test_parse_query_time(self):
+        self.assertEqual(parse_query_time('2024-05-01T12:30'), datetime_to_filetime(datetime(2024, 5, 1, 12, 30)))
+        self.assertEqual(parse_query_time('2024-05-01T12:30:15.5'),
+                         datetime_to_filetime(datetime(2024, 5, 1, 12, 30, 15, 500000)))
+        self.assertEqual(parse_query_time('12:30') % (24 * 3600 * 10 ** 7), (12 * 60 + 30) * 60 * 10 ** 7)
+        with self.assertRaises(ValueError):
+            parse_query_time('yesterday')
+
+
+if __name__ == '__main__':
+    unittest.main()
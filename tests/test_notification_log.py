@@ -0,0 +1,94 @@
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from unittest import mock
+
+from pyads.constants import PLCTYPE_DINT
+
+from implementations.tc import notification_index, notification_log
+from implementations.tc.notification_index import IndexedNotificationSink, index_file_path
+from implementations.tc.notification_log import NotificationLogFollower, NotificationSymbolDictionary, \
+    make_notification_sink, filetime_to_str
+
+BASE = 133_000_000_000_000_000
+STEP = 10_000
+
+
+class NotificationLogFollowerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.directory, 'notifications.bin')
+        symbols = NotificationSymbolDictionary()
+        self.symbols = [symbols.get(f'MAIN.x{i}', 'DINT', PLCTYPE_DINT) for i in range(3)]
+        self.sink = None
+
+    def tearDown(self):
+        if self.sink is not None:
+            self.sink.close()
+        shutil.rmtree(self.directory)
+
+    def open_sink(self, log_format: str = 'binary'):
+        self.sink = IndexedNotificationSink(make_notification_sink(log_format, self.file_path), self.file_path)
+        self.sink.open()
+
+    def write(self, first: int, count: int):
+        # Every symbol in turn, so a tail block needs the symbols defined before it
+        with mock.patch.object(notification_index, 'INDEX_BLOCK_BYTES', 500):
+            self.sink.write([(BASE + i * STEP, self.symbols[i % 3], bytearray(struct.pack('<i', i)))
+                             for i in range(first, first + count)])
+        self.sink.flush()
+
+    @staticmethod
+    def row(i: int) -> tuple[str, str, str]:
+        return filetime_to_str(BASE + i * STEP), f'MAIN.x{i % 3}', str(i)
+
+    def test_binary_tail_from_index(self):
+        self.open_sink()
+        for first in range(0, 1000, 10):
+            self.write(first, 10)
+        follower = NotificationLogFollower(self.file_path, 'binary', tail=25)
+        with mock.patch.object(notification_log, '_scan_records', wraps=notification_log._scan_records) as scan:
+            self.assertEqual(follower.read(), [self.row(i) for i in range(975, 1000)])
+        # Only the blocks at the end were scanned
+        self.assertLess(sum(len(call.args[0]) for call in scan.call_args_list), os.path.getsize(self.file_path) // 10)
+        self.write(1000, 2)
+        self.assertEqual(follower.read(), [self.row(1000), self.row(1001)])
+        follower.close()
+
+    def test_binary_tail_with_unindexed_end(self):
+        self.open_sink()
+        for first in range(0, 100, 10):
+            self.write(first, 10)
+        # The open block isn't in the index yet
+        self.sink.write([(BASE + 100 * STEP, self.symbols[1], bytearray(struct.pack('<i', 100)))])
+        self.sink.flush()
+        follower = NotificationLogFollower(self.file_path, 'binary', tail=3)
+        self.assertEqual(follower.read(), [self.row(98), self.row(99), self.row(100)])
+        follower.close()
+
+    def test_binary_tail_without_index(self):
+        self.open_sink()
+        self.write(0, 100)
+        self.sink.close()
+        self.sink = None
+        os.remove(index_file_path(self.file_path))
+        follower = NotificationLogFollower(self.file_path, 'binary', tail=5)
+        self.assertEqual(follower.read(), [self.row(i) for i in range(95, 100)])
+        follower.close()
+
+    def test_csv_tail(self):
+        self.file_path = os.path.join(self.directory, 'notifications.csv')
+        self.open_sink('csv')
+        self.write(0, 100)
+        follower = NotificationLogFollower(self.file_path, 'csv', tail=5)
+        self.assertEqual(follower.read(), [self.row(i) for i in range(95, 100)])
+        self.write(100, 1)
+        self.assertEqual(follower.read(), [self.row(100)])
+        follower.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
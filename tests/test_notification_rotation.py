@@ -0,0 +1,127 @@
+import os
+import shutil
+import struct
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from pyads.constants import PLCTYPE_DINT
+
+from implementations.tc import notification_rotation
+from implementations.tc.notification_index import IndexedNotificationSink, index_file_path
+from implementations.tc.notification_log import NotificationSymbolDictionary, make_notification_sink
+from implementations.tc.notification_query import NotificationQuery, QueryReport
+from implementations.tc.notification_rotation import RotatingNotificationSink, COMPRESSED_SUFFIX, \
+    COMPRESSION_GZIP, COMPRESSION_NONE, read_manifest
+
+BASE = 133_000_000_000_000_000
+
+
+def make_sink(log_format: str):
+    return lambda file_path: IndexedNotificationSink(make_notification_sink(log_format, file_path), file_path)
+
+
+def wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out")
+        time.sleep(0.01)
+
+
+class RotatingNotificationSinkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.directory, 'notifications.bin')
+        self.symbol = NotificationSymbolDictionary().get('MAIN.x', 'DINT', PLCTYPE_DINT)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def events(self, first: int, count: int) -> list:
+        return [(BASE + i * 10_000, self.symbol, bytearray(struct.pack('<i', i))) for i in range(first, first + count)]
+
+    def write_batches(self, sink: RotatingNotificationSink, batches: int, batch_size: int = 10):
+        for batch in range(batches):
+            sink.write(self.events(batch * batch_size, batch_size))
+            sink.flush()
+
+    def query(self, log_format: str = 'binary', first: int = BASE, last: int = BASE + 10 ** 9) -> list:
+        return [int(value) for _, value in
+                NotificationQuery(self.file_path, log_format).rows('MAIN.x', first, last, QueryReport())]
+
+    def test_rotation_by_size(self):
+        sink = RotatingNotificationSink(make_sink('binary'), self.file_path, 200, 0, COMPRESSION_NONE, 0)
+        sink.open()
+        self.write_batches(sink, 5)
+        sink.close()
+        segments = read_manifest(self.file_path)
+        self.assertEqual(sink.rotations, 5)
+        self.assertEqual(len(segments), 5)
+        self.assertEqual([segment['events'] for segment in segments], [10] * 5)
+        for batch, segment in enumerate(segments):
+            self.assertTrue(os.path.isfile(os.path.join(self.directory, segment['file'])))
+            self.assertTrue(os.path.isfile(index_file_path(os.path.join(self.directory, segment['file']))))
+            self.assertEqual(segment['first_filetime'], BASE + batch * 100_000)
+            self.assertEqual(segment['last_filetime'], BASE + (batch * 10 + 9) * 10_000)
+        self.assertEqual(self.query(), list(range(50)))
+
+    def test_manifest_time_range_of_unordered_batch(self):
+        sink = RotatingNotificationSink(make_sink('binary'), self.file_path, 1, 0, COMPRESSION_NONE, 0)
+        sink.open()
+        sink.write(list(reversed(self.events(0, 10))))
+        sink.flush()
+        sink.close()
+        segment, = read_manifest(self.file_path)
+        self.assertEqual((segment['first_filetime'], segment['last_filetime']), (BASE, BASE + 90_000))
+        # Bounded by the time range, the segment must not be skipped
+        self.assertEqual(self.query(first=BASE, last=BASE + 20_000), [2, 1, 0])
+
+    def test_gzip_and_retention(self):
+        sink = RotatingNotificationSink(make_sink('csv'), self.file_path, 200, 0, COMPRESSION_GZIP, 2)
+        sink.open()
+        self.write_batches(sink, 4)
+        wait_for(lambda: sink._compressor.removed == 2 and all(
+            segment['file'].endswith(COMPRESSED_SUFFIX) for segment in read_manifest(self.file_path)))
+        sink.close()
+        self.assertEqual(len(read_manifest(self.file_path)), 2)
+        files = sorted(os.listdir(self.directory))
+        # Two segments with their indexes, the current log, its index and the manifest
+        self.assertEqual(len(files), 7, files)
+        self.assertEqual(self.query('csv'), list(range(20, 40)))
+
+    def test_rotation_by_age(self):
+        sink = RotatingNotificationSink(make_sink('binary'), self.file_path, 0, 0.01, COMPRESSION_NONE, 0)
+        sink.open()
+        sink.write(self.events(0, 1))
+        time.sleep(0.02)
+        sink.flush()
+        sink.flush()
+        sink.close()
+        self.assertEqual(sink.rotations, 1)
+
+    def test_failed_rename_keeps_writing(self):
+        sink = RotatingNotificationSink(make_sink('binary'), self.file_path, 200, 0, COMPRESSION_NONE, 0)
+        sink.open()
+        replace = os.replace
+        failures = [PermissionError(13, 'in use')]
+
+        def failing_replace(source, target):
+            if failures and source == self.file_path:
+                raise failures.pop()
+            replace(source, target)
+
+        with mock.patch.object(notification_rotation.os, 'replace', failing_replace), \
+                mock.patch.object(notification_rotation, 'ROTATION_RETRY_INTERVAL', 0), \
+                mock.patch('builtins.print'):
+            self.write_batches(sink, 3)
+        sink.close()
+        self.assertEqual((sink.rotations, sink.failed_rotations), (2, 1))
+        self.assertEqual([segment['events'] for segment in read_manifest(self.file_path)], [20, 10])
+        self.assertEqual(self.query(), list(range(30)))
+
+
+if __name__ == '__main__':
+    unittest.main()
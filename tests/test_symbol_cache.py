@@ -0,0 +1,103 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from implementations.tc import symbol_cache
+from implementations.tc.symbol_cache import SymbolInfo, SymbolVersion, SymbolTableCache, parse_symbol_entry, \
+    read_symbol_cache, write_symbol_cache, _symbol_entry_struct
+
+VERSION = SymbolVersion(3, 2, 200)
+SYMBOL_INFOS = [
+    SymbolInfo('MAIN.nCount', 'DINT', '', 0x4020, 0, 4, 3),
+    SymbolInfo('GVL.sTemperaturFühler', 'STRING(80)', 'Température °C', 0x4040, 0x1234, 81, 30),
+]
+
+
+def symbol_entry(info: SymbolInfo) -> bytes:
+    name, symbol_type, comment = (text.encode('cp1252') for text in (info.name, info.symbol_type, info.comment))
+    strings = name + b'\x00' + symbol_type + b'\x00' + comment + b'\x00'
+    return _symbol_entry_struct.pack(_symbol_entry_struct.size + len(strings), info.index_group, info.index_offset,
+                                     info.size, info.data_type, 0, len(name), len(symbol_type), len(comment)) + strings
+
+
+class FakePlc:
+    ams_netid = '127.0.0.1.1.1'
+    ams_port = 851
+
+
+class FakeWatcher:
+    generation = 0
+
+
+class SymbolCacheFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.directory, 'symbol_cache.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        write_symbol_cache(self.file_path, VERSION, SYMBOL_INFOS)
+        self.assertEqual(read_symbol_cache(self.file_path, VERSION), SYMBOL_INFOS)
+        self.assertFalse(os.path.exists(self.file_path + '.tmp'))
+
+    def test_empty_table(self):
+        write_symbol_cache(self.file_path, SymbolVersion(0, 0, 0), [])
+        self.assertEqual(read_symbol_cache(self.file_path, SymbolVersion(0, 0, 0)), [])
+
+    def test_other_version_is_a_miss(self):
+        write_symbol_cache(self.file_path, VERSION, SYMBOL_INFOS)
+        self.assertIsNone(read_symbol_cache(self.file_path, SymbolVersion(4, 2, 200)))
+        self.assertIsNone(read_symbol_cache(self.file_path, SymbolVersion(3, 3, 200)))
+
+    def test_missing_or_foreign_file_is_a_miss(self):
+        self.assertIsNone(read_symbol_cache(self.file_path, VERSION))
+        with open(self.file_path, 'wb') as file:
+            file.write(b'TCNL\x01\x00')
+        self.assertIsNone(read_symbol_cache(self.file_path, VERSION))
+        with open(self.file_path, 'wb') as file:
+            file.write(b'XXXX' + bytes(30))
+        self.assertIsNone(read_symbol_cache(self.file_path, VERSION))
+
+    def test_parse_symbol_entry(self):
+        table = b''.join(symbol_entry(info) for info in SYMBOL_INFOS)
+        first, length = parse_symbol_entry(table)
+        self.assertEqual(first, SYMBOL_INFOS[0])
+        self.assertEqual(parse_symbol_entry(table, length), (SYMBOL_INFOS[1], len(symbol_entry(SYMBOL_INFOS[1]))))
+
+
+class SymbolTableCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = SymbolTableCache(FakePlc(), os.path.join(self.directory, 'symbol_cache.bin'), FakeWatcher())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def refresh(self, version: SymbolVersion) -> tuple[bool, int]:
+        with mock.patch.object(symbol_cache, 'read_symbol_version', return_value=version), \
+                mock.patch.object(symbol_cache, 'upload_symbol_infos', return_value=SYMBOL_INFOS) as upload:
+            changed = self.cache.refresh()
+        return changed, upload.call_count
+
+    def test_upload_only_on_new_version(self):
+        self.assertEqual(self.refresh(VERSION), (True, 1))
+        self.assertTrue(os.path.isfile(os.path.join(self.directory, 'symbol_cache_127.0.0.1.1.1_851.bin')))
+        self.assertEqual(self.refresh(VERSION), (False, 0))
+        self.assertEqual(self.cache.get_symbol_info('MAIN.nCount'), SYMBOL_INFOS[0])
+
+        # A new console reads the table from the file
+        self.cache = SymbolTableCache(FakePlc(), os.path.join(self.directory, 'symbol_cache.bin'), FakeWatcher())
+        self.assertEqual(self.refresh(VERSION), (True, 0))
+        self.assertEqual(self.cache.get_symbol_infos(), SYMBOL_INFOS)
+
+        self.assertEqual(self.refresh(SymbolVersion(4, 2, 200)), (True, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
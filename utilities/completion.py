@@ -0,0 +1,44 @@
+from typing import Optional
+
+from prompt_toolkit.completion import Completer, NestedCompleter
+
+from signals.generic_signals import SignalDict
+
+
+class SignalCompleter(Completer):
+    """Completion tree of a signal dict.
+
+    The completer of a command is only rebuilt when the dict returned by its
+    nested_completer_func changed since the last refresh.
+    """
+
+    def __init__(self, signal_dict: SignalDict):
+        self._signal_dict = signal_dict
+        self._completer_dicts: dict[str, Optional[dict]] = {}
+        self._completers: dict[str, Optional[Completer]] = {}
+        self._completer: Optional[NestedCompleter] = None
+        self.rebuilds = 0
+
+    def refresh(self):
+        changed = self._completer is None
+        # Commands completing from the same hint source get the same dict, build its completer once
+        built: dict[int, Completer] = {}
+        for key, signal in self._signal_dict.items():
+            completer_dict = signal.nested_completer_dict
+            if key in self._completers:
+                cached_dict = self._completer_dicts[key]
+                if completer_dict is cached_dict or completer_dict == cached_dict:
+                    continue
+            self._completer_dicts[key] = completer_dict
+            if completer_dict and id(completer_dict) not in built:
+                built[id(completer_dict)] = NestedCompleter.from_nested_dict(completer_dict)
+                self.rebuilds += 1
+            self._completers[key] = built[id(completer_dict)] if completer_dict else None
+            changed = True
+        if changed:
+            self._completer = NestedCompleter(dict(self._completers))
+
+    def get_completions(self, document, complete_event):
+        if self._completer is None:
+            self.refresh()
+        return self._completer.get_completions(document, complete_event)
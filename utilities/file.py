@@ -1,7 +1,9 @@
 import json
 import os
 
-from typing import Optional
+from typing import Optional, Callable, Any
+
+from utilities.list_store import get_list_store
 
 
 def get_list_from_file_object(file_obj):
@@ -9,39 +11,47 @@ def get_list_from_file_object(file_obj):
 
 
 def get_list_from_file(path_to_file):
-    if os.path.isfile(path_to_file):
-        with open(path_to_file, 'r') as file_obj:
-            return get_list_from_file_object(file_obj)
+    list_store = get_list_store(path_to_file)
+    if list_store.exists():
+        return list(list_store)
 
 
 def add_to_file(path_to_file, str_to_add):
-    if os.path.isfile(path_to_file):
-        with open(path_to_file, 'r') as file:
-            list_from_file = get_list_from_file_object(file)
-        if str_to_add not in list_from_file:
-            with open(path_to_file, 'a') as file:
-                file.write(str_to_add + '\n')
-    else:
-        with open(path_to_file, 'w') as file:
-            file.write(str_to_add + '\n')
+    get_list_store(path_to_file).add(str_to_add)
 
 
 def remove_from_file(path_to_file, str_to_remove):
-    if os.path.isfile(path_to_file):
-        with open(path_to_file, 'r') as file:
-            list_from_file: list = get_list_from_file_object(file)
-            if str_to_remove in list_from_file:
-                list_from_file.remove(str_to_remove)
-            rebuilt_list = []
-            if list_from_file:
-                for symbol_str in list_from_file:
-                    rebuilt_list.append(symbol_str + '\n')
-        with open(path_to_file, 'w') as file:
-            for symbol_str in rebuilt_list:
-                file.write(symbol_str)
+    list_store = get_list_store(path_to_file)
+    if list_store.exists():
+        list_store.remove(str_to_remove)
+
+
+def clear_file(path_to_file):
+    get_list_store(path_to_file).clear()
 
 
 def get_json(path_to_file) -> Optional[dict]:
     if os.path.isfile(path_to_file):
         with open(path_to_file, 'r') as file:
             return json.load(file)
+
+
+class FileCache:
+    """Value built from a file, only rebuilt when the mtime or size of the file changed."""
+
+    def __init__(self, path_to_file, build: Callable[[], Any]):
+        self._path_to_file = path_to_file
+        self._build = build
+        self._stat_key = None
+        self._value = None
+
+    def get(self):
+        try:
+            stat = os.stat(self._path_to_file)
+            stat_key = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            stat_key = None
+        if stat_key != self._stat_key:
+            self._value = self._build() if stat_key else None
+            self._stat_key = stat_key
+        return self._value
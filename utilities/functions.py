@@ -1,46 +1,118 @@
 import dataclasses
-import os
-from multiprocessing import Process
-from pathlib import Path
+import sys
+from collections.abc import Mapping
+from itertools import islice
+from operator import attrgetter, itemgetter
+from typing import Iterable, Optional, Callable, Any
 
-import keyboard
-import tailer
 from tabulate import tabulate
 
 
-def do_tail(file_path):
-    for line in tailer.follow(open(file_path), 0.1):
-        print(line)
+_converters: dict[tuple[type, type], Callable[[Any], Any]] = {}
+
+
+def _field_getter(source_type: type, field_names: list[str]) -> Callable[[Any], tuple]:
+    # itemgetter/attrgetter with a single name don't return a tuple
+    getter = itemgetter(*field_names) if issubclass(source_type, Mapping) else attrgetter(*field_names)
+    if len(field_names) == 1:
+        return lambda elem: (getter(elem),)
+    return getter
+
+
+def get_converter(source_type: type, dataclass_arg) -> Callable[[Any], Any]:
+    """Converter from source_type (a mapping or any object with the field names as attributes) to dataclass_arg.
+
+    Built once per pair of types.
+    """
+    converter = _converters.get((source_type, dataclass_arg))
+    if converter is None:
+        getter = _field_getter(source_type, [field.name for field in dataclasses.fields(dataclass_arg)])
+
+        def converter(elem):
+            return dataclass_arg(*getter(elem))
+
+        _converters[(source_type, dataclass_arg)] = converter
+    return converter
 
 
 def payload_to_dataclass(payload: list, dataclass_arg):
     dataclass_list = []
+    source_type = None
+    converter = None
     for elem in payload:
-        try:
-            dataclass_list.append(dataclass_arg(**elem))
-        except TypeError:
-            fields = [elem.__getattribute__(field.name) for field in dataclasses.fields(dataclass_arg)]
-            dataclass_list.append(dataclass_arg(*fields))
+        if type(elem) is not source_type:
+            source_type = type(elem)
+            converter = get_converter(source_type, dataclass_arg)
+        dataclass_list.append(converter(elem))
     return dataclass_list
 
 
 def fill_table(elem_list: list, dataclass_arg) -> str:
-    table_data = [[field.name.capitalize() for field in dataclasses.fields(dataclass_arg)]]
-
-    for elem in elem_list:
-        table_data.append([value for value in dataclasses.asdict(elem).values()])
+    field_names = [field.name for field in dataclasses.fields(dataclass_arg)]
+    getter = _field_getter(dataclass_arg, field_names)
+    table_data = [[name.capitalize() for name in field_names]]
+    table_data.extend(getter(elem) for elem in elem_list)
     return tabulate(table_data, headers='firstrow')
 
 
-def show_notifications(file_path):
-    if not os.path.isfile(file_path):
-        file_path = Path(file_path)
-        file_path.touch()
+def _fit(value, width: Optional[int]) -> str:
+    text = str(value)
+    if width is None:
+        return text
+    if len(text) > width:
+        return text[:width - 1] + '~'
+    return text.ljust(width)
+
+
+def stream_table(rows: Iterable, dataclass_arg, column_widths: dict[str, Optional[int]], file=None) -> int:
+    """Print rows with fixed column widths as they come, instead of building the whole table first.
+
+    A column width of None leaves the column unbounded, which only makes sense for the last one.
+    Returns the number of rows printed.
+    """
+    file = file or sys.stdout
+    names = [field.name for field in dataclasses.fields(dataclass_arg)]
+    widths = [column_widths.get(name) for name in names]
+    getter = _field_getter(dataclass_arg, names)
+    print('  '.join(_fit(name.capitalize(), width) for name, width in zip(names, widths)).rstrip(), file=file)
+    print('  '.join('-' * (width or len(name)) for name, width in zip(names, widths)), file=file)
+    count = 0
+    for row in rows:
+        print('  '.join(_fit(value, width) for value, width in zip(getter(row), widths)).rstrip(), file=file)
+        count += 1
+    file.flush()
+    return count
+
+
+def parse_page(payload: Optional[list]) -> tuple[int, Optional[int], list]:
+    """Split offset=N and limit=N tokens off a payload, returns offset, limit and the remaining payload."""
+    offset = 0
+    limit = None
+    rest = []
+    for token in payload or []:
+        key, _, value = token.partition('=')
+        if key == 'offset' and value.isdigit():
+            offset = int(value)
+        elif key == 'limit' and value.isdigit():
+            limit = int(value)
+        else:
+            rest.append(token)
+    return offset, limit, rest
+
 
-    process = Process(target=do_tail, daemon=True, args=(file_path,))
-    process.start()
-    print("Press esc to stop showing notifications.")
-    keyboard.wait("esc")
-    process.terminate()
+def parse_options(payload: Optional[list], keys: Iterable[str]) -> tuple[dict[str, str], list]:
+    """Split key=value tokens of the given keys off a payload, returns the options and the remaining payload."""
+    keys = set(keys)
+    options = {}
+    rest = []
+    for token in payload or []:
+        key, separator, value = token.partition('=')
+        if separator and key in keys:
+            options[key] = value
+        else:
+            rest.append(token)
+    return options, rest
 
 
+def page(items: Iterable, offset: int, limit: Optional[int]):
+    return islice(items, offset, None if limit is None else offset + limit)
@@ -0,0 +1,225 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+_ADD = '+'
+_REMOVE = '-'
+
+
+def _stat_key(path_to_file) -> Optional[tuple[int, int]]:
+    try:
+        stat = os.stat(path_to_file)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ListStore:
+    """Ordered set of lines backed by a plain text file, one entry per line.
+
+    Entries are added by appending to the file. Once an entry got removed,
+    every change goes to an append-only journal next to the file instead,
+    which is merged back into the file once it gets long. The file and the
+    journal are reloaded when somebody else changed them.
+
+    Stores are shared by the console and the executor threads, every access
+    holds the lock of the store.
+    """
+
+    def __init__(self, path_to_file, compact_threshold: int = 1000):
+        self._path_to_file = path_to_file
+        self._journal_path = f'{path_to_file}.journal'
+        self._compact_threshold = compact_threshold
+        self._entries: dict[str, None] = {}
+        self._journal_size = 0
+        self._stat_keys = None
+        self._pending_lines: list[str] = []
+        self._pending_journal_lines: list[str] = []
+        self._batch_depth = 0
+        self._ends_with_newline = True
+        self._dict: Optional[dict[str, None]] = None
+        self._lock = threading.RLock()
+        self.version = 0
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            self._reload_if_changed()
+            return iter(list(self._entries))
+
+    def __len__(self):
+        with self._lock:
+            self._reload_if_changed()
+            return len(self._entries)
+
+    def __contains__(self, entry):
+        with self._lock:
+            self._reload_if_changed()
+            return entry in self._entries
+
+    def exists(self) -> bool:
+        return os.path.isfile(self._path_to_file)
+
+    def to_dict(self) -> dict[str, None]:
+        """Entries as dict, the same object is returned as long as the entries didn't change."""
+        with self._lock:
+            self._reload_if_changed()
+            if self._dict is None:
+                self._dict = dict(self._entries)
+            return self._dict
+
+    def _changed(self):
+        self.version += 1
+        self._dict = None
+
+    def _reload_if_changed(self):
+        with self._lock:
+            if self._batch_depth:
+                return
+            stat_keys = (_stat_key(self._path_to_file), _stat_key(self._journal_path))
+            if stat_keys == self._stat_keys:
+                return
+
+            entries = {}
+            self._ends_with_newline = True
+            if stat_keys[0]:
+                with open(self._path_to_file, 'r') as file:
+                    content = file.read()
+                # The file may have been edited by hand without a final newline
+                self._ends_with_newline = not content or content.endswith('\n')
+                entries = dict.fromkeys(line for line in content.split('\n') if line)
+            journal_size = 0
+            if stat_keys[1]:
+                with open(self._journal_path, 'r') as journal:
+                    for line in journal:
+                        line = line.rstrip('\n')
+                        if len(line) < 2:
+                            continue
+                        journal_size += 1
+                        if line[0] == _ADD:
+                            entries[line[1:]] = None
+                        elif line[0] == _REMOVE:
+                            entries.pop(line[1:], None)
+            self._entries = entries
+            self._journal_size = journal_size
+            self._stat_keys = stat_keys
+            self._changed()
+
+    def add(self, entry: str) -> bool:
+        with self._lock:
+            self._reload_if_changed()
+            if entry in self._entries:
+                return False
+            self._entries[entry] = None
+            if self._journal_size or self._pending_journal_lines:
+                self._pending_journal_lines.append(_ADD + entry)
+            else:
+                self._pending_lines.append(entry)
+            self._changed()
+            self._write_if_not_batched()
+            return True
+
+    def remove(self, entry: str) -> bool:
+        with self._lock:
+            self._reload_if_changed()
+            if entry not in self._entries:
+                return False
+            del self._entries[entry]
+            self._pending_journal_lines.append(_REMOVE + entry)
+            self._changed()
+            self._write_if_not_batched()
+            return True
+
+    def clear(self):
+        with self._lock:
+            for path in (self._path_to_file, self._journal_path):
+                if os.path.isfile(path):
+                    os.remove(path)
+            self._pending_lines.clear()
+            self._pending_journal_lines.clear()
+            self._entries = {}
+            self._ends_with_newline = True
+            self._journal_size = 0
+            self._stat_keys = (None, None)
+            self._changed()
+
+    @contextmanager
+    def batch(self):
+        """Write all changes made inside the block at once, with a single fsync."""
+        # Other threads wait for the end of the batch
+        with self._lock:
+            self._reload_if_changed()
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                self._write_if_not_batched()
+
+    def _write_if_not_batched(self):
+        if not self._batch_depth:
+            self.flush()
+
+    @staticmethod
+    def _append(path_to_file, lines: list[str]):
+        with open(path_to_file, 'a') as file:
+            file.write(''.join(f'{line}\n' for line in lines))
+            file.flush()
+            os.fsync(file.fileno())
+
+    def _write_pending(self):
+        # Lines for the file always precede the journal lines of a batch,
+        # so writing the file first keeps the order of the changes
+        if self._pending_lines:
+            if not self._ends_with_newline:
+                self._pending_lines.insert(0, '')
+                self._ends_with_newline = True
+            self._append(self._path_to_file, self._pending_lines)
+            self._pending_lines.clear()
+        if self._pending_journal_lines:
+            self._append(self._journal_path, self._pending_journal_lines)
+            self._journal_size += len(self._pending_journal_lines)
+            self._pending_journal_lines.clear()
+        self._stat_keys = (_stat_key(self._path_to_file), _stat_key(self._journal_path))
+
+    def flush(self):
+        with self._lock:
+            self._write_pending()
+            if self._journal_size > max(self._compact_threshold, len(self._entries)):
+                self.compact()
+
+    def compact(self):
+        """Rewrite the file from memory and drop the journal."""
+        with self._lock:
+            self._write_pending()
+            if not self._journal_size:
+                return
+            tmp_file_path = f'{self._path_to_file}.tmp'
+            with open(tmp_file_path, 'w') as file:
+                file.write(''.join(f'{entry}\n' for entry in self._entries))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_file_path, self._path_to_file)
+            os.remove(self._journal_path)
+            self._ends_with_newline = True
+            self._journal_size = 0
+            self._stat_keys = (_stat_key(self._path_to_file), None)
+
+
+_list_stores: dict[str, ListStore] = {}
+_list_stores_lock = threading.Lock()
+
+
+def get_list_store(path_to_file) -> ListStore:
+    key = os.path.abspath(path_to_file)
+    with _list_stores_lock:
+        if key not in _list_stores:
+            _list_stores[key] = ListStore(path_to_file)
+        return _list_stores[key]
+
+
+def compact_list_stores():
+    with _list_stores_lock:
+        list_stores = list(_list_stores.values())
+    for list_store in list_stores:
+        list_store.compact()